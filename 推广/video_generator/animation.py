@@ -0,0 +1,493 @@
+"""
+动画场景
+动画计划由一张静态底图（渲染计划）和按时刻排列的绘制事件组成，每个事件是一组绘制指令，
+到期时叠加绘制在上一帧的画面上。逐帧渲染时只执行新到期的事件，不重绘整个画面，
+每帧的开销与这一帧新增的内容成正比（如打字动画每帧只画一个字）。
+
+会移动、渐显的元素用精灵计划：背景和每个精灵只光栅化一次，每帧只在状态变化的精灵所在区域
+（脏矩形）恢复背景并重新混合精灵，开销与动画区域的面积成正比，而不是整个画面。
+
+柱状图动画用图表计划：全部帧的柱长和计数一次性算成 numpy 数组，每帧只用数组赋值在
+预渲染的底图上填充柱子、拼接预渲染的数字字形，不调用 Pillow 绘图。
+
+同一帧间隔内到期的事件合并在同一帧绘制；两次事件之间画面不变，按 (帧, 重复帧数) 成段产出，
+去重编码时每段只写一帧。动画在编码时按需渲染，帧缓冲在各帧间复用。
+"""
+
+import math
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw
+
+from fonts import get_font
+from frames import as_frame
+from profiler import stage
+from render_plan import (draw_ops, fit_transform, open_canvas, scale_ops, scale_plan, text_bbox,
+                         text_op, to_rgb, transform_ops)
+from text_layout import advance_width
+
+# base: 底图渲染计划；events: ((时刻, (绘制指令, ...)), ...)，按时刻排序
+AnimationPlan = namedtuple('AnimationPlan', ['base', 'events'])
+
+
+def animation_event(t, ops):
+    """t 秒时叠加绘制 ops"""
+    return (float(t), tuple(ops))
+
+
+def make_animation_plan(base, events):
+    """按时刻排序事件（同一时刻保持原顺序），生成动画计划"""
+    return AnimationPlan(base, tuple(sorted(events, key=lambda event: event[0])))
+
+
+@lru_cache(maxsize=16)
+def scale_animation(plan, size):
+    """把动画计划等比缩放到目标尺寸"""
+    size = tuple(size)
+    if size == plan.base.size:
+        return plan
+    events = tuple((t, scale_ops(ops, plan.base.size, size)) for t, ops in plan.events)
+    return AnimationPlan(scale_plan(plan.base, size), events)
+
+
+# ops: 精灵的绘制指令（最终位置的设计坐标）；box: 包含全部指令的 [x0, y0, x1, y1]；
+# start: 开始出现的时刻；duration: 过渡时长；offset: 开始时相对最终位置的位移 (dx, dy)
+Sprite = namedtuple('Sprite', ['ops', 'box', 'start', 'duration', 'offset'])
+
+# base: 背景渲染计划；sprites: 按叠放顺序排列的精灵
+SpritePlan = namedtuple('SpritePlan', ['base', 'sprites'])
+
+
+def make_sprite(ops, box, start, duration=0.4, offset=(0, 0)):
+    """从最终位置滑入并渐显的精灵"""
+    return Sprite(tuple(ops), tuple(box), float(start), float(duration), tuple(offset))
+
+
+def ops_box(ops, box):
+    """把 box 扩大到包含 ops 中全部文字的实际字形（含端点）
+
+    缩放后字号取整，字形宽高与按比例缩放的框不再一致，文字可能超出框而在精灵图层上被裁掉。
+    """
+    x0, y0, x1, y1 = box
+    for op in ops:
+        if op[0] == 'text':
+            _, (x, y), text, _, role, font_size = op
+            left, top, right, bottom = text_bbox(text, role, font_size)
+            x0, y0 = min(x0, x + left), min(y0, y + top)
+            x1, y1 = max(x1, x + right - 1), max(y1, y + bottom - 1)
+    return (x0, y0, x1, y1)
+
+
+@lru_cache(maxsize=16)
+def scale_sprite_plan(plan, size):
+    """把精灵计划等比缩放到目标尺寸；精灵框按缩放后的指令重新求，不会裁掉文字"""
+    size = tuple(size)
+    if size == plan.base.size:
+        return plan
+    scale, offset = fit_transform(plan.base.size, size)
+    sprites = []
+    for sprite in plan.sprites:
+        box = transform_ops([('rect', sprite.box, None, None, 1)], scale, offset)[0][1]
+        ops = scale_ops(sprite.ops, plan.base.size, size)
+        sprites.append(sprite._replace(ops=ops, box=ops_box(ops, box),
+                                       offset=tuple(round(v * scale) for v in sprite.offset)))
+    return SpritePlan(scale_plan(plan.base, size), tuple(sprites))
+
+
+def event_frame(t, fps):
+    """事件生效的第一帧（该帧时刻不早于事件时刻）"""
+    return max(0, math.ceil(t * fps - 1e-6))
+
+
+class Animation:
+    """按需渲染的动画场景；在编码流水线中代替静态帧传递"""
+
+    def __init__(self, plan, size=None):
+        if size is not None:
+            plan = scale_animation(plan, tuple(size))
+        self.plan = plan
+        width, height = plan.base.size
+        # 与静态帧相同的形状，供分辨率校验使用
+        self.shape = (height, width, 3)
+
+    def runs(self, count, fps):
+        """产出 (帧, 重复帧数)，共 count 帧
+
+        所有段共用一块帧缓冲，调用方需在取下一段前消费完当前帧。
+        """
+        with stage('draw'):
+            draw, buf = open_canvas(self.plan.base)
+        frame = as_frame(buf)
+        events = iter(self.plan.events)
+        pending = next(events, None)
+        n = 0
+        while n < count:
+            with stage('draw'):
+                while pending is not None and event_frame(pending[0], fps) <= n:
+                    draw_ops(draw, pending[1])
+                    pending = next(events, None)
+            end = count if pending is None else min(count, event_frame(pending[0], fps))
+            yield frame, end - n
+            n = end
+
+    def poster(self, duration=None):
+        """动画在 duration 秒时的画面（缺省为全部事件绘制完成后），用于缩略图"""
+        draw, buf = open_canvas(self.plan.base)
+        for t, ops in self.plan.events:
+            if duration is not None and t - 1e-6 > duration:
+                break
+            draw_ops(draw, ops)
+        return as_frame(buf)
+
+
+class SpriteAnimation(Animation):
+    """精灵动画：缓存的背景 + 逐帧只重新合成状态变化的精灵区域（脏矩形）"""
+
+    def __init__(self, plan, size=None):
+        if size is not None:
+            plan = scale_sprite_plan(plan, tuple(size))
+        self.plan = plan
+        width, height = plan.base.size
+        self.shape = (height, width, 3)
+
+    def _layers(self):
+        """把每个精灵光栅化为 (预乘 RGB, 覆盖度) 小图
+
+        不画在透明图层上：Pillow 在透明像素上混合抗锯齿边缘时颜色已乘过一次覆盖度，
+        再乘整体不透明度会出现暗边。精灵分别画在不透明的黑底和白底上，
+        黑底即预乘后的颜色，白底与黑底之差即未覆盖的部分。
+        """
+        layers = []
+        for sprite in self.plan.sprites:
+            x0, y0, x1, y1 = sprite.box
+            ops = transform_ops(sprite.ops, 1.0, (-x0, -y0))
+            pixels = []
+            for color in ((0, 0, 0), (255, 255, 255)):
+                img = Image.new('RGB', (x1 - x0 + 1, y1 - y0 + 1), color)
+                draw_ops(ImageDraw.Draw(img), ops)
+                pixels.append(np.asarray(img).astype(np.uint32))
+            black, white = pixels
+            # 三个通道的差只差取整误差，取平均
+            alpha = 255 - ((white - black).sum(axis=-1) + 1) // 3
+            layers.append((black, alpha))
+        return layers
+
+    @staticmethod
+    def state(sprite, t):
+        """精灵在 t 时刻的 (dx, dy, 不透明度 0-255)，还没出现时为 None"""
+        if sprite.duration <= 0:
+            progress = 1.0 if t >= sprite.start else -1.0
+        else:
+            progress = (t - sprite.start) / sprite.duration
+        if progress >= 1:
+            return (0, 0, 255)
+        level = round(progress * 255)
+        if level <= 0:
+            return None
+        # 位移缓出，不透明度线性
+        remain = (1 - progress) ** 3
+        return (round(sprite.offset[0] * remain), round(sprite.offset[1] * remain), level)
+
+    def _rect(self, index, state):
+        x0, y0, x1, y1 = self.plan.sprites[index].box
+        dx, dy, _ = state
+        return (x0 + dx, y0 + dy, x1 + dx + 1, y1 + dy + 1)
+
+    def _compose(self, buf, background, layers, states, region):
+        """恢复 region 内的背景，再按叠放顺序混合与之相交的精灵"""
+        height, width = buf.shape[:2]
+        x0, y0 = max(region[0], 0), max(region[1], 0)
+        x1, y1 = min(region[2], width), min(region[3], height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        buf[y0:y1, x0:x1] = background[y0:y1, x0:x1]
+        for index, state in enumerate(states):
+            if state is None:
+                continue
+            sx0, sy0, sx1, sy1 = self._rect(index, state)
+            cx0, cy0, cx1, cy1 = max(sx0, x0), max(sy0, y0), min(sx1, x1), min(sy1, y1)
+            if cx0 >= cx1 or cy0 >= cy1:
+                continue
+            premultiplied, alpha = layers[index]
+            src = premultiplied[cy0 - sy0:cy1 - sy0, cx0 - sx0:cx1 - sx0]
+            # 预乘混合：背景按 覆盖度 × 整体不透明度 让出，精灵颜色只乘整体不透明度；整数运算，分母 255²
+            weight = alpha[cy0 - sy0:cy1 - sy0, cx0 - sx0:cx1 - sx0, None] * state[2]
+            dst = buf[cy0:cy1, cx0:cx1, :3]
+            dst[...] = (dst * (65025 - weight) + src * (255 * state[2]) + 32512) // 65025
+
+    def _next_change(self, n, t, fps):
+        """下一个有精灵状态变化的帧号"""
+        following = math.inf
+        for sprite in self.plan.sprites:
+            if t < sprite.start:
+                following = min(following, max(event_frame(sprite.start, fps), n + 1))
+            elif t < sprite.start + sprite.duration:
+                return n + 1
+        return following
+
+    def runs(self, count, fps):
+        """产出 (帧, 重复帧数)，共 count 帧；只重新合成状态变化的精灵区域
+
+        所有段共用一块帧缓冲，调用方需在取下一段前消费完当前帧。
+        """
+        with stage('draw'):
+            _, buf = open_canvas(self.plan.base)
+            background = buf.copy()
+            layers = self._layers()
+        frame = as_frame(buf)
+        drawn = [None] * len(self.plan.sprites)
+        n = 0
+        while n < count:
+            t = n / fps
+            states = [self.state(sprite, t) for sprite in self.plan.sprites]
+            with stage('composite'):
+                for index, (old, new) in enumerate(zip(drawn, states)):
+                    if old == new:
+                        continue
+                    rects = [self._rect(index, s) for s in (old, new) if s is not None]
+                    region = (min(r[0] for r in rects), min(r[1] for r in rects),
+                              max(r[2] for r in rects), max(r[3] for r in rects))
+                    self._compose(buf, background, layers, states, region)
+            drawn = states
+            end = min(count, self._next_change(n, t, fps))
+            yield frame, end - n
+            n = end
+
+    def poster(self, duration=None):
+        """duration 秒时的画面（缺省为全部精灵就位后），用于缩略图"""
+        _, buf = open_canvas(self.plan.base)
+        background = buf.copy()
+        t = math.inf if duration is None else duration
+        states = [self.state(sprite, t) for sprite in self.plan.sprites]
+        height, width = buf.shape[:2]
+        self._compose(buf, background, self._layers(), states, (0, 0, width, height))
+        return as_frame(buf)
+
+
+# box: 柱子满格时的 [x0, y0, x1, y1]（含端点，与 rect 指令一致）；fill: 颜色；
+# fraction: 最终长度占满格的比例；start / duration: 生长的开始时刻与时长
+Bar = namedtuple('Bar', ['box', 'fill', 'fraction', 'start', 'duration'])
+
+# xy: 文字位置；value: 最终数值；template: 格式串（如 '{:,} tokens'）；
+# start / duration: 从 0 数到 value 的开始时刻与时长
+Counter = namedtuple('Counter', ['xy', 'value', 'template', 'fill', 'role', 'size', 'start', 'duration'])
+
+# base: 不含柱子与计数的底图；final: 全部完成后的画面；bars / counters: 动画元素
+ChartPlan = namedtuple('ChartPlan', ['base', 'final', 'bars', 'counters'])
+
+
+def make_bar(box, fill, fraction, start, duration=1.5):
+    """从 0 生长到满格 fraction 的柱子"""
+    return Bar(tuple(box), fill, float(fraction), float(start), float(duration))
+
+
+def make_counter(xy, value, template, fill, role, size, start, duration=1.5):
+    """从 0 数到 value 的计数文字"""
+    return Counter(tuple(xy), int(value), template, fill, role, size, float(start), float(duration))
+
+
+@lru_cache(maxsize=16)
+def scale_chart_plan(plan, size):
+    """把图表计划等比缩放到目标尺寸"""
+    size = tuple(size)
+    if size == plan.base.size:
+        return plan
+    scale, offset = fit_transform(plan.base.size, size)
+    bars = tuple(bar._replace(box=transform_ops([('rect', bar.box, None, None, 1)], scale, offset)[0][1])
+                 for bar in plan.bars)
+    counters = []
+    for counter in plan.counters:
+        op = transform_ops([text_op(counter.xy, '', counter.fill, counter.role, counter.size)],
+                           scale, offset)[0]
+        counters.append(counter._replace(xy=op[1], size=op[5]))
+    return ChartPlan(scale_plan(plan.base, size), scale_plan(plan.final, size), bars, tuple(counters))
+
+
+def ease_out(progress):
+    """三次缓出；progress 可以是 numpy 数组"""
+    return 1 - (1 - progress) ** 3
+
+
+def _progress(items, t):
+    """各元素在时刻 t（一维数组）上的进度，形状 (时刻数, 元素数)，取值 0-1"""
+    start = np.array([item.start for item in items], dtype=float)
+    duration = np.array([item.duration for item in items], dtype=float)
+    elapsed = t[:, None] - start
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(duration > 0, elapsed / np.where(duration > 0, duration, 1),
+                            (elapsed >= 0).astype(float))
+    return np.clip(progress, 0.0, 1.0)
+
+
+@lru_cache(maxsize=256)
+def glyph_mask(char, role, size, height):
+    """单个字符的覆盖率蒙版 (height, 宽)，原点与 draw.text((0, 0), ...) 一致"""
+    width = max(text_bbox(char, role, size)[2], 0)
+    img = Image.new('L', (width, height), 0)
+    if width:
+        ImageDraw.Draw(img).text((0, 0), char, fill=255, font=get_font(role, size))
+    mask = np.asarray(img).astype(np.uint16)
+    mask.flags.writeable = False
+    return mask
+
+
+class ChartAnimation(Animation):
+    """柱状图动画：全部帧的几何一次算好，逐帧用数组赋值填充柱子、拼接数字字形"""
+
+    def __init__(self, plan, size=None):
+        if size is not None:
+            plan = scale_chart_plan(plan, tuple(size))
+        self.plan = plan
+        width, height = plan.base.size
+        self.shape = (height, width, 3)
+
+    def geometry(self, t):
+        """时刻数组 t 上的 (柱子填充到的列偏移, 计数值, 是否全部完成)
+
+        列偏移为 -1 表示柱子还没出现；0 起与 rect 指令一样包含端点列。
+        """
+        bars, counters = self.plan.bars, self.plan.counters
+        bar_progress = _progress(bars, t)
+        span = np.array([bar.box[2] - bar.box[0] for bar in bars], dtype=float)
+        fraction = np.array([bar.fraction for bar in bars], dtype=float)
+        extents = np.where(bar_progress > 0,
+                           np.floor(ease_out(bar_progress) * fraction * span), -1).astype(np.int64)
+        counter_progress = _progress(counters, t)
+        target = np.array([counter.value for counter in counters], dtype=float)
+        values = np.rint(ease_out(counter_progress) * target).astype(np.int64)
+        settled = np.all(bar_progress >= 1, axis=1) & np.all(counter_progress >= 1, axis=1)
+        return extents, values, settled
+
+    def _counter_height(self, counter):
+        chars = set(counter.template.format(counter.value)) | set('0123456789,')
+        return max(text_bbox(char, counter.role, counter.size)[3] for char in chars)
+
+    def _counter_layout(self, counter, value):
+        """计数文字各字符的 (x 偏移, 蒙版)"""
+        height = self._counter_height(counter)
+        placed = []
+        pos = 0.0
+        for char in counter.template.format(value):
+            placed.append((round(pos), glyph_mask(char, counter.role, counter.size, height)))
+            pos += advance_width(char, counter.role, counter.size)
+        return placed
+
+    def _counter_width(self, counter, values):
+        """values 中各数值渲染后的最大宽度"""
+        width = 0
+        for value in np.unique(values):
+            for left, mask in self._counter_layout(counter, int(value)):
+                width = max(width, left + mask.shape[1])
+        return width
+
+    def _paint_bar(self, buf, base, bar, extent):
+        height, width = buf.shape[:2]
+        x0, y0, x1, y1 = bar.box
+        rows = slice(max(y0, 0), min(y1 + 1, height))
+        buf[rows, max(x0, 0):min(x1 + 1, width)] = base[rows, max(x0, 0):min(x1 + 1, width)]
+        if extent >= 0:
+            buf[rows, max(x0, 0):min(x0 + extent + 1, width), :3] = to_rgb(bar.fill)
+
+    def _paint_counter(self, buf, base, counter, value, region_width):
+        """在底图上按覆盖率混合计数文字，region_width 内的旧文字一并擦除"""
+        height, width = buf.shape[:2]
+        x, y = counter.xy
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + region_width, width), min(y + self._counter_height(counter), height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        coverage = np.zeros((y1 - y, x1 - x), dtype=np.uint16)
+        for left, mask in self._counter_layout(counter, value):
+            right = min(left + mask.shape[1], x1 - x)
+            if right > left:
+                np.maximum(coverage[:, left:right], mask[:y1 - y, :right - left],
+                           out=coverage[:, left:right])
+        coverage = coverage[y0 - y:, x0 - x:, None]
+        background = base[y0:y1, x0:x1, :3].astype(np.uint16)
+        color = np.array(to_rgb(counter.fill), dtype=np.uint16)
+        buf[y0:y1, x0:x1, :3] = (background * (255 - coverage) + color * coverage + 127) // 255
+
+    def runs(self, count, fps):
+        """产出 (帧, 重复帧数)，共 count 帧；柱长或计数不变的帧合并为一段
+
+        所有段共用一块帧缓冲，调用方需在取下一段前消费完当前帧。
+        """
+        if count <= 0:
+            return
+        with stage('draw'):
+            _, buf = open_canvas(self.plan.base)
+            base = buf.copy()
+            _, final = open_canvas(self.plan.final)
+        with stage('composite'):
+            extents, values, settled = self.geometry(np.arange(count) / fps)
+            widths = [self._counter_width(counter, values[:, j])
+                      for j, counter in enumerate(self.plan.counters)]
+            state = np.concatenate([extents, values, settled[:, None]], axis=1)
+            starts = np.flatnonzero(np.any(state[1:] != state[:-1], axis=1)) + 1
+        frame = as_frame(buf)
+        bounds = [0, *starts.tolist(), count]
+        drawn = None
+        for n, end in zip(bounds, bounds[1:]):
+            with stage('composite'):
+                if settled[n]:
+                    buf[...] = final
+                    drawn = None
+                else:
+                    if drawn is None:
+                        buf[...] = base
+                    for i, bar in enumerate(self.plan.bars):
+                        if drawn is None or extents[n, i] != extents[drawn, i]:
+                            self._paint_bar(buf, base, bar, extents[n, i])
+                    for j, counter in enumerate(self.plan.counters):
+                        if drawn is None or values[n, j] != values[drawn, j]:
+                            self._paint_counter(buf, base, counter, int(values[n, j]), widths[j])
+                    drawn = n
+            yield frame, end - n
+
+    def poster(self, duration=None):
+        """duration 秒时的画面（缺省为全部完成后），用于缩略图"""
+        if duration is None:
+            return as_frame(open_canvas(self.plan.final)[1])
+        extents, values, settled = self.geometry(np.array([float(duration)]))
+        if settled[0]:
+            return as_frame(open_canvas(self.plan.final)[1])
+        _, buf = open_canvas(self.plan.base)
+        base = buf.copy()
+        for i, bar in enumerate(self.plan.bars):
+            self._paint_bar(buf, base, bar, extents[0, i])
+        for j, counter in enumerate(self.plan.counters):
+            self._paint_counter(buf, base, counter, int(values[0, j]),
+                                self._counter_width(counter, values[:, j]))
+        return as_frame(buf)
+
+
+def make_animation(plan, size=None):
+    """按动画计划的类型构造动画"""
+    if isinstance(plan, SpritePlan):
+        return SpriteAnimation(plan, size)
+    if isinstance(plan, ChartPlan):
+        return ChartAnimation(plan, size)
+    return Animation(plan, size)
+
+
+# 布局函数返回这些类型时，场景按动画处理
+ANIMATION_PLANS = (AnimationPlan, SpritePlan, ChartPlan)
+
+
+def is_animation(source):
+    """场景画面是否为动画"""
+    return isinstance(source, Animation)
+
+
+def source_runs(source, count, fps):
+    """把场景画面展开为 (帧, 重复帧数) 段：静态帧为一整段，动画按事件分段"""
+    if is_animation(source):
+        yield from source.runs(count, fps)
+    elif count > 0:
+        yield source, count
+
+
+def still_frame(source, duration=None):
+    """场景的代表画面：静态帧本身，或动画在 duration 秒时的画面"""
+    return source.poster(duration) if is_animation(source) else source
@@ -0,0 +1,408 @@
+"""
+asciinema 录屏导入
+逐行流式读取 asciicast v2 (.cast) 文件，把输出事件回放到一个最小的虚拟终端（字符网格 + 光标 +
+SGR 颜色），每次只把内容真正变化的单元格转换为绘制指令，生成动画事件。
+落在同一帧间隔内的输出事件合并为一个动画事件，几分钟的真实录屏也只需按帧数量级绘制。
+
+支持常见的光标移动、清屏 / 清行、插入 / 删除字符、16 色 / 256 色 / 真彩色和宽字符；
+其他控制序列（备用屏幕、滚动区域、鼠标模式等）忽略。
+"""
+
+import json
+import re
+import unicodedata
+
+from animation import animation_event, event_frame
+from render_plan import rect_op, text_op
+
+# 标准 16 色（与 xterm 默认配色相近）
+ANSI_COLORS = (
+    '#000000', '#CD3131', '#0DBC79', '#E5E510', '#2472C8', '#BC3FBC', '#11A8CD', '#E5E5E5',
+    '#666666', '#F14C4C', '#23D18B', '#F5F543', '#3B8EEA', '#D670D6', '#29B8DB', '#FFFFFF',
+)
+
+# CSI 序列 / OSC 序列 / 其他两三个字节的 ESC 序列
+_ESCAPE = re.compile(r'\x1b\[([0-9;?<=>]*)[ -/]*([@-~])'
+                     r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+                     r'|\x1b[()*+][0-9A-Za-z]'
+                     r'|\x1b[=>78cDEMNOZ\\]')
+
+# 未结束的转义序列最多缓存的长度，超过视为无效序列丢弃
+MAX_PENDING = 64
+
+
+def _parse_header(line, path):
+    try:
+        header = json.loads(line)
+    except ValueError:
+        raise ValueError(f"不是 asciicast 文件: {path}")
+    if not isinstance(header, dict) or header.get('version') != 2:
+        raise ValueError(f"只支持 asciicast v2: {path}")
+    return header
+
+
+def read_cast(path):
+    """读取 .cast 文件，返回 (头信息, 输出事件迭代器)；事件为 (时刻, 数据)，逐行惰性解析"""
+    with open(path, encoding='utf-8') as f:
+        header = _parse_header(f.readline(), path)
+
+    def events():
+        with open(path, encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                t, kind, data = json.loads(line)
+                if kind == 'o':
+                    yield float(t), data
+    return header, events()
+
+
+def xterm_color(n):
+    """256 色编号对应的颜色"""
+    if n < 16:
+        return ANSI_COLORS[n]
+    if n < 232:
+        n -= 16
+        levels = [0 if v == 0 else 55 + v * 40 for v in (n // 36, n // 6 % 6, n % 6)]
+        return '#{:02X}{:02X}{:02X}'.format(*levels)
+    gray = 8 + (n - 232) * 10
+    return f'#{gray:02X}{gray:02X}{gray:02X}'
+
+
+def char_width(char):
+    """字符占用的单元格数：宽字符 2，组合字符 0"""
+    if unicodedata.combining(char):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+class TerminalGrid:
+    """最小的虚拟终端：单元格为 (字符, 前景色, 背景色)，记录自上次取出后变化的单元格"""
+
+    def __init__(self, cols, rows, fg, bg):
+        self.cols = cols
+        self.rows = rows
+        self.default_fg = fg
+        self.default_bg = bg
+        self.fg, self.bg = fg, bg
+        self.bold = False
+        self.cells = [[(' ', fg, bg)] * cols for _ in range(rows)]
+        # 已绘制到画面上的内容，用于过滤没有实际变化的单元格
+        self.drawn = [row[:] for row in self.cells]
+        self.dirty = set()
+        self.x = self.y = 0
+        self.saved = (0, 0)
+        self.cursor_visible = True
+        self.drawn_cursor = None
+        self._pending = ''
+
+    # ---- 写入 ----
+
+    def feed(self, data):
+        """写入一段终端输出"""
+        data = self._pending + data
+        self._pending = ''
+        pos = 0
+        for match in _ESCAPE.finditer(data):
+            self._write(data[pos:match.start()])
+            self._escape(match)
+            pos = match.end()
+        rest = data[pos:]
+        esc = rest.find('\x1b')
+        if esc >= 0:
+            # 转义序列可能被拆在两个事件里，留到下次拼接；过长的视为无效序列跳过 ESC
+            if len(rest) - esc <= MAX_PENDING:
+                self._pending = rest[esc:]
+            else:
+                rest = rest[:esc] + rest[esc + 1:]
+                esc = len(rest)
+            rest = rest[:esc]
+        self._write(rest)
+
+    def _write(self, text):
+        for char in text:
+            if char == '\r':
+                self.x = 0
+            elif char == '\n':
+                self._newline()
+            elif char == '\b':
+                self.x = max(0, min(self.x, self.cols - 1) - 1)
+            elif char == '\t':
+                self.x = min(self.cols - 1, (self.x // 8 + 1) * 8)
+            elif char < ' ' or char == '\x7f':
+                continue
+            else:
+                self._put(char)
+
+    def _put(self, char):
+        width = char_width(char)
+        if width == 0:
+            # 组合字符并入前一个单元格
+            if self.x > 0:
+                x = min(self.x, self.cols) - 1
+                prev, fg, bg = self.cells[self.y][x]
+                self._set(x, self.y, (prev + char, fg, bg))
+            return
+        if self.x + width > self.cols:
+            self.x = 0
+            self._newline()
+        self._set(self.x, self.y, (char, self.fg, self.bg))
+        if width == 2:
+            # 宽字符右半格用空字符占位
+            self._set(self.x + 1, self.y, ('', self.fg, self.bg))
+        # 光标停在最后一列之后，下一个字符写入时才换行
+        self.x += width
+
+    def _set(self, x, y, cell):
+        self.cells[y][x] = cell
+        self.dirty.add((y, x))
+
+    def _newline(self):
+        if self.y + 1 < self.rows:
+            self.y += 1
+            return
+        # 滚屏：整屏内容上移一行，之后只重绘实际变化的单元格
+        self.cells.pop(0)
+        self.cells.append(self._blank_row())
+        self.dirty.update((y, x) for y in range(self.rows) for x in range(self.cols))
+
+    def _blank_row(self):
+        return [(' ', self.default_fg, self.bg)] * self.cols
+
+    def _clear(self, y, start, stop):
+        for x in range(max(start, 0), min(stop, self.cols)):
+            self._set(x, y, (' ', self.default_fg, self.bg))
+
+    # ---- 控制序列 ----
+
+    def _escape(self, match):
+        if match.group(2) is None:
+            sequence = match.group(0)
+            if sequence == '\x1b7':
+                self.saved = (self.x, self.y)
+            elif sequence == '\x1b8':
+                self.x, self.y = self.saved
+            elif sequence == '\x1bc':
+                self._reset()
+            return
+        params, command = match.group(1), match.group(2)
+        if params.startswith('?'):
+            if params[1:] == '25':
+                self.cursor_visible = command == 'h'
+            return
+        if params and params[0] in '<=>':
+            return
+        args = [int(v) if v else 0 for v in params.split(';')] if params else []
+        n = max(args[0], 1) if args else 1
+        x = min(self.x, self.cols - 1)
+        if command == 'A':
+            self.y = max(0, self.y - n)
+        elif command == 'B':
+            self.y = min(self.rows - 1, self.y + n)
+        elif command == 'C':
+            self.x = min(self.cols - 1, x + n)
+        elif command == 'D':
+            self.x = max(0, x - n)
+        elif command in 'EF':
+            self.y = min(self.rows - 1, self.y + n) if command == 'E' else max(0, self.y - n)
+            self.x = 0
+        elif command == 'G':
+            self.x = min(self.cols - 1, n - 1)
+        elif command == 'd':
+            self.y = min(self.rows - 1, n - 1)
+        elif command in 'Hf':
+            row = args[0] if args else 1
+            col = args[1] if len(args) > 1 else 1
+            self.y = min(self.rows - 1, max(row, 1) - 1)
+            self.x = min(self.cols - 1, max(col, 1) - 1)
+        elif command == 'J':
+            mode = args[0] if args else 0
+            if mode == 0:
+                self._clear(self.y, x, self.cols)
+                for y in range(self.y + 1, self.rows):
+                    self._clear(y, 0, self.cols)
+            elif mode == 1:
+                for y in range(self.y):
+                    self._clear(y, 0, self.cols)
+                self._clear(self.y, 0, x + 1)
+            else:
+                for y in range(self.rows):
+                    self._clear(y, 0, self.cols)
+        elif command == 'K':
+            mode = args[0] if args else 0
+            if mode == 0:
+                self._clear(self.y, x, self.cols)
+            elif mode == 1:
+                self._clear(self.y, 0, x + 1)
+            else:
+                self._clear(self.y, 0, self.cols)
+        elif command == 'X':
+            self._clear(self.y, x, x + n)
+        elif command in 'P@':
+            row = self.cells[self.y]
+            blank = [(' ', self.default_fg, self.bg)] * n
+            if command == 'P':
+                row[x:] = row[x + n:] + blank
+            else:
+                row[x:] = (blank + row[x:])[:self.cols - x]
+            del row[self.cols:]
+            self.dirty.update((self.y, col) for col in range(x, self.cols))
+        elif command in 'LM':
+            rows = [self._blank_row() for _ in range(min(n, self.rows - self.y))]
+            if command == 'L':
+                self.cells[self.y:] = (rows + self.cells[self.y:])[:self.rows - self.y]
+            else:
+                self.cells[self.y:] = self.cells[self.y + len(rows):] + rows
+            self.dirty.update((y, col) for y in range(self.y, self.rows) for col in range(self.cols))
+        elif command == 'm':
+            self._sgr(args or [0])
+        elif command == 's':
+            self.saved = (self.x, self.y)
+        elif command == 'u':
+            self.x, self.y = self.saved
+
+    def _sgr(self, args):
+        i = 0
+        while i < len(args):
+            code = args[i]
+            if code == 0:
+                self.fg, self.bg, self.bold = self.default_fg, self.default_bg, False
+            elif code == 1:
+                self.bold = True
+            elif code == 22:
+                self.bold = False
+            elif code == 7:
+                self.fg, self.bg = self.bg, self.fg
+            elif 30 <= code <= 37:
+                self.fg = ANSI_COLORS[code - 30 + (8 if self.bold else 0)]
+            elif 90 <= code <= 97:
+                self.fg = ANSI_COLORS[code - 90 + 8]
+            elif code == 39:
+                self.fg = self.default_fg
+            elif 40 <= code <= 47:
+                self.bg = ANSI_COLORS[code - 40]
+            elif 100 <= code <= 107:
+                self.bg = ANSI_COLORS[code - 100 + 8]
+            elif code == 49:
+                self.bg = self.default_bg
+            elif code in (38, 48) and i + 1 < len(args):
+                if args[i + 1] == 5 and i + 2 < len(args):
+                    color = xterm_color(args[i + 2] % 256)
+                    i += 2
+                elif args[i + 1] == 2 and i + 4 < len(args):
+                    color = '#{:02X}{:02X}{:02X}'.format(*(min(v, 255) for v in args[i + 2:i + 5]))
+                    i += 4
+                else:
+                    i += 1
+                    color = None
+                if color is not None:
+                    if code == 38:
+                        self.fg = color
+                    else:
+                        self.bg = color
+            i += 1
+
+    def _reset(self):
+        self.fg, self.bg, self.bold = self.default_fg, self.default_bg, False
+        for y in range(self.rows):
+            self._clear(y, 0, self.cols)
+        self.x = self.y = 0
+
+    # ---- 变化的单元格 ----
+
+    def cursor(self):
+        """当前显示光标的单元格 (行, 列)，隐藏时为 None"""
+        if not self.cursor_visible:
+            return None
+        return (self.y, min(self.x, self.cols - 1))
+
+    def take_dirty(self):
+        """取出自上次以来画面上实际变化的单元格，返回 {行: [(列, 字符, 前景色, 背景色), ...]}
+
+        光标所在单元格前景色与背景色互换显示；光标移动时新旧两格都视为变化。
+        """
+        cursor = self.cursor()
+        if cursor != self.drawn_cursor:
+            for cell in (cursor, self.drawn_cursor):
+                if cell is not None:
+                    self.dirty.add(cell)
+        # 宽字符与右半格的占位一起重绘，避免背景矩形盖住半个字
+        for y, x in list(self.dirty):
+            if x + 1 < self.cols and self.cells[y][x + 1][0] == '':
+                self.dirty.add((y, x + 1))
+        changed = {}
+        for y, x in sorted(self.dirty):
+            char, fg, bg = self.cells[y][x]
+            if (y, x) == cursor:
+                fg, bg = bg, fg
+            shown = (char, fg, bg)
+            if self.drawn[y][x] == shown:
+                continue
+            self.drawn[y][x] = shown
+            changed.setdefault(y, []).append((x, char, fg, bg))
+        self.dirty.clear()
+        self.drawn_cursor = cursor
+        return changed
+
+
+def cell_ops(changed, origin, cell_size, font_size, role='mono'):
+    """把变化的单元格转换为绘制指令：同一行连续、同色的单元格合并为一个背景矩形和一段文字"""
+    x0, y0 = origin
+    cell_w, cell_h = cell_size
+    ops = []
+    for y, cells in changed.items():
+        top = y0 + y * cell_h
+        run = []
+        for cell in cells + [None]:
+            # 宽字符连同占位格结束一段，之后的字符从单元格位置重新对齐
+            if run and (cell is None or cell[0] != run[-1][0] + 1 or cell[2:] != run[-1][2:]
+                        or run[-1][1] == ''):
+                start = run[0][0]
+                _, _, fg, bg = run[0]
+                left = x0 + start * cell_w
+                ops.append(rect_op([round(left), top, round(x0 + (run[-1][0] + 1) * cell_w) - 1,
+                                    top + cell_h - 1], fill=bg))
+                text = ''.join(c[1] for c in run)
+                if text.strip():
+                    ops.append(text_op((round(left), top), text, fg, role, font_size))
+                run = []
+            if cell is not None:
+                run.append(cell)
+    return ops
+
+
+def cast_events(path, grid, origin, cell_size, font_size, fps=30, speed=1.0, max_idle=2.0):
+    """回放 .cast 文件，产出动画事件；同一帧间隔内的输出合并为一个事件
+
+    speed 为回放倍速，max_idle 把更长的停顿压缩到该秒数（None 表示不压缩）。
+    """
+    header, events = read_cast(path)
+    idle_limit = header.get('idle_time_limit')
+    if max_idle is None or (idle_limit is not None and idle_limit < max_idle):
+        max_idle = idle_limit
+    t = last = 0.0
+    frame = None
+    for stamp, data in events:
+        gap = max(stamp - last, 0.0)
+        last = stamp
+        t += (min(gap, max_idle) if max_idle is not None else gap) / speed
+        current = event_frame(t, fps)
+        if frame is not None and current != frame:
+            ops = cell_ops(grid.take_dirty(), origin, cell_size, font_size)
+            if ops:
+                yield animation_event(frame / fps, ops)
+        frame = current
+        grid.feed(data)
+    if frame is not None:
+        ops = cell_ops(grid.take_dirty(), origin, cell_size, font_size)
+        if ops:
+            yield animation_event(frame / fps, ops)
+
+
+def cast_size(path):
+    """录屏的终端尺寸 (列数, 行数)"""
+    with open(path, encoding='utf-8') as f:
+        header = _parse_header(f.readline(), path)
+    return header['width'], header['height']
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+批量生成视频变体
+一个进程内渲染多个语言 / 价格变体：字体、渲染计划和场景缓存在变体间共享，
+编码交给编码线程池（ffmpeg 子进程），与下一个变体的光栅化并行进行。
+
+用法:
+python batch.py scenes/variants.json
+python batch.py scenes/variants.json --encoders 2 -j 4
+python batch.py scenes/variants.json --palette   # 只有主题不同的变体共用一次光栅化
+
+变体文件格式:
+{
+  "defaults": {"spec": "demo.json"},
+  "variants": [
+    {"name": "zh", "output": "out/demo-zh.mp4"},
+    {"name": "zh-cny", "overrides": {"Token对比": {"data": [...]}}},
+    {"name": "zh-light", "theme": "light"}
+  ]
+}
+路径相对于变体文件所在目录；overrides 按场景标题覆盖场景描述中的字段；theme 为配色主题。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import generate_video as gv
+from fonts import resolve_fonts
+from profiles import CODECS, PROFILES, check_codec, default_threads, profile_args
+from scene_cache import DEFAULT_CACHE_DIR, SceneCache
+from scene_spec import load_scenes
+from scheduler import ScenePool
+from themes import get_theme, use_theme
+
+
+def load_variants(path):
+    """读取变体文件，返回合并了 defaults 的变体列表"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data.get('variants'), list) or not data['variants']:
+        raise ValueError(f"变体文件缺少 variants 列表: {path}")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = data.get('defaults', {})
+    variants = []
+    for i, item in enumerate(data['variants'], 1):
+        variant = {**defaults, **item}
+        variant.setdefault('name', f"variant-{i}")
+        if 'spec' not in variant:
+            raise ValueError(f"变体 {variant['name']} 没有指定 spec")
+        variant['spec'] = os.path.join(base_dir, variant['spec'])
+        if variant.get('output'):
+            variant['output'] = os.path.join(base_dir, variant['output'])
+        else:
+            variant['output'] = os.path.join(gv.OUTPUT_DIR, f"synapse-ai-demo-{variant['name']}.mp4")
+        get_theme(variant.setdefault('theme', 'dark'))
+        variants.append(variant)
+    names = [v['name'] for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("变体名称重复")
+    return variants
+
+
+def encode_variant(variant, scenes, frames, backend, dedup, frame_mode, segments, encoding):
+    """编码线程：编码单个变体，返回 (时长, 编码耗时)；encoding 为 编码器 / 线程 / 档位参数"""
+    start = time.perf_counter()
+    output_dir = os.path.dirname(variant['output'])
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if backend == 'ffmpeg':
+        duration = gv.render_with_ffmpeg(scenes, frames, variant['output'],
+                                         dedup=dedup, frame_mode=frame_mode, segments=segments,
+                                         codec=encoding['codec'], threads=encoding['threads'],
+                                         extra_args=encoding['args'])
+    else:
+        duration = gv.render_with_moviepy(scenes, frames, variant['output'],
+                                          codec=encoding['codec'], threads=encoding['threads'],
+                                          ffmpeg_params=encoding['args'])
+    return duration, time.perf_counter() - start
+
+
+def run_batch(variants, backend='ffmpeg', jobs=1, encoders=2, use_cache=True,
+              cache_dir=DEFAULT_CACHE_DIR, dedup=True, frame_mode='vfr', segments=False,
+              profile='web', codec=None, palette=False):
+    """依次光栅化各变体，编码提交到线程池，返回每个变体的耗时统计
+
+    并行编码的变体平分 CPU 核心作为编码线程数。palette 时静态场景按调色板索引光栅化，
+    只有主题不同的变体复用同一份索引帧，只重新查表。jobs != 1 时所有变体共用一个进程池，
+    工作进程里的字体、图层、调色板缓存在变体之间保留。
+    """
+    resolve_fonts()
+    codec = check_codec(codec or PROFILES[profile]['codec'])
+    encoding = {
+        'codec': codec,
+        'threads': default_threads(encoders),
+        'args': profile_args(profile, codec, gv.FPS),
+    }
+    cache = SceneCache(cache_dir) if use_cache else None
+    scene_pool = ScenePool(jobs, stats=gv.render_cache_stats) if jobs != 1 else None
+    batch_start = time.perf_counter()
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(encoders, 1)) as pool:
+            pending = []
+            for variant in variants:
+                print(f"\n🎬 变体 {variant['name']}: {variant['spec']} (主题: {variant['theme']})")
+                start = time.perf_counter()
+                use_theme(variant['theme'])
+                scenes = load_scenes(variant['spec'], gv.SCENE_LAYOUTS, variant.get('overrides'))
+                frames = gv.build_scene_frames(scenes, jobs=jobs, cache=cache, palette=palette,
+                                               pool=scene_pool)
+                raster_time = time.perf_counter() - start
+                future = pool.submit(encode_variant, variant, scenes, frames,
+                                     backend, dedup, frame_mode, segments, encoding)
+                pending.append((variant, start, raster_time, future))
+
+            for variant, start, raster_time, future in pending:
+                duration, encode_time = future.result()
+                results.append({
+                    'name': variant['name'],
+                    'output': variant['output'],
+                    'duration': duration,
+                    'raster_seconds': raster_time,
+                    'encode_seconds': encode_time,
+                    'wall_seconds': time.perf_counter() - start,
+                })
+    finally:
+        if scene_pool is not None:
+            scene_pool.close()
+
+    total = time.perf_counter() - batch_start
+    print(f"\n{'变体':<16}{'光栅化(s)':>12}{'编码(s)':>10}{'视频(s)':>10}")
+    for r in results:
+        print(f"{r['name']:<16}{r['raster_seconds']:>12.2f}{r['encode_seconds']:>10.2f}{r['duration']:>10.1f}")
+    print(f"\n✅ {len(results)} 个变体完成，总耗时 {total:.2f}s")
+    # 本进程与各工作进程的缓存统计之和
+    stats = gv.render_cache_stats()
+    if scene_pool is not None:
+        for name, value in scene_pool.stats().items():
+            stats[name] += value
+    print(f"🔤 字体缓存: 命中 {stats['font_hits']} / 加载 {stats['font_misses']}")
+    print(f"🧱 图层缓存: 命中 {stats['layer_hits']} / 渲染 {stats['layer_misses']}")
+    if palette:
+        print(f"🎨 调色板光栅化: 复用 {stats['indexed_hits']} / 绘制 {stats['indexed_misses']}"
+              f" (图层: 命中 {stats['indexed_layer_hits']} / 绘制 {stats['indexed_layer_misses']})")
+    if cache is not None:
+        print(f"💾 场景缓存: 命中 {cache.hits} / 渲染 {cache.misses}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量生成视频变体")
+    parser.add_argument('variants', help="变体文件（JSON）")
+    parser.add_argument('--backend', choices=gv.BACKENDS, default='ffmpeg',
+                        help="渲染后端（默认 ffmpeg）")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="场景渲染进程数（0 表示使用全部 CPU 核心）")
+    parser.add_argument('--encoders', type=int, default=2,
+                        help="并行编码的变体数")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="不读写场景缓存")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="场景缓存目录")
+    parser.add_argument('--segments', action='store_true',
+                        help="ffmpeg 后端逐场景分段编码，变体间复用相同场景的片段")
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false',
+                        help="ffmpeg 后端逐帧写管道，不合并静止帧")
+    parser.add_argument('--frame-mode', choices=gv.FRAME_MODES, default='vfr',
+                        help="去重编码的帧率模式")
+    parser.add_argument('--profile', choices=PROFILES, default='web',
+                        help="编码档位：draft / web / archival")
+    parser.add_argument('--codec', choices=CODECS, default=None,
+                        help="视频编码器（默认由编码档位决定）")
+    parser.add_argument('--palette', action='store_true',
+                        help="静态场景按调色板索引光栅化，只有主题不同的变体只换调色板")
+    parser.add_argument('--report', default=None,
+                        help="把每个变体的耗时写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    variants = load_variants(args.variants)
+    results = run_batch(variants, backend=args.backend, jobs=args.jobs, encoders=args.encoders,
+                        use_cache=args.use_cache, cache_dir=args.cache_dir, dedup=args.dedup,
+                        frame_mode=args.frame_mode, segments=args.segments,
+                        profile=args.profile, codec=args.codec, palette=args.palette)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+渲染与编码性能基准
+覆盖各 create_* 场景函数、查表淡入淡出、moviepy 后端的时间轴取帧，以及两个后端在
+不同分辨率 / 编码器下的编码吞吐，输出 ms/场景 与 帧/秒。
+可以保存基线，之后与基线对比，超过阈值的变慢视为回归（退出码 1），适合在 CI 中检测
+Pillow / moviepy / numpy 升级带来的性能变化。
+
+用法:
+python benchmark.py                                   # 全部基准
+python benchmark.py --group scenes --group fade       # 只跑部分分组
+python benchmark.py --quick --save-baseline bench.json
+python benchmark.py --quick --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import generate_video as gv
+from encoder import find_ffmpeg
+from fades import apply_fade, fade_levels
+from fonts import resolve_fonts
+
+GROUPS = ('scenes', 'fade', 'timeline', 'encode')
+
+# 编码基准的分辨率与编码器矩阵
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080)}
+CODECS = ('libx264', 'mpeg4')
+
+
+def measure(func, repeat, warmup=1):
+    """多次运行 func，返回每次耗时（秒）"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(group, timings, units, unit_name):
+    """单个基准的结果：最快 / 平均耗时与每秒处理量"""
+    best = min(timings)
+    return {
+        'group': group,
+        'best_ms': best * 1000,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'units': units,
+        'unit': unit_name,
+        'per_second': units / best if best > 0 else float('inf'),
+    }
+
+
+def bench_scenes(repeat):
+    """各场景函数的光栅化耗时（字体已预热）"""
+    hook = gv.SCENES[0]['kwargs']
+    builders = {
+        'create_text_image': lambda: gv.create_text_image(**hook),
+        'create_logo_scene': gv.create_logo_scene,
+        'create_terminal_scene': gv.create_terminal_scene,
+        'create_chat_demo_scene': gv.create_chat_demo_scene,
+        'create_comparison_chart': gv.create_comparison_chart,
+        'create_github_end_scene': gv.create_github_end_scene,
+    }
+    return {f"scenes/{name}": result('scenes', measure(func, repeat), 1, 'scene')
+            for name, func in builders.items()}
+
+
+def bench_fade(scenes, frames, repeat):
+    """整段视频淡入淡出帧的查表耗时"""
+    out = np.empty_like(frames[0])
+    work = []
+    for scene, frame in zip(scenes, frames):
+        levels = fade_levels(scene['duration'], scene['fade_in'], scene['fade_out'], gv.FPS)
+        work.extend((frame, level) for level in levels if level < 255)
+
+    def run():
+        for frame, level in work:
+            apply_fade(frame, level, out=out)
+    return {'fade/apply_fade': result('fade', measure(run, repeat), len(work), 'frame')}
+
+
+def bench_timeline(scenes, frames, repeat):
+    """moviepy 后端的时间轴逐帧取帧（不编码）"""
+    total_frames = sum(int(round(s['duration'] * gv.FPS)) for s in scenes)
+
+    def run():
+        timeline = gv.SceneTimeline(scenes, frames, gv.FPS)
+        for n in range(timeline.total):
+            timeline.frame_at(n / gv.FPS)
+    return {'timeline/frame_at': result('timeline', measure(run, repeat), total_frames, 'frame')}
+
+
+def resize_frames(frames, size):
+    if frames[0].shape[1::-1] == tuple(size):
+        return frames
+    return [np.asarray(Image.fromarray(frame).resize(size, Image.BILINEAR)) for frame in frames]
+
+
+def bench_encode(scenes, frames, backends, repeat, dedup):
+    """各后端在不同分辨率 / 编码器下的整段编码耗时"""
+    results = {}
+    total_frames = sum(int(round(s['duration'] * gv.FPS)) for s in scenes)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for res_name, size in RESOLUTIONS.items():
+            sized = resize_frames(frames, size)
+            for codec in CODECS:
+                for backend in backends:
+                    output_path = os.path.join(output_dir, f"{backend}-{res_name}-{codec}.mp4")
+                    if backend == 'ffmpeg':
+                        def run():
+                            gv.write_video_ffmpeg(
+                                [(f, s['duration'], s['fade_in'], s['fade_out']) for s, f in zip(scenes, sized)],
+                                output_path, fps=gv.FPS, codec=codec, dedup=dedup)
+                    else:
+                        def run():
+                            encode_moviepy(scenes, sized, output_path, codec)
+                    try:
+                        timings = measure(run, repeat, warmup=0)
+                    except (ImportError, RuntimeError) as e:
+                        print(f"⚠️ 跳过 {backend}/{res_name}/{codec}: {e}")
+                        continue
+                    results[f"encode/{backend}/{res_name}/{codec}"] = result(
+                        'encode', timings, total_frames, 'frame')
+    return results
+
+
+def encode_moviepy(scenes, frames, output_path, codec):
+    """与 render_with_moviepy 相同的流程，编码器可选"""
+    gv.render_with_moviepy(scenes, frames, output_path, fps=gv.FPS, codec=codec, threads=4)
+
+
+def compare(results, baseline, threshold):
+    """与基线对比，返回回归的基准名列表"""
+    regressions = []
+    print(f"\n{'基准':<44}{'基线(ms)':>12}{'当前(ms)':>12}{'变化':>9}")
+    for name, entry in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name:<44}{'-':>12}{entry['best_ms']:>12.2f}{'新增':>9}")
+            continue
+        change = entry['best_ms'] / base['best_ms'] - 1 if base['best_ms'] > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' ❌'
+        print(f"{name:<44}{base['best_ms']:>12.2f}{entry['best_ms']:>12.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def environment():
+    """记录影响性能的环境信息，便于解释基线差异"""
+    import PIL
+    info = {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pillow': PIL.__version__}
+    try:
+        import moviepy
+        info['moviepy'] = moviepy.__version__
+    except ImportError:
+        info['moviepy'] = None
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="渲染与编码性能基准")
+    parser.add_argument('--group', choices=GROUPS, action='append',
+                        help="要运行的基准分组（可重复），默认全部")
+    parser.add_argument('--backend', choices=gv.BACKENDS, action='append',
+                        help="编码基准使用的后端（可重复），默认全部")
+    parser.add_argument('--repeat', type=int, default=3, help="每个基准重复次数")
+    parser.add_argument('--quick', action='store_true',
+                        help="缩短场景时长（1/4），用于 CI 快速检测")
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false',
+                        help="ffmpeg 后端逐帧写管道，不合并静止帧")
+    parser.add_argument('--save-baseline', default=None, help="把结果保存为基线 JSON")
+    parser.add_argument('--baseline', default=None, help="与基线 JSON 对比")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="相对基线变慢超过该比例视为回归（默认 0.15 即 15%%）")
+    args = parser.parse_args(argv)
+    groups = args.group or list(GROUPS)
+    backends = args.backend or list(gv.BACKENDS)
+
+    resolve_fonts()
+    scenes = gv.SCENES
+    if args.quick:
+        scenes = [{**s, 'duration': s['duration'] / 4, 'fade_in': s['fade_in'] / 4,
+                   'fade_out': s['fade_out'] / 4} for s in scenes]
+    frames = gv.build_scene_frames(scenes)
+
+    results = {}
+    if 'scenes' in groups:
+        results.update(bench_scenes(args.repeat))
+    if 'fade' in groups:
+        results.update(bench_fade(scenes, frames, args.repeat))
+    if 'timeline' in groups:
+        results.update(bench_timeline(scenes, frames, args.repeat))
+    if 'encode' in groups:
+        try:
+            find_ffmpeg()
+        except RuntimeError as e:
+            print(f"⚠️ 跳过 encode: {e}")
+        else:
+            results.update(bench_encode(scenes, frames, backends, max(1, args.repeat // 3), args.dedup))
+
+    print(f"\n{'基准':<44}{'最快(ms)':>12}{'平均(ms)':>12}{'吞吐':>16}")
+    for name, entry in results.items():
+        rate = f"{entry['per_second']:.1f} {entry['unit']}/s"
+        print(f"{name:<44}{entry['best_ms']:>12.2f}{entry['mean_ms']:>12.2f}{rate:>16}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'quick': args.quick, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != args.quick:
+            print("⚠️ 基线与本次的 --quick 设置不同，对比结果仅供参考")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 个基准相对基线变慢超过 {args.threshold:.0%}")
+            return 1
+        print(f"\n✅ 无超过 {args.threshold:.0%} 的性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
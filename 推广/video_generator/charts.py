@@ -0,0 +1,325 @@
+"""
+数据图表
+从 CSV / JSONL 用量日志流式读取并聚合，再编译为柱状图 / 折线图 / 堆叠柱状图的绘制指令。
+
+日志按块读取：每块若干行交给 numpy 解析（CSV 用 np.loadtxt 的 C 解析器），只取用到的列；
+分组键用 np.unique 编码，再用 np.bincount 累加到 (分组, 系列) 的聚合表里，块处理完即丢弃。
+内存占用只与分组数有关，与行数无关，百万行的日志也只保留聚合结果。
+坐标轴按数据最大值取 1 / 2 / 2.5 / 5 × 10^k 的整齐刻度。
+"""
+
+import csv
+import json
+import math
+import os
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+import numpy as np
+
+from render_plan import ellipse_op, line_op, rect_op, text_op, text_size
+
+# 每块读取的行数
+CHUNK_ROWS = 65536
+
+AGGREGATES = ('sum', 'mean', 'count', 'max')
+CHART_KINDS = ('bar', 'line', 'stacked')
+ORDERS = ('value', 'key', 'input')
+
+# groups: 分组名（横轴）；series: 系列名；values: (分组数, 系列数) 的聚合值
+UsageTable = namedtuple('UsageTable', ['groups', 'series', 'values'])
+
+
+# ---- 读取 ----
+
+def _csv_chunks(path, columns, chunk_rows):
+    """按块产出 CSV 中指定列的字符串数组"""
+    with open(path, encoding='utf-8', newline='') as f:
+        header = next(csv.reader([f.readline()]), [])
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise ValueError(f"{path}: 缺少列 {', '.join(missing)}，可选: {', '.join(header)}")
+        usecols = [header.index(c) for c in columns]
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                break
+            data = np.loadtxt(lines, delimiter=',', dtype=str, usecols=usecols, quotechar='"',
+                              comments=None, ndmin=2)
+            yield [data[:, i] for i in range(len(columns))]
+
+
+def _jsonl_chunks(path, columns, chunk_rows):
+    """按块产出 JSONL 中指定字段的数组"""
+    with open(path, encoding='utf-8') as f:
+        start = 1
+        while True:
+            lines = list(islice(f, chunk_rows))
+            if not lines:
+                break
+            rows = [json.loads(line) for line in lines if line.strip()]
+            chunk = []
+            for column in columns:
+                try:
+                    chunk.append(np.array([row[column] for row in rows]))
+                except KeyError:
+                    raise ValueError(f"{path}: 第 {start}-{start + len(lines) - 1} 行缺少字段 {column}")
+            start += len(lines)
+            yield chunk
+
+
+def read_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    """按块读取用量日志（.csv / .jsonl），产出 [列数组, ...]"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return _csv_chunks(path, columns, chunk_rows)
+    if ext in ('.jsonl', '.ndjson'):
+        return _jsonl_chunks(path, columns, chunk_rows)
+    raise ValueError(f"不支持的数据格式: {path}（可选 .csv / .jsonl）")
+
+
+# ---- 聚合 ----
+
+class GroupReducer:
+    """按 (分组, 系列) 流式累加数值：总和、行数、最大值"""
+
+    def __init__(self):
+        # 键 -> 编号，按首次出现的顺序
+        self.groups = {}
+        self.series = {}
+        self.sums = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.maxes = np.zeros((0, 0))
+
+    @staticmethod
+    def _codes(keys, table):
+        uniq, first, inverse = np.unique(keys.astype(str), return_index=True, return_inverse=True)
+        # 新键按在块内首次出现的位置编号，保持读取顺序
+        mapping = np.empty(len(uniq), dtype=np.int64)
+        for i in np.argsort(first, kind='stable').tolist():
+            mapping[i] = table.setdefault(uniq[i].item(), len(table))
+        return mapping[inverse.ravel()]
+
+    def _resize(self):
+        shape = (len(self.groups), len(self.series))
+        if shape == self.sums.shape:
+            return
+        rows, cols = self.sums.shape
+        for name, fill in (('sums', 0), ('counts', 0), ('maxes', -np.inf)):
+            old = getattr(self, name)
+            new = np.full(shape, fill, dtype=old.dtype)
+            new[:rows, :cols] = old
+            setattr(self, name, new)
+
+    def add(self, groups, series, values):
+        """累加一块数据；series 为 None 时只有一个系列"""
+        group_codes = self._codes(groups, self.groups)
+        if series is None:
+            series_codes = np.zeros(len(group_codes), dtype=np.int64)
+            self.series.setdefault('', 0)
+        else:
+            series_codes = self._codes(series, self.series)
+        self._resize()
+        width = len(self.series)
+        flat = group_codes * width + series_codes
+        cells = self.sums.size
+        values = np.asarray(values, dtype=float)
+        self.sums += np.bincount(flat, weights=values, minlength=cells).reshape(self.sums.shape)
+        self.counts += np.bincount(flat, minlength=cells).reshape(self.counts.shape)
+        np.maximum.at(self.maxes.reshape(-1), flat, values)
+
+    def table(self, agg='sum'):
+        """按聚合方式生成 UsageTable（没有数据的格子为 0）"""
+        if agg == 'sum':
+            values = self.sums
+        elif agg == 'count':
+            values = self.counts.astype(float)
+        elif agg == 'mean':
+            values = np.divide(self.sums, self.counts, out=np.zeros_like(self.sums),
+                               where=self.counts > 0)
+        elif agg == 'max':
+            values = np.where(self.counts > 0, self.maxes, 0.0)
+        else:
+            raise ValueError(f"未知的聚合方式: {agg}，可选: {', '.join(AGGREGATES)}")
+        return UsageTable(tuple(self.groups), tuple(self.series), values)
+
+
+def _parse_values(column, path, name):
+    try:
+        values = column.astype(float)
+    except (ValueError, TypeError):
+        # JSONL 中的嵌套值得到 object 数组，转换时抛出 TypeError
+        values = None
+    # JSONL 中的 null（缺失值）转换为 NaN，不能悄悄混入聚合结果
+    if values is None or np.isnan(values).any():
+        raise ValueError(f"{path}: 列 {name} 含有非数值内容或空值")
+    return values
+
+
+def aggregate_usage(path, group, value=None, series=None, agg='sum', chunk_rows=CHUNK_ROWS):
+    """流式读取用量日志并按 group（和 series）聚合 value；value 为 None 时统计行数"""
+    if agg not in AGGREGATES:
+        raise ValueError(f"未知的聚合方式: {agg}，可选: {', '.join(AGGREGATES)}")
+    columns = [group] + [c for c in (series, value) if c is not None]
+    reducer = GroupReducer()
+    for chunk in read_chunks(path, columns, chunk_rows):
+        keys = chunk[0]
+        labels = chunk[1] if series is not None else None
+        if value is None:
+            values = np.ones(len(keys))
+        else:
+            values = _parse_values(chunk[-1], path, value)
+        reducer.add(keys, labels, values)
+    return reducer.table('count' if value is None else agg)
+
+
+def sort_table(table, order='value', limit=None):
+    """按总量降序（value）/ 分组名（key）/ 出现顺序（input）排列分组，只保留前 limit 个"""
+    if order == 'value':
+        index = np.argsort(-table.values.sum(axis=1), kind='stable')
+    elif order == 'key':
+        index = sorted(range(len(table.groups)), key=lambda i: table.groups[i])
+    elif order == 'input':
+        index = range(len(table.groups))
+    else:
+        raise ValueError(f"未知的排序方式: {order}，可选: {', '.join(ORDERS)}")
+    index = list(index)[:limit]
+    return UsageTable(tuple(table.groups[i] for i in index), table.series, table.values[index])
+
+
+@lru_cache(maxsize=32)
+def _load_cached(path, stamp, group, value, series, agg, order, limit):
+    return sort_table(aggregate_usage(path, group, value, series, agg), order, limit)
+
+
+def load_usage(path, group, value=None, series=None, agg='sum', order='value', limit=None):
+    """读取、聚合并排序用量日志；文件未变化时复用上次的结果"""
+    info = os.stat(path)
+    return _load_cached(path, (info.st_mtime_ns, info.st_size), group, value, series, agg, order, limit)
+
+
+# ---- 坐标轴 ----
+
+def nice_scale(peak, ticks=5):
+    """覆盖 [0, peak] 的整齐坐标轴，返回 (上限, 刻度间隔)"""
+    if peak <= 0:
+        return float(ticks), 1.0
+    magnitude = 10 ** math.floor(math.log10(peak / ticks))
+    for multiple in (1, 2, 2.5, 5, 10):
+        step = multiple * magnitude
+        if step * ticks >= peak:
+            break
+    return step * math.ceil(peak / step - 1e-9), step
+
+
+def compact_number(value):
+    """刻度标签：12k / 1.5M 之类的短格式"""
+    for threshold, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'k')):
+        if abs(value) >= threshold:
+            return f"{value / threshold:.1f}".rstrip('0').rstrip('.') + suffix
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+# ---- 绘制指令 ----
+
+def _series_totals(table, kind):
+    if kind == 'stacked':
+        return table.values.sum(axis=1)
+    return table.values.max(axis=1) if table.values.size else np.zeros(0)
+
+
+def chart_ops(table, kind, box, palette, text_color, muted_color, grid_color, font_size=24):
+    """把聚合表画进 box = [x0, y0, x1, y1]：坐标轴、网格、柱子 / 折线和图例"""
+    if kind not in CHART_KINDS:
+        raise ValueError(f"未知的图表类型: {kind}，可选: {', '.join(CHART_KINDS)}")
+    x0, y0, x1, y1 = box
+    ops = []
+    totals = _series_totals(table, kind)
+    top, step = nice_scale(float(totals.max()) if totals.size else 0.0)
+    ticks = [step * i for i in range(int(round(top / step)) + 1)]
+    labels = [compact_number(tick) for tick in ticks]
+    label_width = max(text_size(label, 'sans', font_size)[0] for label in labels)
+    label_height = text_size('0', 'sans', font_size)[1]
+
+    # 图例占一行（多个系列时）
+    multi = len(table.series) > 1
+    if multi:
+        lx = x1
+        for i, name in reversed(list(enumerate(table.series))):
+            lx -= text_size(name, 'sans', font_size)[0]
+            ops.append(text_op((lx, y0), name, text_color, 'sans', font_size))
+            lx -= font_size + 8
+            ops.append(rect_op([lx, y0 + 4, lx + font_size - 4, y0 + font_size], fill=palette[i % len(palette)]))
+            lx -= 32
+        y0 += font_size * 2
+
+    plot_x0, plot_y0 = x0 + label_width + 16, y0 + label_height // 2
+    plot_x1, plot_y1 = x1, y1 - font_size * 2
+    plot_height = plot_y1 - plot_y0
+
+    def y_of(value):
+        return round(plot_y1 - value / top * plot_height)
+
+    # 网格与刻度
+    for tick, label in zip(ticks, labels):
+        y = y_of(tick)
+        ops.append(rect_op([plot_x0, y, plot_x1, y], fill=grid_color))
+        width = text_size(label, 'sans', font_size)[0]
+        ops.append(text_op((plot_x0 - 16 - width, y - label_height // 2 - font_size // 5), label,
+                           muted_color, 'sans', font_size))
+
+    groups = len(table.groups)
+    if not groups:
+        return ops
+    slot = (plot_x1 - plot_x0) / groups
+
+    # 分组标签：放不下时隔几个标一个
+    widest = max(text_size(str(g), 'sans', font_size)[0] for g in table.groups)
+    every = max(1, math.ceil((widest + 16) / slot))
+    for i, name in enumerate(table.groups):
+        if i % every:
+            continue
+        width = text_size(str(name), 'sans', font_size)[0]
+        cx = plot_x0 + slot * (i + 0.5)
+        ops.append(text_op((round(cx - width / 2), plot_y1 + font_size // 2), str(name),
+                           muted_color, 'sans', font_size))
+
+    values = table.values
+    if kind == 'line':
+        for j in range(len(table.series)):
+            color = palette[j % len(palette)]
+            points = [(round(plot_x0 + slot * (i + 0.5)), y_of(values[i, j])) for i in range(groups)]
+            if groups > 1:
+                ops.append(line_op(points, color, 4))
+            # 点不多时标出数据点
+            if groups <= 60:
+                for x, y in points:
+                    ops.append(ellipse_op([x - 6, y - 6, x + 6, y + 6], fill=color))
+        return ops
+
+    bar_span = slot * 0.7
+    columns = len(table.series) if kind == 'bar' else 1
+    bar_width = bar_span / columns
+    for i in range(groups):
+        left = plot_x0 + slot * i + (slot - bar_span) / 2
+        base = 0.0
+        for j in range(len(table.series)):
+            value = values[i, j]
+            if kind == 'bar':
+                bx0, bottom = left + bar_width * j, 0.0
+            else:
+                bx0, bottom = left, base
+                base += value
+            if value <= 0:
+                continue
+            ops.append(rect_op([round(bx0), y_of(bottom + value), round(bx0 + bar_width) - 1,
+                                y_of(bottom) - (1 if bottom else 0)],
+                               fill=palette[j % len(palette)]))
+        # 单系列 / 堆叠时在柱顶标出总量
+        total = values[i].sum()
+        if columns == 1 and total > 0 and every == 1:
+            label = compact_number(total)
+            width = text_size(label, 'sans', font_size)[0]
+            ops.append(text_op((round(left + bar_span / 2 - width / 2), y_of(total) - font_size - 8),
+                               label, text_color, 'sans', font_size))
+    return ops
@@ -0,0 +1,74 @@
+"""
+场景缩略图总览（contact sheet）
+把所有场景画面缩小后按网格排成一张 PNG，附场景序号、标题和时长，用于快速审核文案与版式。
+流式渲染时随帧经过逐个生成缩略图，不需要同时保留所有场景的原尺寸画面。
+"""
+
+import math
+from PIL import Image, ImageDraw
+
+from animation import still_frame
+from fonts import get_font
+from render_plan import to_rgb
+
+THUMB_WIDTH = 480
+COLUMNS = 3
+PADDING = 24
+LABEL_SIZE = 20
+
+
+class ContactSheet:
+    """逐个收集场景缩略图，最后排版保存"""
+
+    def __init__(self, columns=COLUMNS, thumb_width=THUMB_WIDTH, bg_color='#0F172A',
+                 text_color='#F8FAFC'):
+        self.columns = columns
+        self.thumb_width = thumb_width
+        self.bg_color = bg_color
+        self.text_color = text_color
+        self.thumbs = []
+
+    def add(self, frame, scene):
+        """缩小一个场景帧（动画取结束时的画面）并记录标签"""
+        frame = still_frame(frame, scene['duration'])
+        height, width = frame.shape[:2]
+        size = (self.thumb_width, max(1, round(height * self.thumb_width / width)))
+        thumb = Image.fromarray(frame).resize(size, Image.BILINEAR)
+        self.thumbs.append((thumb, f"{len(self.thumbs)+1}. {scene['title']}  ({scene['duration']}s)"))
+
+    def collect(self, frames, scenes):
+        """包装帧流：帧经过时生成缩略图，原样产出"""
+        for frame, scene in zip(frames, scenes):
+            self.add(frame, scene)
+            yield frame
+
+    def save(self, path):
+        """按网格排版写入 PNG，返回图片尺寸"""
+        if not self.thumbs:
+            raise ValueError("没有可排版的场景")
+        thumb_w = self.thumb_width
+        thumb_h = max(thumb.size[1] for thumb, _ in self.thumbs)
+        columns = max(1, min(self.columns, len(self.thumbs)))
+        rows = math.ceil(len(self.thumbs) / columns)
+        cell_w = thumb_w + PADDING
+        cell_h = thumb_h + LABEL_SIZE + PADDING * 2
+        sheet = Image.new('RGB', (columns * cell_w + PADDING, rows * cell_h + PADDING),
+                          to_rgb(self.bg_color))
+        draw = ImageDraw.Draw(sheet)
+        font = get_font('sans', LABEL_SIZE)
+        for i, (thumb, label) in enumerate(self.thumbs):
+            x = PADDING + (i % columns) * cell_w
+            y = PADDING + (i // columns) * cell_h
+            sheet.paste(thumb, (x, y))
+            draw.text((x, y + thumb_h + PADDING // 2), label, fill=to_rgb(self.text_color), font=font)
+        sheet.save(path)
+        return sheet.size
+
+
+def make_contact_sheet(frames, scenes, path, columns=COLUMNS, thumb_width=THUMB_WIDTH,
+                       bg_color='#0F172A', text_color='#F8FAFC'):
+    """把场景帧排成网格写入 PNG，返回图片尺寸"""
+    sheet = ContactSheet(columns, thumb_width, bg_color, text_color)
+    for frame, scene in zip(frames, scenes):
+        sheet.add(frame, scene)
+    return sheet.save(path)
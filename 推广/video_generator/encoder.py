@@ -0,0 +1,329 @@
+"""
+ffmpeg 编码器
+静态场景 + 线性淡入淡出不需要 moviepy 逐帧合成：
+- 管道模式：原始 RGB 帧直接写入 ffmpeg 子进程的 stdin（RGBX 帧整块以 rgb0 写入，不拷贝）
+- 去重模式：静止段只输出一帧并附带时长，编码量取决于不同帧的数量
+- 动画场景：按事件分段渲染，画面不变的段同样只输出一帧
+- 多分辨率输出：一次解码后用 split 滤镜分出各输出，分别缩放编码
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+from animation import source_runs
+from fades import MAX_LEVEL, apply_fade, fade_levels
+from frames import PACKED_PIX_FMT, pack, packed_buffer
+from profiler import stage
+
+# 去重编码的帧率模式
+FRAME_MODES = ('vfr', 'cfr')
+# 去重编码时末尾逐帧列出的帧数：B 帧重排最多延迟 2 帧（x264 / x265 的 b-pyramid）
+TAIL_FRAMES = 3
+# 去重编码时并行压缩 PNG 的线程数（zlib 压缩时释放 GIL）
+PNG_WRITERS = min(4, os.cpu_count() or 1)
+
+
+def find_ffmpeg():
+    """查找 ffmpeg 可执行文件：环境变量 > imageio-ffmpeg > PATH"""
+    path = os.environ.get('FFMPEG_BINARY')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        pass
+    path = shutil.which('ffmpeg')
+    if path is None:
+        raise RuntimeError("找不到 ffmpeg，请先安装：brew install ffmpeg")
+    return path
+
+
+def iter_scene_frames(frame, duration, fade_in, fade_out, fps):
+    """逐帧产出一个场景（含淡入淡出）的 RGBX 帧；frame 可以是静态帧或动画
+
+    动画帧与淡入淡出帧都写在复用的缓冲里，调用方需在取下一帧前消费完当前帧。
+    """
+    levels = fade_levels(duration, fade_in, fade_out, fps)
+    out = None
+    start = 0
+    for src, count in packed_runs(frame, len(levels), fps):
+        for level in levels[start:start + count]:
+            if level >= MAX_LEVEL:
+                yield src
+                continue
+            if out is None:
+                out = np.empty_like(src)
+            with stage('fade'):
+                faded = apply_fade(src, level, out=out)
+            yield faded
+        start += count
+
+
+def encode_args(codec='libx264', threads=4):
+    """输出端的公共编码参数"""
+    return ['-an', '-c:v', codec, '-pix_fmt', 'yuv420p', '-threads', str(threads)]
+
+
+def output_targets(output_path, size):
+    """output_path 为单个路径，或 [(路径, (宽, 高)), ...] 的多分辨率输出；返回 [(路径, 尺寸)]"""
+    if isinstance(output_path, (str, os.PathLike)):
+        return [(output_path, tuple(size))]
+    targets = [(path, tuple(out_size)) for path, out_size in output_path]
+    if not targets:
+        raise ValueError("没有输出文件")
+    return targets
+
+
+def scale_filter(source_size, size, pad_color=None):
+    """把源帧缩放到输出尺寸；宽高比不同时等比缩放后居中，四周用 pad_color（RGB，缺省黑色）留边
+
+    与单一输出直接按输出尺寸光栅化（scale_plan 用场景背景色留边）的画面一致。
+    """
+    if tuple(size) == tuple(source_size):
+        return 'null'
+    width, height = size
+    color = '0x{:02x}{:02x}{:02x}'.format(*pad_color) if pad_color else 'black'
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease:flags=lanczos,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color={color},setsar=1")
+
+
+def output_args(output_path, source_size, codec='libx264', threads=4, extra_args=(), rate_args=(),
+                input_filter=None, pad_color=None):
+    """输出端参数；有多个输出或需要缩放时用 split 滤镜，一次解码分别编码各输出
+
+    input_filter 作用在解码之后、分路之前，所有输出共用；pad_color 见 scale_filter。
+    """
+    targets = output_targets(output_path, source_size)
+    if len(targets) == 1 and targets[0][1] == tuple(source_size):
+        filter_args = ['-vf', input_filter] if input_filter else []
+        return [*filter_args, *rate_args, *encode_args(codec, threads), *extra_args, targets[0][0]]
+    head = f"{input_filter}," if input_filter else ''
+    chains = [f"[0:v]{head}split={len(targets)}" + ''.join(f"[s{i}]" for i in range(len(targets)))]
+    chains += [f"[s{i}]{scale_filter(source_size, size, pad_color)}[o{i}]" for i, (_, size) in enumerate(targets)]
+    args = ['-filter_complex', ';'.join(chains)]
+    for i, (path, _) in enumerate(targets):
+        args += ['-map', f'[o{i}]', *rate_args, *encode_args(codec, threads), *extra_args, path]
+    return args
+
+
+def open_ffmpeg_pipe(output_path, size, fps, codec='libx264', threads=4, extra_args=(),
+                     pix_fmt='rgb24', pad_color=None):
+    """启动以 rawvideo 为输入的 ffmpeg 子进程"""
+    width, height = size
+    cmd = [
+        find_ffmpeg(), '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+        '-s', f'{width}x{height}', '-r', str(fps),
+        '-i', '-',
+        *output_args(output_path, size, codec, threads, extra_args, pad_color=pad_color),
+    ]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+
+def checked_scenes(scenes):
+    """逐个校验场景分辨率一致，不提前取出整个序列；返回 ((宽, 高), 场景迭代器)
+
+    场景可以是惰性产生的迭代器，只有第一个场景会被提前取出。
+    """
+    scenes = iter(scenes)
+    first = next(scenes, None)
+    if first is None:
+        raise ValueError("没有可编码的场景")
+    height, width = first[0].shape[:2]
+
+    def iterate(head):
+        yield head
+        # 释放对第一个场景的引用，避免它在整个编码期间常驻内存
+        head = None
+        for scene in scenes:
+            frame = scene[0]
+            if frame.shape[:2] != (height, width):
+                raise ValueError(f"场景分辨率不一致: {frame.shape[1]}x{frame.shape[0]}")
+            yield scene
+    return (width, height), iterate(first)
+
+
+def pipe_pixels(frame):
+    """帧写入管道时使用的整块 RGBX 数组；普通 RGB 帧先转换（每个场景一次）"""
+    return packed_buffer(pack(frame))
+
+
+def packed_runs(source, count, fps):
+    """场景画面（静态帧或动画）展开为 (RGBX 帧, 重复帧数) 段"""
+    for frame, repeat in source_runs(source, count, fps):
+        yield pipe_pixels(frame), repeat
+
+
+def iter_frame_runs(scenes, fps):
+    """把场景序列折叠为连续相同帧的段，产出 (帧键, RGBX 源帧, 亮度级, 重复帧数)
+
+    同一场景同一画面段同一亮度级的帧必然相同，按 (场景序号, 画面段, 亮度级) 判等，
+    不需要逐帧比较像素；全黑帧与源帧无关，跨场景也能合并。
+    动画的帧缓冲会被下一段改写，每个画面段结束时先交出其中未完成的段。
+    """
+    run = None
+    for index, (frame, duration, fade_in, fade_out) in enumerate(scenes):
+        levels = fade_levels(duration, fade_in, fade_out, fps)
+        start = 0
+        for state, (src, count) in enumerate(packed_runs(frame, len(levels), fps)):
+            for level in levels[start:start + count]:
+                key = ('black',) if level <= 0 else (index, state, level)
+                if run is not None and run[0] == key:
+                    run[3] += 1
+                    continue
+                if run is not None:
+                    yield tuple(run)
+                run = [key, src, level, 1]
+            start += count
+            if run is not None and run[0] != ('black',):
+                yield tuple(run)
+                run = None
+    if run is not None:
+        yield tuple(run)
+
+
+def frame_micros(frames, fps):
+    """第 frames 帧的起始时间（微秒，四舍五入）"""
+    return (frames * 1000000 * 2 + fps) // (fps * 2)
+
+
+def rgb_image(frame):
+    """RGBX 帧转换为独立的 RGB 图像（拷贝一份，之后帧缓冲可以被改写）"""
+    height, width = frame.shape[:2]
+    img = Image.frombuffer('RGBX', (width, height), np.ascontiguousarray(frame), 'raw', 'RGBX', 0, 1)
+    return img.convert('RGB')
+
+
+def save_png(img, path):
+    """最快的压缩级别：幻灯片画面只有几十 KB，临时文件不随分辨率膨胀（1080p 的 PPM 约 6MB 一帧）"""
+    img.save(path, compress_level=1)
+
+
+def write_video_pipe(scenes, output_path, fps=30, codec='libx264', threads=4, extra_args=(),
+                     pad_color=None):
+    """逐帧写入 ffmpeg 管道（不去重），RGBX 缓冲整块以 rgb0 写入"""
+    size, scenes = checked_scenes(scenes)
+    proc = open_ffmpeg_pipe(output_path, size, fps, codec, threads, extra_args,
+                            pix_fmt=PACKED_PIX_FMT, pad_color=pad_color)
+    total = 0.0
+    try:
+        for frame, duration, fade_in, fade_out in scenes:
+            for out in iter_scene_frames(frame, duration, fade_in, fade_out, fps):
+                with stage('pipe_write'):
+                    proc.stdin.write(np.ascontiguousarray(out, dtype=np.uint8).data)
+            total += duration
+    finally:
+        proc.stdin.close()
+        with stage('ffmpeg'):
+            code = proc.wait()
+    if code != 0:
+        raise RuntimeError(f"ffmpeg 退出码 {code}")
+    return total
+
+
+def write_video_concat(scenes, output_path, fps=30, codec='libx264', threads=4, frame_mode='vfr',
+                       extra_args=(), pad_color=None):
+    """只把不同的帧压缩为 PNG 落盘，用 concat 分离器按时长播放
+
+    vfr：静止段在输出中只占一帧，编码量与不同帧数成正比；
+    cfr：由 ffmpeg 在内部重复帧，输出恒定帧率。
+    """
+    if frame_mode not in FRAME_MODES:
+        raise ValueError(f"未知的帧率模式: {frame_mode}，可选: {', '.join(FRAME_MODES)}")
+    size, scenes = checked_scenes(scenes)
+    total_frames = 0
+    with tempfile.TemporaryDirectory(prefix='synapse-frames-') as tmp_dir, \
+            ThreadPoolExecutor(max_workers=PNG_WRITERS) as writers:
+        written = {}
+        out = None
+        entries = []
+        # 压缩中的帧各持有一份拷贝，数量有上限
+        saving = deque()
+        # RGBX 缓冲是连续内存，查表比在跨步的 RGB 视图上快
+        for key, src, level, count in iter_frame_runs(scenes, fps):
+            name = written.get(key)
+            if name is None:
+                if level < MAX_LEVEL and out is None:
+                    out = np.empty_like(src)
+                name = f"frame-{len(written):05d}.png"
+                with stage('fade'):
+                    faded = apply_fade(src, level, out=out)
+                with stage('write_frames'):
+                    saving.append(writers.submit(save_png, rgb_image(faded), os.path.join(tmp_dir, name)))
+                    if len(saving) > PNG_WRITERS * 2:
+                        saving.popleft().result()
+                written[key] = name
+            entries.append((name, count))
+            total_frames += count
+        with stage('write_frames'):
+            while saving:
+                saving.popleft().result()
+        if not entries:
+            raise ValueError("没有可编码的帧")
+        # concat 分离器会忽略最后一项的 duration，末项只能是一帧；mp4 的时长又按最后一个包的
+        # 解码时间戳计算，vfr 以静止段结尾时解码时间戳落后整个静止段，视频会被截短。
+        # 末尾的 TAIL_FRAMES 帧逐帧列出，总帧数不变
+        tail = []
+        while entries and len(tail) < TAIL_FRAMES:
+            name, count = entries.pop()
+            take = min(count, TAIL_FRAMES - len(tail))
+            tail = [(name, 1)] * take + tail
+            if count > take:
+                entries.append((name, count - take))
+        entries += tail
+        lines = ['ffconcat version 1.0']
+        start = 0
+        for name, count in entries:
+            lines.append(f"file '{name}'")
+            # 图片分离器默认按 25fps（1/25 时间基）读入，时间戳会落在 0.04s 的网格上
+            lines.append(f"option framerate {fps}")
+            # concat 分离器按微秒累加时长：由累计帧数取整得到每项时长，误差不随项数累积
+            micros = frame_micros(start + count, fps) - frame_micros(start, fps)
+            lines.append(f"duration {micros // 1000000}.{micros % 1000000:06d}")
+            start += count
+        list_path = os.path.join(tmp_dir, 'frames.ffconcat')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        
+        print(f"📦 去重后 {len(written)} 个不同帧 / 共 {total_frames} 帧")
+        # vfr 每项输出一帧，cfr 输出 total_frames 帧；多出的帧一律截掉
+        if frame_mode == 'vfr':
+            rate_args = ['-fps_mode', 'vfr', '-frames:v', str(len(entries))]
+            input_filter = None
+        else:
+            rate_args = ['-fps_mode', 'cfr', '-r', str(fps), '-frames:v', str(total_frames)]
+            # 只靠 -r 补帧时按 delta-0.6 取整，静止段之后的一帧会提前；fps 滤镜按时间戳精确补帧
+            input_filter = f'fps={fps}'
+        cmd = [
+            find_ffmpeg(), '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            *output_args(output_path, size, codec, threads, extra_args, rate_args, input_filter,
+                         pad_color),
+        ]
+        with stage('ffmpeg'):
+            code = subprocess.call(cmd)
+    if code != 0:
+        raise RuntimeError(f"ffmpeg 退出码 {code}")
+    return total_frames / fps
+
+
+def write_video_ffmpeg(scenes, output_path, fps=30, codec='libx264', threads=4,
+                       dedup=True, frame_mode='vfr', extra_args=(), pad_color=None):
+    """把 (帧, 时长, 淡入, 淡出) 序列编码为视频，返回视频时长
+
+    scenes 可以是惰性产生的迭代器，编码时逐个消费，已编码场景的帧随即释放；
+    帧也可以是动画（animation.Animation），编码时按需逐段渲染。
+    output_path 可以是 [(路径, (宽, 高)), ...]，在同一次编码中输出多个分辨率；
+    宽高比与源帧不同的输出四周用 pad_color 留边。
+    """
+    if dedup:
+        return write_video_concat(scenes, output_path, fps, codec, threads, frame_mode, extra_args,
+                                  pad_color)
+    return write_video_pipe(scenes, output_path, fps, codec, threads, extra_args, pad_color)
@@ -0,0 +1,64 @@
+"""
+查表淡入淡出
+淡入淡出系数量化为 0-255 的整数亮度级，每个亮度级预计算一张 256 项的 uint8 查找表，
+帧变换只做一次整数查表，不产生 float64 中间数组。相同亮度级在所有场景间复用。
+"""
+
+from functools import lru_cache
+import numpy as np
+
+MAX_LEVEL = 255
+
+# 分块查表的行数：np.take 内部会把索引转换为 intp，分块把这部分临时内存限制在几 MB
+CHUNK_ROWS = 64
+
+
+def fade_factor(t, duration, fade_in, fade_out):
+    """与 vfx.FadeIn / vfx.FadeOut 相同的线性淡入淡出系数"""
+    factor = 1.0
+    if fade_in > 0 and t < fade_in:
+        factor = min(factor, t / fade_in)
+    if fade_out > 0 and duration - t < fade_out:
+        factor = min(factor, max(duration - t, 0) / fade_out)
+    return factor
+
+
+def fade_level(t, duration, fade_in, fade_out):
+    """t 时刻的整数亮度级（0 为全黑，255 为原图）"""
+    return int(round(fade_factor(t, duration, fade_in, fade_out) * MAX_LEVEL))
+
+
+@lru_cache(maxsize=MAX_LEVEL + 1)
+def fade_lut(level):
+    """亮度级对应的查找表：lut[v] = round(v * level / 255)"""
+    if not 0 <= level <= MAX_LEVEL:
+        raise ValueError(f"亮度级超出范围: {level}")
+    lut = (np.arange(256, dtype=np.uint16) * level + MAX_LEVEL // 2) // MAX_LEVEL
+    lut = lut.astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_fade(frame, level, out=None):
+    """对 uint8 帧应用亮度级，结果写入 out（可复用的帧缓冲）"""
+    if frame.dtype != np.uint8:
+        raise TypeError(f"淡入淡出只支持 uint8 帧，实际为 {frame.dtype}")
+    if level >= MAX_LEVEL:
+        return frame
+    if out is None:
+        out = np.empty_like(frame)
+    if level <= 0:
+        out.fill(0)
+        return out
+    lut = fade_lut(level)
+    for start in range(0, frame.shape[0], CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        # uint8 索引必然在表内，mode='clip' 避免 out 被额外缓冲
+        np.take(lut, frame[start:stop], out=out[start:stop], mode='clip')
+    return out
+
+
+def fade_levels(duration, fade_in, fade_out, fps):
+    """场景每一帧的亮度级序列"""
+    n_frames = int(round(duration * fps))
+    return [fade_level(i / fps, duration, fade_in, fade_out) for i in range(n_frames)]
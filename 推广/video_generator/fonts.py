@@ -0,0 +1,96 @@
+"""
+字体注册表
+进程内共享的字体缓存，所有场景通过 (字体角色, 字号) 取字体，
+字体文件只在启动时探测一次，每个字号只解析一次。
+"""
+
+import os
+from functools import lru_cache
+from PIL import ImageFont
+
+from profiler import stage
+
+# 每个字体角色的候选路径，按优先级排列
+FONT_CANDIDATES = {
+    'sans': [
+        "/System/Library/Fonts/PingFang.ttc",
+        "/System/Library/Fonts/STHeiti Light.ttc",
+        "/System/Library/Fonts/Helvetica.ttc",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+    ],
+    'mono': [
+        "/System/Library/Fonts/SF-Mono-Regular.otf",
+        "/System/Library/Fonts/Menlo.ttc",
+        "/System/Library/Fonts/Courier.dfont",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+    ]
+}
+
+FONT_CACHE_SIZE = 64
+
+# 角色 -> 已解析的字体路径（None 表示回退到默认字体）
+_resolved_paths = {}
+
+
+def resolve_fonts():
+    """启动时对所有字体角色做一次路径解析"""
+    _resolved_paths.clear()
+    for role, paths in FONT_CANDIDATES.items():
+        _resolved_paths[role] = None
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                ImageFont.truetype(path, 12)
+            except OSError:
+                continue
+            _resolved_paths[role] = path
+            break
+    return dict(_resolved_paths)
+
+
+def font_path(role):
+    """返回字体角色对应的文件路径"""
+    if role not in FONT_CANDIDATES:
+        raise KeyError(f"未知的字体角色: {role}")
+    if not _resolved_paths:
+        resolve_fonts()
+    return _resolved_paths[role]
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(role, size):
+    """按 (字体角色, 字号) 获取字体，结果进程内缓存"""
+    path = font_path(role)
+    with stage('font_load'):
+        if path is None:
+            return ImageFont.load_default()
+        return ImageFont.truetype(path, size)
+
+
+def font_cache_stats():
+    """字体缓存命中统计"""
+    info = get_font.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'paths': dict(_resolved_paths)
+    }
+
+
+def font_fingerprint():
+    """已解析字体的 (角色, 路径, 修改时间)，用于场景缓存键"""
+    fingerprint = []
+    for role in sorted(FONT_CANDIDATES):
+        path = font_path(role)
+        mtime = os.path.getmtime(path) if path else None
+        fingerprint.append((role, path, mtime))
+    return fingerprint
+
+
+def clear_font_cache():
+    """清空字体缓存（字体文件变化后调用）"""
+    get_font.cache_clear()
+    _resolved_paths.clear()
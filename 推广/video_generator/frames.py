@@ -0,0 +1,82 @@
+"""
+帧缓冲
+场景帧的内存由 numpy 分配：Pillow 以 RGBX 模式通过 Image.frombuffer 直接映射这块内存绘制，
+绘制完成后交出只读的 (高, 宽, 3) RGB 视图。光栅化、缓存、淡入淡出到写入 ffmpeg 管道，
+每个场景帧在内存中只有这一份；编码时整块 RGBX 缓冲以 rgb0 像素格式直接写入管道。
+
+Pillow 的 np.asarray(img) / __array_interface__ 会经过 tobytes() 整帧拷贝，
+所以这里反过来由 numpy 持有内存、Pillow 映射。
+"""
+
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+
+CHANNELS = 4
+
+# RGBX 缓冲对应的 ffmpeg rawvideo 像素格式（第四字节忽略）
+PACKED_PIX_FMT = 'rgb0'
+
+# 写盘 / 哈希时每次转换为连续内存的行数
+CHUNK_ROWS = 64
+
+
+@lru_cache(maxsize=8)
+def background_pixels(size, color):
+    """纯色背景的 RGBX 缓冲（只读），每种 (尺寸, 颜色) 只填充一次"""
+    width, height = size
+    buf = np.empty((height, width, CHANNELS), dtype=np.uint8)
+    buf[...] = (*color[:3], 255)
+    buf.flags.writeable = False
+    return buf
+
+
+def new_canvas(size, color):
+    """分配 RGBX 帧缓冲并返回映射它的 Pillow 图像 (图像, 缓冲)；背景从缓存的纯色缓冲整块复制"""
+    width, height = size
+    buf = np.empty((height, width, CHANNELS), dtype=np.uint8)
+    np.copyto(buf, background_pixels((width, height), tuple(color[:3])))
+    img = Image.frombuffer('RGBX', size, buf, 'raw', 'RGBX', 0, 1)
+    # frombuffer 的图像默认只读，绘制前 Pillow 会先拷贝一份；缓冲归我们所有，允许直接写入
+    img.readonly = 0
+    return img, buf
+
+
+def as_frame(buf):
+    """RGBX 缓冲的只读 RGB 视图"""
+    frame = buf[..., :3]
+    frame.flags.writeable = False
+    return frame
+
+
+def packed_buffer(frame):
+    """帧背后的整块 RGBX 缓冲（只读、连续）；不是 RGBX 缓冲的视图时返回 None"""
+    height, width = frame.shape[:2]
+    if frame.dtype != np.uint8 or frame.strides != (width * CHANNELS, CHANNELS, 1):
+        return None
+    # 视图的 base 可能是 RGBX 数组本身，也可能是它背后的一维数组（如 np.load 的结果）
+    base = frame.base
+    if not isinstance(base, np.ndarray) or not base.flags.c_contiguous:
+        return None
+    start = frame.ctypes.data
+    if start < base.ctypes.data or start + height * width * CHANNELS > base.ctypes.data + base.nbytes:
+        return None
+    return np.lib.stride_tricks.as_strided(frame, (height, width, CHANNELS),
+                                           (width * CHANNELS, CHANNELS, 1), writeable=False)
+
+
+def pack(frame):
+    """把普通 RGB 数组转换为 RGBX 帧；已经是 RGBX 帧时原样返回"""
+    if packed_buffer(frame) is not None:
+        return frame
+    height, width = frame.shape[:2]
+    buf = np.empty((height, width, CHANNELS), dtype=np.uint8)
+    buf[..., :3] = frame
+    buf[..., 3] = 255
+    return as_frame(buf)
+
+
+def iter_rows(frame, rows=CHUNK_ROWS):
+    """按行块产出连续内存的 RGB 数据，用于写盘 / 哈希，避免整帧拷贝"""
+    for start in range(0, frame.shape[0], rows):
+        yield np.ascontiguousarray(frame[start:start + rows], dtype=np.uint8).data
@@ -5,309 +5,412 @@ Synapse AI 演示视频生成器
 
 安装依赖:
 /usr/bin/python3 -m pip install moviepy pillow numpy --user
+
+用法:
+python generate_video.py                    # moviepy 后端
+python generate_video.py --backend ffmpeg   # 静止帧去重编码，跳过 moviepy 合成
+python generate_video.py --backend ffmpeg --no-dedup   # 逐帧写入 ffmpeg 管道
+python generate_video.py --backend ffmpeg --segments   # 分段编码，只重新编码改动的场景
+python generate_video.py --spec scenes/demo.json       # 从场景描述文件生成
+python generate_video.py --backend ffmpeg --resolution 720p --resolution 1080p --resolution vertical
+                                                       # 一次编码输出多个分辨率
+python generate_video.py --preview --contact-sheet     # 快速预览 + 场景缩略图总览
+python generate_video.py --backend ffmpeg --profile archival --codec libx265   # 编码档位与编码器
+python generate_video.py --theme light --palette       # 配色主题，静态场景按调色板光栅化
 """
 
+import argparse
 import os
 import sys
-from moviepy import *
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+
+from fonts import resolve_fonts, font_cache_stats
+from render_plan import (RenderPlan, compile_plan, rasterize, text_op, rect_op, rounded_rect_op,
+                         ellipse_op, layer_op, layer_cache_stats, text_bbox, text_size, centered_x)
+from text_layout import advance_width, layout_text
+from themes import THEMES, current_theme, use_theme
+from palette import indexed_cache_stats, rasterize_themed
+from encoder import FRAME_MODES, write_video_ffmpeg
+from asciicast import TerminalGrid, cast_events, cast_size
+from charts import chart_ops, load_usage
+from animation import (ANIMATION_PLANS, ChartPlan, SpritePlan, animation_event, make_animation,
+                       make_animation_plan, make_bar, make_counter, make_sprite, source_runs)
+from fades import MAX_LEVEL, apply_fade, fade_level
+from scheduler import iter_scenes_parallel, resolve_jobs
+from scene_cache import DEFAULT_CACHE_DIR, SceneCache, scene_key
+from segments import write_video_segments
+from scene_spec import load_scenes
+from contact_sheet import ContactSheet
+from profiles import CODECS, PROFILES, check_codec, default_threads, profile_args
+from profiler import stage, enable as enable_profiler, disable as disable_profiler
 
 # 配置
 OUTPUT_DIR = "/Users/ricardo/Documents/公司学习文件/Kimi_Agent_Clawdbot 轻量化改造/synapse-ai/推广"
-RESOLUTION = (1920, 1080)  # 1080p
+RESOLUTION = (1920, 1080)  # 布局设计尺寸（1080p），其他输出分辨率按比例缩放
 FPS = 30
 
-# 颜色主题
-COLORS = {
-    'bg_dark': '#0F172A',
-    'primary': '#3B82F6',
-    'secondary': '#10B981',
-    'accent': '#F59E0B',
-    'text': '#F8FAFC',
-    'text_muted': '#94A3B8'
+# 常用输出分辨率，--resolution 也接受 宽x高
+RESOLUTION_PRESETS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+    'vertical': (1080, 1920),
 }
 
-def hex_to_rgb(hex_color):
-    """将 hex 颜色转换为 RGB"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+# 预览模式：低分辨率、低帧率、draft 编码档位（ultrafast），用于文案审核
+PREVIEW_RESOLUTION = '640x360'
+PREVIEW_FPS = 10
 
-def create_text_image(text, size=RESOLUTION, font_size=60, color=COLORS['text'], 
-                      bg_color=COLORS['bg_dark'], subtext=None):
-    """创建文字图片"""
-    img = Image.new('RGB', size, hex_to_rgb(bg_color))
-    draw = ImageDraw.Draw(img)
-    
-    # 尝试使用系统字体
-    font_paths = [
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-    ]
-    
-    font_large = None
-    font_small = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font_large = ImageFont.truetype(path, font_size)
-                font_small = ImageFont.truetype(path, font_size//2)
-                break
-            except:
-                continue
-    
-    if font_large is None:
-        font_large = ImageFont.load_default()
-        font_small = ImageFont.load_default()
+# 流式渲染时预先渲染（渲染中 / 等待编码）的场景数上限
+DEFAULT_WINDOW = 2
+
+def layout_text_image(text, size=RESOLUTION, font_size=60, color='text', 
+                      bg_color='bg_dark', subtext=None):
+    """文字场景布局；color / bg_color 可以是主题颜色名或 hex"""
+    colors = current_theme()
+    color, bg_color = colors.color(color), colors.color(bg_color)
+    ops = []
     
     # 主文字
-    bbox = draw.textbbox((0, 0), text, font=font_large)
-    text_width = bbox[2] - bbox[0]
-    text_height = bbox[3] - bbox[1]
+    text_width, text_height = text_size(text, 'sans', font_size)
     x = (size[0] - text_width) // 2
     y = (size[1] - text_height) // 2 - 50 if subtext else (size[1] - text_height) // 2
-    draw.text((x, y), text, fill=hex_to_rgb(color), font=font_large)
+    ops.append(text_op((x, y), text, color, 'sans', font_size))
     
     # 副文字
     if subtext:
-        bbox2 = draw.textbbox((0, 0), subtext, font=font_small)
-        text_width2 = bbox2[2] - bbox2[0]
-        x2 = (size[0] - text_width2) // 2
+        x2 = centered_x(subtext, 'sans', font_size//2, size[0])
         y2 = y + text_height + 40
-        draw.text((x2, y2), subtext, fill=hex_to_rgb(COLORS['text_muted']), font=font_small)
-    
-    return np.array(img)
-
-def create_comparison_chart():
-    """创建Token消耗对比图"""
-    img = Image.new('RGB', RESOLUTION, hex_to_rgb(COLORS['bg_dark']))
-    draw = ImageDraw.Draw(img)
-    
-    font_paths = [
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "/System/Library/Fonts/Helvetica.ttc"
-    ]
-    
-    font_title = font_label = font_num = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font_title = ImageFont.truetype(path, 48)
-                font_label = ImageFont.truetype(path, 32)
-                font_num = ImageFont.truetype(path, 28)
-                break
-            except:
-                continue
-    
-    if font_title is None:
-        font_title = font_label = font_num = ImageFont.load_default()
+        ops.append(text_op((x2, y2), subtext, colors['text_muted'], 'sans', font_size//2))
     
-    # 标题
-    title = "同样的代码审查任务 - Token 消耗对比"
-    bbox = draw.textbbox((0, 0), title, font=font_title)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0])) // 2
-    draw.text((x, 80), title, fill=hex_to_rgb(COLORS['text']), font=font_title)
-    
-    # 数据
-    data = [
-        ("Claude Code", 15000, "#EF4444", "$0.45"),
-        ("Cursor", 10000, "#F59E0B", "$0.30"),
-        ("Synapse AI", 5000, "#10B981", "$0.15 节省60%")
-    ]
-    
-    max_tokens = 15000
-    bar_max_width = 800
-    start_y = 250
-    bar_height = 80
-    gap = 120
-    
-    for i, (name, tokens, color, cost) in enumerate(data):
+    return RenderPlan(tuple(size), bg_color, tuple(ops))
+
+def create_text_image(text, size=RESOLUTION, font_size=60, color='text', 
+                      bg_color='bg_dark', subtext=None):
+    """创建文字图片"""
+    return rasterize(layout_text_image(text, size, font_size, color, bg_color, subtext))
+
+# Token 对比数据：(名称, Token 数, 颜色, 成本)
+CHART_DATA = (
+    ("Claude Code", 15000, "#EF4444", "$0.45"),
+    ("Cursor", 10000, "#F59E0B", "$0.30"),
+    ("Synapse AI", 5000, "#10B981", "$0.15 节省60%")
+)
+
+CHART_BAR_X = 400
+CHART_BAR_WIDTH = 800
+CHART_BAR_HEIGHT = 80
+
+def chart_rows(data, start_y=250, gap=120):
+    """对比图每一行的 (柱子满格框, 数值位置, 数据)"""
+    rows = []
+    for i, row in enumerate(data):
         y = start_y + i * gap
-        bar_width = int((tokens / max_tokens) * bar_max_width)
+        box = (CHART_BAR_X, y, CHART_BAR_X + CHART_BAR_WIDTH, y + CHART_BAR_HEIGHT)
+        rows.append((box, (420 + CHART_BAR_WIDTH + 20, y + 25), row))
+    return rows
+
+def chart_background(heading, data, size=RESOLUTION):
+    """对比图中不随数值变化的部分：标题、标签、柱子背景和成本"""
+    colors = current_theme()
+    ops = []
+    
+    # 标题
+    x = centered_x(heading, 'sans', 48, size[0])
+    ops.append(text_op((x, 80), heading, colors['text'], 'sans', 48))
+    
+    for box, _, (name, tokens, color, cost) in chart_rows(data):
+        y = box[1]
         
         # 标签
-        draw.text((150, y+20), name, fill=hex_to_rgb(COLORS['text']), font=font_label)
+        ops.append(text_op((150, y+20), name, colors['text'], 'sans', 32))
         
         # 柱状图背景
-        draw.rectangle([400, y, 400+bar_max_width, y+bar_height], 
-                      fill=hex_to_rgb('#1E293B'), outline=hex_to_rgb('#334155'), width=2)
+        ops.append(rect_op(box, fill=colors['surface'], outline=colors['border'], width=2))
+        
+        # 成本
+        cost_x = 420 + CHART_BAR_WIDTH + 250
+        ops.append(text_op((cost_x, y+25), cost, color, 'sans', 28))
+    
+    return ops
+
+def chart_max_tokens(data, max_tokens=None):
+    """满格对应的 Token 数，缺省取数据中的最大值"""
+    return max_tokens or max((row[1] for row in data), default=0) or 1
+
+def layout_comparison_chart(heading="同样的代码审查任务 - Token 消耗对比", data=CHART_DATA,
+                            max_tokens=None, size=RESOLUTION):
+    """Token消耗对比图布局；max_tokens 缺省按数据最大值满格"""
+    colors = current_theme()
+    ops = chart_background(heading, data, size)
+    max_tokens = chart_max_tokens(data, max_tokens)
+    
+    for box, value_xy, (name, tokens, color, cost) in chart_rows(data):
+        x0, y0, _, y1 = box
+        bar_width = int((tokens / max_tokens) * CHART_BAR_WIDTH)
         
         # 柱状图
-        draw.rectangle([400, y, 400+bar_width, y+bar_height], 
-                      fill=hex_to_rgb(color))
+        ops.append(rect_op([x0, y0, x0+bar_width, y1], fill=color))
         
         # Token 数值
-        draw.text((420+bar_max_width+20, y+25), f"{tokens:,} tokens", 
-                 fill=hex_to_rgb(COLORS['text']), font=font_num)
-        
-        # 成本
-        cost_x = 420+bar_max_width+250
-        draw.text((cost_x, y+25), cost, fill=hex_to_rgb(color), font=font_num)
+        ops.append(text_op(value_xy, f"{tokens:,} tokens", colors['text'], 'sans', 28))
     
-    return np.array(img)
+    return RenderPlan(tuple(size), colors['bg_dark'], tuple(ops))
 
-def create_logo_scene():
-    """创建Logo展示场景"""
-    img = Image.new('RGB', RESOLUTION, hex_to_rgb(COLORS['bg_dark']))
-    draw = ImageDraw.Draw(img)
-    
-    font_paths = [
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "/System/Library/Fonts/Helvetica.ttc"
-    ]
-    
-    font_logo = font_tagline = font_features = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font_logo = ImageFont.truetype(path, 120)
-                font_tagline = ImageFont.truetype(path, 48)
-                font_features = ImageFont.truetype(path, 36)
-                break
-            except:
-                continue
-    
-    if font_logo is None:
-        font_logo = font_tagline = font_features = ImageFont.load_default()
+def layout_animated_chart(heading="同样的代码审查任务 - Token 消耗对比", data=CHART_DATA,
+                          max_tokens=None, start=0.3, grow=1.5, stagger=0.3,
+                          size=RESOLUTION):
+    """柱子逐根生长、Token 数值同步递增的对比图动画布局
+
+    每一行比上一行晚 stagger 秒开始，grow 秒内长到最终长度；完成后的画面即静态对比图。
+    """
+    colors = current_theme()
+    base = RenderPlan(tuple(size), colors['bg_dark'], tuple(chart_background(heading, data, size)))
+    max_tokens = chart_max_tokens(data, max_tokens)
+    bars, counters = [], []
+    for i, (box, value_xy, (name, tokens, color, cost)) in enumerate(chart_rows(data)):
+        t = start + i * stagger
+        bars.append(make_bar(box, color, tokens / max_tokens, t, grow))
+        counters.append(make_counter(value_xy, tokens, "{:,} tokens", colors['text'], 'sans', 28,
+                                     t, grow))
+    final = layout_comparison_chart(heading, data, max_tokens, size)
+    return ChartPlan(base, final, tuple(bars), tuple(counters))
+
+def create_comparison_chart(animated=False):
+    """创建Token消耗对比图；animated 时返回柱子生长的动画"""
+    if animated:
+        return make_animation(layout_animated_chart())
+    return rasterize(layout_comparison_chart())
+
+# 数据图表的系列配色
+CHART_PALETTE = ('#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#EC4899', '#14B8A6')
+
+def layout_data_chart(source, group, value=None, series=None, kind='bar', agg='sum', order=None,
+                      limit=None, heading=None, size=RESOLUTION):
+    """用量数据图表布局：从 CSV / JSONL 日志聚合后画柱状图 / 折线图 / 堆叠柱状图
+
+    按 group 列分组、series 列分系列，对 value 列做 agg（sum / mean / count / max）聚合；
+    value 缺省时统计行数。order 缺省时折线图按分组名、其他按总量降序，limit 只保留前几个分组。
+    """
+    colors = current_theme()
+    if order is None:
+        order = 'key' if kind == 'line' else 'value'
+    table = load_usage(source, group, value, series, agg, order, limit)
+    if heading is None:
+        heading = f"{value or 'rows'} by {group}"
+    ops = []
+    
+    # 标题
+    x = centered_x(heading, 'sans', 48, size[0])
+    ops.append(text_op((x, 80), heading, colors['text'], 'sans', 48))
+    
+    ops.extend(chart_ops(table, kind, (120, 200, size[0] - 120, size[1] - 80), CHART_PALETTE,
+                         colors['text'], colors['text_muted'], colors['border']))
+    return RenderPlan(tuple(size), colors['bg_dark'], tuple(ops))
+
+# 计划缓存按数据文件的修改时间和大小失效
+layout_data_chart.file_args = ('source',)
+
+# 核心卖点
+LOGO_FEATURES = (
+    "✓ Token 消耗降低 60%",
+    "✓ 完全开源免费", 
+    "✓ 微信机器人集成",
+    "✓ 本地优先，隐私保护"
+)
+
+def logo_layer(radius, fill, outline=None, width=1, background=None):
+    """Logo 圆圈图层（直径 2*radius+1 的方块），background 缺省为主题背景色"""
+    diameter = 2 * radius
+    background = background or current_theme()['bg_dark']
+    return RenderPlan((diameter + 1, diameter + 1), background,
+                      (ellipse_op([0, 0, diameter, diameter], fill=fill, outline=outline, width=width),))
+
+def layout_logo_scene(name="Synapse AI", tagline="轻量级个人 AI 助手", features=LOGO_FEATURES,
+                      size=RESOLUTION):
+    """Logo展示场景布局"""
+    colors = current_theme()
+    ops = []
     
     # 绘制Logo圆圈
-    center_x, center_y = RESOLUTION[0]//2, 280
+    center_x, center_y = size[0]//2, 280
     radius = 100
-    draw.ellipse([center_x-radius, center_y-radius, 
-                  center_x+radius, center_y+radius], 
-                 fill=hex_to_rgb(COLORS['primary']), 
-                 outline=hex_to_rgb(COLORS['secondary']), width=8)
+    ops.append(layer_op((center_x-radius, center_y-radius),
+                        logo_layer(radius, colors['primary'], colors['secondary'], 8)))
     
     # 产品名
-    name = "Synapse AI"
-    bbox = draw.textbbox((0, 0), name, font=font_logo)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-    draw.text((x, 430), name, fill=hex_to_rgb(COLORS['text']), font=font_logo)
+    x = centered_x(name, 'sans', 120, size[0])
+    ops.append(text_op((x, 430), name, colors['text'], 'sans', 120))
     
     # 标语
-    tagline = "轻量级个人 AI 助手"
-    bbox = draw.textbbox((0, 0), tagline, font=font_tagline)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-    draw.text((x, 580), tagline, fill=hex_to_rgb(COLORS['text_muted']), font=font_tagline)
+    x = centered_x(tagline, 'sans', 48, size[0])
+    ops.append(text_op((x, 580), tagline, colors['text_muted'], 'sans', 48))
     
     # 核心卖点
-    features = [
-        "✓ Token 消耗降低 60%",
-        "✓ 完全开源免费", 
-        "✓ 微信机器人集成",
-        "✓ 本地优先，隐私保护"
-    ]
     y_start = 700
     for i, feature in enumerate(features):
-        bbox = draw.textbbox((0, 0), feature, font=font_features)
-        x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-        draw.text((x, y_start + i*60), feature, fill=hex_to_rgb(COLORS['secondary']), font=font_features)
-    
-    return np.array(img)
-
-def create_terminal_scene():
-    """创建终端命令场景"""
-    img = Image.new('RGB', RESOLUTION, hex_to_rgb('#1E1E1E'))
-    draw = ImageDraw.Draw(img)
-    
-    font_paths = [
-        "/System/Library/Fonts/SF-Mono-Regular.otf",
-        "/System/Library/Fonts/Menlo.ttc",
-        "/System/Library/Fonts/Courier.dfont"
-    ]
-    
-    font = font_bold = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font = ImageFont.truetype(path, 28)
-                font_bold = ImageFont.truetype(path, 32)
-                break
-            except:
-                continue
-    
-    if font is None:
-        font = font_bold = ImageFont.load_default()
-    
-    # 终端标题栏
-    draw.rectangle([0, 0, RESOLUTION[0], 40], fill=hex_to_rgb('#323232'))
-    
-    # 红绿灯
-    draw.ellipse([20, 12, 36, 28], fill=hex_to_rgb('#FF5F56'))
-    draw.ellipse([46, 12, 62, 28], fill=hex_to_rgb('#FFBD2E'))
-    draw.ellipse([72, 12, 88, 28], fill=hex_to_rgb('#27C93F'))
+        x = centered_x(feature, 'sans', 36, size[0])
+        ops.append(text_op((x, y_start + i*60), feature, colors['secondary'], 'sans', 36))
     
-    # 终端内容
-    commands = [
-        ("$ ", "#6CC644"),
-        ("git clone https://github.com/Ricardo-M-L/synapse-ai.git", "#F8FAFC"),
-        ("", ""),
-        ("$ ", "#6CC644"),
-        ("cd synapse-ai && npm install", "#F8FAFC"),
-        ("", ""),
-        ("$ ", "#6CC644"),
-        ("npm run build", "#F8FAFC"),
-        ("✓ Built successfully in 2.34s", "#10B981"),
-        ("", ""),
-        ("$ ", "#6CC644"),
-        ("npm run cli -- chat", "#F8FAFC"),
-        ("", ""),
-        ("🧠 Synapse AI 已启动！", "#3B82F6"),
-        ("提示: 输入 /help 查看可用命令", "#94A3B8"),
-        ("synapse> ", "#F59E0B"),
-    ]
+    return RenderPlan(tuple(size), colors['bg_dark'], tuple(ops))
+
+def create_logo_scene():
+    """创建Logo展示场景"""
+    return rasterize(layout_logo_scene())
+
+# 终端内容：(文字, 颜色)，空行不占位
+TERMINAL_COMMANDS = (
+    ("$ ", "#6CC644"),
+    ("git clone https://github.com/Ricardo-M-L/synapse-ai.git", "#F8FAFC"),
+    ("", ""),
+    ("$ ", "#6CC644"),
+    ("cd synapse-ai && npm install", "#F8FAFC"),
+    ("", ""),
+    ("$ ", "#6CC644"),
+    ("npm run build", "#F8FAFC"),
+    ("✓ Built successfully in 2.34s", "#10B981"),
+    ("", ""),
+    ("$ ", "#6CC644"),
+    ("npm run cli -- chat", "#F8FAFC"),
+    ("", ""),
+    ("🧠 Synapse AI 已启动！", "#3B82F6"),
+    ("提示: 输入 /help 查看可用命令", "#94A3B8"),
+    ("synapse> ", "#F59E0B"),
+)
+
+def terminal_chrome(size=RESOLUTION):
+    """终端窗口的标题栏和红绿灯（图层）"""
+    # 终端标题栏高 41 像素，底色即标题栏颜色
+    chrome = RenderPlan((size[0], 41), current_theme()['terminal_bar'], (
+        # 红绿灯
+        ellipse_op([20, 12, 36, 28], fill='#FF5F56'),
+        ellipse_op([46, 12, 62, 28], fill='#FFBD2E'),
+        ellipse_op([72, 12, 88, 28], fill='#27C93F'),
+    ))
+    return [layer_op((0, 0), chrome)]
+
+def layout_terminal_scene(commands=TERMINAL_COMMANDS, size=RESOLUTION):
+    """终端命令场景布局"""
+    colors = current_theme()
+    ops = terminal_chrome(size)
     
+    # 终端内容
     x, y = 40, 80
     for text, color in commands:
         if text:
-            draw.text((x, y), text, fill=hex_to_rgb(color), font=font)
+            ops.append(text_op((x, y), text, color, 'mono', 28))
             y += 40
     
-    return np.array(img)
-
-def create_chat_demo_scene():
-    """创建聊天演示场景"""
-    img = Image.new('RGB', RESOLUTION, hex_to_rgb(COLORS['bg_dark']))
-    draw = ImageDraw.Draw(img)
-    
-    font_paths = [
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "/System/Library/Fonts/Helvetica.ttc"
-    ]
-    
-    font_title = font_msg = font_small = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font_title = ImageFont.truetype(path, 36)
-                font_msg = ImageFont.truetype(path, 24)
-                font_small = ImageFont.truetype(path, 20)
-                break
-            except:
-                continue
-    
-    if font_title is None:
-        font_title = font_msg = font_small = ImageFont.load_default()
-    
-    # 标题栏
-    draw.rectangle([0, 0, RESOLUTION[0], 70], fill=hex_to_rgb('#1E293B'))
-    draw.text((40, 20), "Synapse AI Chat", fill=hex_to_rgb(COLORS['text']), font=font_title)
-    draw.text((RESOLUTION[0]-350, 25), "Token: 245 | $0.007", 
-             fill=hex_to_rgb(COLORS['secondary']), font=font_small)
-    
-    # 对话内容
-    messages = [
-        ("user", "帮我写一个 Python 脚本，批量重命名文件"),
-        ("ai", "好的，这是一个使用 os 模块的脚本：\n\nimport os\ndef batch_rename(folder):\n    for f in os.listdir(folder):\n        ..."),
-        ("user", "昨天说的用户系统方案还有吗？"),
-        ("ai", "当然记得！昨天的用户认证方案：\n\n1. JWT Token + Refresh\n2. Redis 存储会话\n3. 支持多端登录\n\n需要展开哪部分？"),
-    ]
+    return RenderPlan(tuple(size), colors['terminal_bg'], tuple(ops))
+
+def create_terminal_scene(cast=None):
+    """创建终端命令场景；给出 asciinema 录屏文件时返回按需渲染的回放动画"""
+    if cast is not None:
+        return make_animation(layout_cast_terminal_scene(cast))
+    return rasterize(layout_terminal_scene())
+
+# 打字动画：以这些结尾的行是提示符，其后的一条命令在同一行逐字输入
+PROMPT_SUFFIXES = ('$ ', '> ')
+
+def layout_typing_terminal_scene(commands=TERMINAL_COMMANDS, start=0.6, chars_per_second=18,
+                                 pause=0.4, line_delay=0.15, size=RESOLUTION):
+    """逐字输入命令的终端动画布局
+
+    窗口和标题栏是底图；每输入一个字符是一个事件，只擦掉光标、画出新字符和新光标，
+    提示符和命令输出整行出现。
+    """
+    colors = current_theme()
+    font_size, line_height = 28, 40
+    cursor_width = round(advance_width('M', 'mono', font_size))
+    events = []
+    x0, y = 40, 80
+    x, t = x0, start
+    cursor = None
+    typing = False
+    
+    def cursor_box(x, y):
+        return [x, y, x + cursor_width - 1, y + line_height - 8]
+    
+    def event(ops, x, y):
+        """擦掉旧光标，画出新内容，光标移到 (x, y)"""
+        nonlocal cursor
+        erase = [rect_op(cursor, fill=colors['terminal_bg'])] if cursor else []
+        cursor = cursor_box(x, y)
+        events.append(animation_event(t, erase + ops + [rect_op(cursor, fill=colors['text_muted'])]))
+    
+    event([], x, y)
+    for text, color in commands:
+        if not text:
+            continue
+        if typing:
+            # 命令逐字输入
+            for char in text:
+                t += 1 / chars_per_second
+                op = text_op((x, y), char, color, 'mono', font_size)
+                x += advance_width(char, 'mono', font_size)
+                event([op], round(x), y)
+            t += pause
+            x, y = x0, y + line_height
+            typing = False
+            event([], x, y)
+        elif text.endswith(PROMPT_SUFFIXES):
+            # 提示符整体出现，光标停在提示符后
+            x = x0 + advance_width(text, 'mono', font_size)
+            event([text_op((x0, y), text, color, 'mono', font_size)], round(x), y)
+            typing = True
+        else:
+            # 命令输出整行出现
+            t += line_delay
+            y += line_height
+            event([text_op((x0, y - line_height), text, color, 'mono', font_size)], x0, y)
     
+    base = RenderPlan(tuple(size), colors['terminal_bg'], tuple(terminal_chrome(size)))
+    return make_animation_plan(base, events)
+
+# 终端行高与字号之比（28px 字号 / 40px 行高）
+TERMINAL_LINE_SPACING = 40 / 28
+
+def layout_cast_terminal_scene(cast, speed=1.0, max_idle=2.0, fps=FPS, size=RESOLUTION):
+    """asciinema 录屏（asciicast v2）回放布局
+
+    录屏的列数 / 行数决定字号，网格缩放到终端窗口内；同一帧间隔内的输出合并为一个事件，
+    每个事件只重绘变化的单元格。speed 为回放倍速，max_idle 压缩过长的停顿（秒）。
+    """
+    colors = current_theme()
+    cols, rows = cast_size(cast)
+    # 字号取网格能放进窗口的最大值，不超过终端场景的 28px
+    area_width, area_height = size[0] - 80, size[1] - 120
+    unit = advance_width('M', 'mono', 100) / 100
+    font_size = max(1, int(min(28, area_width / (cols * unit),
+                               area_height / (rows * TERMINAL_LINE_SPACING))))
+    cell_size = (advance_width('M', 'mono', font_size), round(font_size * TERMINAL_LINE_SPACING))
+    grid = TerminalGrid(cols, rows, colors['terminal_text'], colors['terminal_bg'])
+    events = cast_events(cast, grid, (40, 80), cell_size, font_size, fps, speed, max_idle)
+    base = RenderPlan(tuple(size), colors['terminal_bg'], tuple(terminal_chrome(size)))
+    return make_animation_plan(base, events)
+
+layout_cast_terminal_scene.file_args = ('cast',)
+
+# 对话内容：(角色, 内容)
+CHAT_MESSAGES = (
+    ("user", "帮我写一个 Python 脚本，批量重命名文件"),
+    ("ai", "好的，这是一个使用 os 模块的脚本：\n\nimport os\ndef batch_rename(folder):\n    for f in os.listdir(folder):\n        ..."),
+    ("user", "昨天说的用户系统方案还有吗？"),
+    ("ai", "当然记得！昨天的用户认证方案：\n\n1. JWT Token + Refresh\n2. Redis 存储会话\n3. 支持多端登录\n\n需要展开哪部分？"),
+)
+
+def chat_header(header, token_info, size=RESOLUTION):
+    """聊天界面的标题栏（图层）"""
+    colors = current_theme()
+    bar = RenderPlan((size[0], 71), colors['surface'], (
+        text_op((40, 20), header, colors['text'], 'sans', 36),
+        text_op((size[0]-350, 25), token_info, colors['secondary'], 'sans', 20),
+    ))
+    return [layer_op((0, 0), bar)]
+
+def chat_bubbles(messages, size=RESOLUTION):
+    """排版对话消息，返回 ([(角色, 消息框, 绘制指令), ...], 对话结束的 y 坐标)"""
+    colors = current_theme()
+    bubbles = []
     y = 120
     padding = 15
     max_width = 700
@@ -315,195 +418,591 @@ def create_chat_demo_scene():
     for role, content in messages:
         is_user = role == "user"
         
-        # 估算高度
-        lines = content.split('\n')
-        line_height = 30
-        box_height = len(lines) * line_height + padding * 2
+        # 按像素宽度换行，消息框宽度贴合文字
+        block = layout_text(content, 'sans', 24, max_width - padding * 2)
+        box_width = block.width + padding * 2
+        box_height = block.height + padding * 2
         
         # 用户消息靠右，AI消息靠左
         if is_user:
-            box_x = RESOLUTION[0] - max_width - 80
-            color = COLORS['primary']
+            box_x = size[0] - box_width - 80
+            color = colors['primary']
         else:
             box_x = 80
-            color = '#334155'
+            color = colors['border']
         
         # 绘制消息框
-        draw.rounded_rectangle([box_x, y, box_x + max_width, y + box_height], 
-                              radius=12, fill=hex_to_rgb(color))
+        box = [box_x, y, box_x + box_width, y + box_height]
+        ops = [rounded_rect_op(box, radius=12, fill=color)]
         
         # 绘制文字
         text_y = y + padding
-        for line in lines:
-            draw.text((box_x + padding, text_y), line, 
-                     fill=hex_to_rgb(COLORS['text']), font=font_msg)
-            text_y += line_height
+        for line in block.lines:
+            if line:
+                ops.append(text_op((box_x + padding, text_y), line, colors['text'], 'sans', 24))
+            text_y += block.line_height
         
+        bubbles.append((role, box, ops))
         y += box_height + 25
     
+    return bubbles, y
+
+def layout_chat_demo_scene(header="Synapse AI Chat", token_info="Token: 245 | $0.007",
+                           messages=CHAT_MESSAGES,
+                           memory_text="使用了持久化记忆 | .synapse/memories/project-arch.md",
+                           size=RESOLUTION):
+    """聊天演示场景布局"""
+    colors = current_theme()
+    ops = chat_header(header, token_info, size)
+    
+    # 对话内容
+    bubbles, y = chat_bubbles(messages, size)
+    for _, _, bubble_ops in bubbles:
+        ops.extend(bubble_ops)
+    
     # 记忆提示
-    memory_text = "使用了持久化记忆 | .synapse/memories/project-arch.md"
-    draw.text((80, y+15), memory_text, fill=hex_to_rgb(COLORS['accent']), font=font_small)
+    if memory_text:
+        ops.append(text_op((80, y+15), memory_text, colors['accent'], 'sans', 20))
     
-    return np.array(img)
+    return RenderPlan(tuple(size), colors['bg_dark'], tuple(ops))
 
-def create_github_end_scene():
-    """创建GitHub结尾场景"""
-    img = Image.new('RGB', RESOLUTION, hex_to_rgb(COLORS['bg_dark']))
-    draw = ImageDraw.Draw(img)
-    
-    font_paths = [
-        "/System/Library/Fonts/PingFang.ttc",
-        "/System/Library/Fonts/STHeiti Light.ttc",
-        "/System/Library/Fonts/Helvetica.ttc"
-    ]
-    
-    font_large = font_medium = font_small = None
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                font_large = ImageFont.truetype(path, 72)
-                font_medium = ImageFont.truetype(path, 48)
-                font_small = ImageFont.truetype(path, 36)
-                break
-            except:
-                continue
-    
-    if font_large is None:
-        font_large = font_medium = font_small = ImageFont.load_default()
+def layout_animated_chat_scene(header="Synapse AI Chat", token_info="Token: 245 | $0.007",
+                               messages=CHAT_MESSAGES,
+                               memory_text="使用了持久化记忆 | .synapse/memories/project-arch.md",
+                               start=0.5, interval=1.5, transition=0.4, slide=60,
+                               size=RESOLUTION):
+    """逐条出现的聊天动画布局
+
+    标题栏是背景；每条消息是一个精灵，每隔 interval 秒从侧面滑入 slide 像素并渐显
+    （用户消息从右侧、AI 消息从左侧），最后出现记忆提示。
+    """
+    colors = current_theme()
+    base = RenderPlan(tuple(size), colors['bg_dark'], tuple(chat_header(header, token_info, size)))
+    bubbles, y = chat_bubbles(messages, size)
+    sprites = []
+    t = start
+    for role, box, ops in bubbles:
+        offset = (slide if role == "user" else -slide, 0)
+        sprites.append(make_sprite(ops, box, t, transition, offset))
+        t += interval
+    
+    # 记忆提示原地渐显
+    if memory_text:
+        op = text_op((80, y+15), memory_text, colors['accent'], 'sans', 20)
+        right, bottom = text_bbox(memory_text, 'sans', 20)[2:]
+        sprites.append(make_sprite([op], [80, y+15, 80 + right, y+15 + bottom], t, transition))
+    
+    return SpritePlan(base, tuple(sprites))
+
+def create_chat_demo_scene(animated=False):
+    """创建聊天演示场景；animated 时返回消息逐条出现的动画"""
+    if animated:
+        return make_animation(layout_animated_chat_scene())
+    return rasterize(layout_chat_demo_scene())
+
+# 结尾特点列表
+END_FEATURES = (
+    "轻量级 - 20MB 体积",
+    "省钱 - Token 减少 60%", 
+    "安全 - 本地优先",
+    "微信 - 机器人集成"
+)
+
+def layout_github_end_scene(name="Synapse AI", url="github.com/Ricardo-M-L/synapse-ai",
+                            cta="点个 Star 支持开源！", features=END_FEATURES, size=RESOLUTION):
+    """GitHub结尾场景布局"""
+    colors = current_theme()
+    ops = []
     
     # Logo圆圈
-    center_x, center_y = RESOLUTION[0]//2, 200
-    draw.ellipse([center_x-80, center_y-80, center_x+80, center_y+80], 
-                fill=hex_to_rgb(COLORS['primary']))
+    center_x, center_y = size[0]//2, 200
+    ops.append(layer_op((center_x-80, center_y-80), logo_layer(80, colors['primary'])))
     
     # Star 图标
-    bbox = draw.textbbox((0, 0), "★", font=font_large)
-    x = center_x - (bbox[2]-bbox[0])//2
-    y = center_y - (bbox[3]-bbox[1])//2
-    draw.text((x, y), "★", fill=hex_to_rgb(COLORS['text']), font=font_large)
+    star_width, star_height = text_size("★", 'sans', 72)
+    x = center_x - star_width//2
+    y = center_y - star_height//2
+    ops.append(text_op((x, y), "★", colors['text'], 'sans', 72))
     
     # 产品名
-    title = "Synapse AI"
-    bbox = draw.textbbox((0, 0), title, font=font_large)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-    draw.text((x, 350), title, fill=hex_to_rgb(COLORS['text']), font=font_large)
+    x = centered_x(name, 'sans', 72, size[0])
+    ops.append(text_op((x, 350), name, colors['text'], 'sans', 72))
     
     # URL
-    url = "github.com/Ricardo-M-L/synapse-ai"
-    bbox = draw.textbbox((0, 0), url, font=font_medium)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-    draw.text((x, 480), url, fill=hex_to_rgb(COLORS['primary']), font=font_medium)
+    x = centered_x(url, 'sans', 48, size[0])
+    ops.append(text_op((x, 480), url, colors['primary'], 'sans', 48))
     
     # 号召性用语
-    cta = "点个 Star 支持开源！"
-    bbox = draw.textbbox((0, 0), cta, font=font_medium)
-    x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-    draw.text((x, 600), cta, fill=hex_to_rgb(COLORS['secondary']), font=font_medium)
+    x = centered_x(cta, 'sans', 48, size[0])
+    ops.append(text_op((x, 600), cta, colors['secondary'], 'sans', 48))
     
     # 特点列表
-    features = [
-        "轻量级 - 20MB 体积",
-        "省钱 - Token 减少 60%", 
-        "安全 - 本地优先",
-        "微信 - 机器人集成"
-    ]
     y = 720
     for feature in features:
-        bbox = draw.textbbox((0, 0), feature, font=font_small)
-        x = (RESOLUTION[0] - (bbox[2]-bbox[0]))//2
-        draw.text((x, y), feature, fill=hex_to_rgb(COLORS['text_muted']), font=font_small)
+        x = centered_x(feature, 'sans', 36, size[0])
+        ops.append(text_op((x, y), feature, colors['text_muted'], 'sans', 36))
         y += 50
     
-    return np.array(img)
+    return RenderPlan(tuple(size), colors['bg_dark'], tuple(ops))
+
+def create_github_end_scene():
+    """创建GitHub结尾场景"""
+    return rasterize(layout_github_end_scene())
+
+# 场景类型 -> 布局函数，场景描述文件中的 type 字段
+SCENE_LAYOUTS = {
+    'text': layout_text_image,
+    'logo': layout_logo_scene,
+    'terminal': layout_terminal_scene,
+    'typing': layout_typing_terminal_scene,
+    'cast': layout_cast_terminal_scene,
+    'chat': layout_chat_demo_scene,
+    'chat_animated': layout_animated_chat_scene,
+    'chart': layout_comparison_chart,
+    'chart_animated': layout_animated_chart,
+    'data_chart': layout_data_chart,
+    'end': layout_github_end_scene,
+}
+
+# 场景编排：(标题, 布局函数, 参数, 时长, 淡入, 淡出)
+SCENES = [
+    {'title': '开场 Hook', 'layout': layout_text_image,
+     'kwargs': {'text': "你的 AI 助手太烧钱？", 'subtext': "每个月几百刀的 API 账单", 'font_size': 80},
+     'duration': 3, 'fade_in': 0.5, 'fade_out': 0.5},
+    {'title': 'Logo展示', 'layout': layout_logo_scene, 'kwargs': {},
+     'duration': 5, 'fade_in': 0.5, 'fade_out': 0.5},
+    {'title': '安装演示', 'layout': layout_terminal_scene, 'kwargs': {},
+     'duration': 6, 'fade_in': 0.5, 'fade_out': 0.5},
+    {'title': '聊天演示', 'layout': layout_chat_demo_scene, 'kwargs': {},
+     'duration': 8, 'fade_in': 0.5, 'fade_out': 0.5},
+    {'title': 'Token对比', 'layout': layout_comparison_chart, 'kwargs': {},
+     'duration': 6, 'fade_in': 0.5, 'fade_out': 0.5},
+    {'title': '结尾号召', 'layout': layout_github_end_scene, 'kwargs': {},
+     'duration': 5, 'fade_in': 0.5, 'fade_out': 1.5},
+]
+
+BACKENDS = ('moviepy', 'ffmpeg')
+
+def parse_resolution(value):
+    """'720p' / '4k' / '1280x720' -> (名称, (宽, 高))"""
+    if value in RESOLUTION_PRESETS:
+        return value, RESOLUTION_PRESETS[value]
+    try:
+        width, height = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"无法识别的分辨率: {value}，可选: {', '.join(RESOLUTION_PRESETS)} 或 宽x高")
+    if width <= 0 or height <= 0 or width % 2 or height % 2:
+        raise ValueError(f"分辨率宽高必须是正偶数: {value}")
+    return value, (width, height)
+
+def master_size(sizes, design=RESOLUTION):
+    """能覆盖所有输出分辨率的最小光栅化尺寸（保持设计宽高比，宽高取偶数）"""
+    scale = max(min(w / design[0], h / design[1]) for w, h in sizes)
+    return tuple(int(round(v * scale / 2)) * 2 for v in design)
+
+def resolution_outputs(output_path, resolutions):
+    """单个分辨率直接写 output_path，多个分辨率在文件名后加分辨率名"""
+    if len(resolutions) == 1:
+        return [(output_path, resolutions[0][1])]
+    base, ext = os.path.splitext(output_path)
+    return [(f"{base}-{name}{ext}", size) for name, size in resolutions]
+
+def scene_context():
+    """影响所有场景渲染结果的全局配置，参与场景缓存键"""
+    return {'theme': current_theme(), 'resolution': RESOLUTION}
+
+def render_task(scene, size=None, palette=False):
+    """把一个场景编译为渲染计划，返回 rasterize 渲染任务；size 为光栅化尺寸
+
+    布局返回动画计划时，任务构造一个在编码时按需渲染的动画，标记 'animated'。
+    palette 时静态场景按调色板索引光栅化，再用当前主题的调色板查表得到帧。
+    """
+    with stage('layout', scene=scene['title']):
+        plan = compile_plan(scene['layout'], scene['kwargs'], current_theme())
+    if isinstance(plan, ANIMATION_PLANS):
+        return {'title': scene['title'], 'builder': make_animation, 'kwargs': {'plan': plan, 'size': size},
+                'animated': True}
+    if palette:
+        return {'title': scene['title'], 'builder': rasterize_themed,
+                'kwargs': {'plan': plan, 'size': size, 'theme': current_theme()}}
+    return {'title': scene['title'], 'builder': rasterize, 'kwargs': {'plan': plan, 'size': size}}
+
+def render_tasks(scenes, size=None, palette=False):
+    """把场景编排编译为渲染任务列表"""
+    return [render_task(scene, size, palette) for scene in scenes]
 
-def generate_video():
-    """生成完整视频"""
-    print("🎬 开始生成 Synapse AI 演示视频...")
+def _lookup_tasks(scenes, cache, size, palette=False):
+    """惰性编译渲染任务并查询缓存，命中缓存的任务带上 'frame'
+
+    动画不经过缓存和进程池，直接带上按需渲染的动画对象。
+    """
+    context = scene_context()
+    for scene in scenes:
+        task = render_task(scene, size, palette)
+        if task.get('animated'):
+            task['frame'] = task['builder'](**task['kwargs'])
+        elif cache is not None:
+            with stage('cache_get', scene=task['title']):
+                task['key'] = scene_key(task, context)
+                task['frame'] = cache.get(task['key'])
+        yield task
+
+def stream_scene_frames(scenes=SCENES, jobs=1, cache=None, size=None, window=None, palette=False,
+                        pool=None):
+    """按场景顺序惰性产出场景帧：命中缓存的直接读取，其余按需渲染
+
+    jobs > 1 时分发到进程池，最多预先渲染 window 个场景（默认不少于进程数）；
+    同时驻留内存的场景帧数与场景总数无关。palette 时静态场景按调色板索引光栅化。
+    pool 为调用方持有的 ScenePool 时在其中渲染（进程数以 pool 为准），多次调用共用工作进程。
+    """
+    total = len(scenes)
+    tasks = _lookup_tasks(scenes, cache, size, palette)
+    if pool is not None or jobs != 1:
+        jobs = pool.jobs if pool is not None else resolve_jobs(jobs)
+        window = window or max(jobs, DEFAULT_WINDOW)
+        print(f"⚙️ 并行渲染 {total} 个场景 (进程数: {jobs}, 预渲染窗口: {window})...")
+        rendered = iter_scenes_parallel(tasks, jobs, window, pool)
+    else:
+        rendered = ((task, task.get('frame')) for task in tasks)
     
-    clips = []
+    try:
+        for i, (task, frame) in enumerate(rendered):
+            if task.get('animated'):
+                print(f"🎞️ 场景 {i+1}/{total}: {task['title']} (动画，编码时渲染)")
+            elif task.get('frame') is not None:
+                print(f"💾 场景 {i+1}/{total}: {task['title']} (缓存)")
+            else:
+                if frame is None:
+                    print(f"⏳ 场景 {i+1}/{total}: {task['title']}...")
+                    with stage('scene', scene=task['title']):
+                        frame = task['builder'](**task['kwargs'])
+                else:
+                    print(f"✔️ 场景 {i+1}/{total}: {task['title']}")
+                if cache is not None:
+                    with stage('cache_put', scene=task['title']):
+                        cache.put(task['key'], frame)
+            task = None
+            yield frame
+    finally:
+        # 帧流被提前关闭（如 moviepy 不会取到耗尽）时立即回收进程池和共享内存，不等垃圾回收
+        rendered.close()
+
+def build_scene_frames(scenes=SCENES, jobs=1, cache=None, size=None, palette=False, pool=None):
+    """渲染所有场景画面并返回列表（所有场景同时提交渲染）"""
+    return list(stream_scene_frames(scenes, jobs=jobs, cache=cache, size=size,
+                                    window=max(len(scenes), 1), palette=palette, pool=pool))
+
+def render_cache_stats():
+    """本进程的渲染缓存计数（字体 / 图层 / 调色板），可在工作进程中调用后由 ScenePool 汇总"""
+    fonts, layers, indexed = font_cache_stats(), layer_cache_stats(), indexed_cache_stats()
+    return {'font_hits': fonts['hits'], 'font_misses': fonts['misses'],
+            'layer_hits': layers['hits'], 'layer_misses': layers['misses'],
+            'indexed_hits': indexed['hits'], 'indexed_misses': indexed['misses'],
+            'indexed_layer_hits': indexed['layer_hits'], 'indexed_layer_misses': indexed['layer_misses']}
+
+def lut_fade(duration, fade_in, fade_out):
+    """替代 vfx.FadeIn / vfx.FadeOut 的查表淡入淡出变换"""
+    def fade(get_frame, t):
+        return apply_fade(get_frame(t), fade_level(t, duration, fade_in, fade_out))
+    return fade
+
+class SceneTimeline:
+    """把按顺序产出的场景帧映射到时间轴，只保留当前场景的帧和一块淡入淡出缓冲
+
+    write_videofile 按时间顺序取帧，取到下一个场景时才从帧流中取出它；动画场景逐段渲染。
+    """
+
+    def __init__(self, scenes, frames, fps):
+        self.scenes = scenes
+        self.fps = fps
+        self.counts = [int(round(scene['duration'] * fps)) for scene in scenes]
+        self.total = sum(self.counts)
+        self.duration = self.total / fps
+        self._frames = iter(frames)
+        self._index = -1
+        self._start = 0
+        self._runs = iter(())
+        self._run_end = 0
+        self._frame = None
+        self._out = None
+
+    def frame_at(self, t):
+        """t 时刻的画面（make_frame 回调）"""
+        n = min(max(int(round(t * self.fps)), 0), self.total - 1)
+        while self._index < 0 or n >= self._start + self.counts[self._index]:
+            if self._index >= 0:
+                self._start += self.counts[self._index]
+            self._index += 1
+            self._runs = source_runs(next(self._frames), self.counts[self._index], self.fps)
+            self._run_end = 0
+        if n < self._start:
+            raise ValueError("moviepy 后端只支持按时间顺序取帧")
+        while n - self._start >= self._run_end:
+            self._frame, count = next(self._runs)
+            self._run_end += count
+        scene = self.scenes[self._index]
+        level = fade_level((n - self._start) / self.fps,
+                           scene['duration'], scene['fade_in'], scene['fade_out'])
+        if level >= MAX_LEVEL:
+            return self._frame
+        if self._out is not None and self._out.shape != self._frame.shape:
+            self._out = None
+        self._out = apply_fade(self._frame, level, out=self._out)
+        return self._out
+
+    def close(self):
+        """关闭帧流：write_videofile 不会把帧流取到耗尽，需要显式关闭以回收进程池"""
+        close = getattr(self._frames, 'close', None)
+        if close is not None:
+            close()
+
+def render_with_moviepy(scenes, frames, output_path, fps=FPS, codec='libx264', threads=None,
+                        preset='medium', ffmpeg_params=()):
+    """moviepy 后端：按时间轴从帧流中逐帧取画面，查表淡入淡出后写入
+
+    不为每个场景创建 clip，也不做 compose 合成，内存中只有当前场景。
+    moviepy 总会写入 -preset：ffmpeg_params 里的 -preset 取出来交给它，命令行中只出现一次。
+    """
+    from moviepy import VideoClip
+    
+    ffmpeg_params = list(ffmpeg_params)
+    if '-preset' in ffmpeg_params:
+        i = ffmpeg_params.index('-preset')
+        preset = ffmpeg_params[i + 1]
+        del ffmpeg_params[i:i + 2]
+    timeline = SceneTimeline(scenes, frames, fps)
+    if timeline.total == 0:
+        raise ValueError("没有可编码的场景")
+    clip = VideoClip(timeline.frame_at, duration=timeline.duration)
     
-    # 场景 1: 开场 Hook (3秒)
-    print("⏳ 场景 1/6: 开场 Hook...")
-    hook_img = create_text_image(
-        "你的 AI 助手太烧钱？",
-        subtext="每个月几百刀的 API 账单",
-        font_size=80
+    try:
+        with stage('write_videofile'):
+            clip.write_videofile(
+                output_path,
+                fps=fps,
+                codec=codec,
+                audio=False,
+                threads=threads or default_threads(),
+                preset=preset,
+                ffmpeg_params=ffmpeg_params
+            )
+    finally:
+        timeline.close()
+        clip.close()
+    return timeline.duration
+
+def render_with_ffmpeg(scenes, frames, output_path, fps=FPS, dedup=True, frame_mode='vfr',
+                       segments=False, codec='libx264', threads=None, extra_args=()):
+    """ffmpeg 后端：静止段去重后编码，或原始 RGB 帧直接写入管道；segments 时逐场景分段编码
+
+    output_path 可以是 [(路径, (宽, 高)), ...]，一次编码输出多个分辨率；宽高比不同的输出
+    与单一输出时按输出尺寸光栅化一样，用主题背景色留边。
+    """
+    items = ((frame, scene['duration'], scene['fade_in'], scene['fade_out'])
+             for scene, frame in zip(scenes, frames))
+    threads = threads or default_threads()
+    if segments:
+        if not isinstance(output_path, str):
+            raise ValueError("--segments 不支持多分辨率输出")
+        print("🔄 分段编码并拼接...")
+        return write_video_segments(items, output_path, fps=fps, codec=codec, threads=threads,
+                                    dedup=dedup, frame_mode=frame_mode, extra_args=extra_args)
+    
+    print("🔄 静止帧去重编码..." if dedup else "🔄 写入 ffmpeg 管道...")
+    return write_video_ffmpeg(
+        items,
+        output_path,
+        fps=fps,
+        codec=codec,
+        threads=threads,
+        dedup=dedup,
+        frame_mode=frame_mode,
+        extra_args=extra_args,
+        pad_color=current_theme()['bg_dark']
     )
-    hook_clip = (ImageClip(hook_img)
-                .with_duration(3)
-                .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]))
-    clips.append(hook_clip)
-    
-    # 场景 2: Logo展示 (5秒)
-    print("⏳ 场景 2/6: Logo展示...")
-    logo_img = create_logo_scene()
-    logo_clip = (ImageClip(logo_img)
-                .with_duration(5)
-                .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]))
-    clips.append(logo_clip)
-    
-    # 场景 3: 终端安装 (6秒)
-    print("⏳ 场景 3/6: 安装演示...")
-    terminal_img = create_terminal_scene()
-    terminal_clip = (ImageClip(terminal_img)
-                    .with_duration(6)
-                    .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]))
-    clips.append(terminal_clip)
-    
-    # 场景 4: 聊天演示 (8秒)
-    print("⏳ 场景 4/6: 聊天演示...")
-    chat_img = create_chat_demo_scene()
-    chat_clip = (ImageClip(chat_img)
-                .with_duration(8)
-                .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]))
-    clips.append(chat_clip)
-    
-    # 场景 5: 对比图表 (6秒)
-    print("⏳ 场景 5/6: Token对比...")
-    chart_img = create_comparison_chart()
-    chart_clip = (ImageClip(chart_img)
-                 .with_duration(6)
-                 .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(0.5)]))
-    clips.append(chart_clip)
-    
-    # 场景 6: GitHub结尾 (5秒)
-    print("⏳ 场景 6/6: 结尾号召...")
-    end_img = create_github_end_scene()
-    end_clip = (ImageClip(end_img)
-               .with_duration(5)
-               .with_effects([vfx.FadeIn(0.5), vfx.FadeOut(1.5)]))
-    clips.append(end_clip)
-    
-    # 合并所有场景
-    print("🔄 合并视频片段...")
-    final_clip = concatenate_videoclips(clips, method="compose")
+
+def generate_video(backend='moviepy', output_path=None, dedup=True, frame_mode='vfr', jobs=1,
+                   use_cache=True, cache_dir=DEFAULT_CACHE_DIR, segments=False, spec=None,
+                   report=True, trace=False, resolutions=None, preview=False, fps=None,
+                   fades=True, contact_sheet=False, profile=None, codec=None, threads=0,
+                   window=None, theme=None, palette=False):
+    """生成完整视频；spec 为场景描述文件路径，缺省使用内置的 SCENES
+
+    resolutions 为分辨率名称 / 宽x高 列表：单个分辨率直接按该尺寸光栅化；
+    多个分辨率时按能覆盖全部输出的尺寸光栅化一次，ffmpeg 后端一次编码分出各分辨率。
+    preview 时默认 640x360、10fps、ultrafast 编码；fades=False 跳过淡入淡出；
+    contact_sheet 时在视频旁输出所有场景的缩略图总览 PNG。
+    profile 为编码档位（默认 web，预览模式 draft），codec 覆盖档位的编码器，threads <= 0 按 CPU 核心数。
+    场景帧以生成器方式边渲染边编码，window 为预先渲染的场景数上限。
+    theme 为配色主题名称（dark / light / brand），缺省沿用当前主题。
+    palette 时静态场景按调色板索引光栅化，同一进程内换主题只重新查表。
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的渲染后端: {backend}，可选: {', '.join(BACKENDS)}")
+    if preview and segments:
+        raise ValueError("预览模式不使用 --segments")
+    fps = fps or (PREVIEW_FPS if preview else FPS)
+    profile = profile or ('draft' if preview else 'web')
+    if profile not in PROFILES:
+        raise ValueError(f"未知的编码档位: {profile}，可选: {', '.join(PROFILES)}")
+    codec = check_codec(codec or PROFILES[profile]['codec'])
+    threads = threads if threads and threads > 0 else default_threads()
+    encode_params = profile_args(profile, codec, fps)
+    default_resolution = PREVIEW_RESOLUTION if preview else '1080p'
+    resolutions = [parse_resolution(r) for r in (resolutions or [default_resolution])]
+    if len(resolutions) > 1 and (backend != 'ffmpeg' or segments):
+        raise ValueError("多分辨率输出需要 ffmpeg 后端（且不使用 --segments）")
+    if len(resolutions) == 1:
+        raster_size = resolutions[0][1]
+    else:
+        raster_size = master_size([size for _, size in resolutions])
+    
+    if theme is not None:
+        use_theme(theme)
+    print(f"🎬 开始生成 Synapse AI 演示视频... (主题: {current_theme().name})")
+    
+    profiler = enable_profiler() if report or trace else None
+    
+    # 启动时统一解析一次字体路径
+    with stage('fonts'):
+        resolved = resolve_fonts()
+    for role, path in resolved.items():
+        print(f"🔤 字体 {role}: {path or '默认字体'}")
+    
+    with stage('load_spec'):
+        scenes = load_scenes(spec, SCENE_LAYOUTS) if spec else SCENES
+    if spec:
+        print(f"📄 场景描述: {spec} ({len(scenes)} 个场景)")
+    if not fades:
+        scenes = [{**scene, 'fade_in': 0, 'fade_out': 0} for scene in scenes]
+    
+    # 场景帧在编码时按需渲染，同时驻留内存的场景数不超过 window
+    cache = SceneCache(cache_dir) if use_cache else None
+    frames = stream_scene_frames(scenes, jobs=jobs, cache=cache, size=raster_size, window=window,
+                                 palette=palette)
     
     # 输出视频
-    output_path = os.path.join(OUTPUT_DIR, "synapse-ai-demo.mp4")
-    print(f"💾 保存视频到: {output_path}")
+    default_name = ("synapse-ai-demo-preview" if preview else "synapse-ai-demo") + CODECS[codec]
+    output_path = output_path or os.path.join(OUTPUT_DIR, default_name)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    outputs = resolution_outputs(output_path, resolutions)
+    print(f"💾 保存视频到: {output_path} (后端: {backend}, 档位: {profile}, 编码器: {codec}, 线程: {threads})")
+    
+    base = os.path.splitext(output_path)[0]
+    sheet = None
+    if contact_sheet:
+        colors = current_theme()
+        sheet = ContactSheet(bg_color=colors.hex('bg_dark'), text_color=colors.hex('text'))
+        frames = sheet.collect(frames, scenes)
+    
+    with stage('encode'):
+        if backend == 'ffmpeg':
+            target = output_path if len(outputs) == 1 else outputs
+            duration = render_with_ffmpeg(scenes, frames, target, fps=fps, dedup=dedup,
+                                          frame_mode=frame_mode, segments=segments, codec=codec,
+                                          threads=threads, extra_args=encode_params)
+        else:
+            duration = render_with_moviepy(scenes, frames, output_path, fps=fps, codec=codec,
+                                           threads=threads, ffmpeg_params=encode_params)
     
-    final_clip.write_videofile(
-        output_path,
-        fps=FPS,
-        codec='libx264',
-        audio=False,
-        threads=4
-    )
+    if sheet is not None:
+        with stage('contact_sheet'):
+            sheet.save(f"{base}.contact.png")
+        print(f"🖼️ 场景总览: {base}.contact.png")
     
     print(f"✅ 视频生成完成！")
-    print(f"📁 文件位置: {output_path}")
-    print(f"⏱️ 视频时长: {final_clip.duration:.1f} 秒")
-    print(f"📐 分辨率: {RESOLUTION[0]}x{RESOLUTION[1]}")
-    
-    # 清理
-    final_clip.close()
-    for clip in clips:
-        clip.close()
+    for path, size in outputs:
+        print(f"📁 文件位置: {path} ({size[0]}x{size[1]})")
+    print(f"⏱️ 视频时长: {duration:.1f} 秒")
+    print(f"📐 光栅化分辨率: {raster_size[0]}x{raster_size[1]}")
+    stats = font_cache_stats()
+    print(f"🔤 字体缓存: 命中 {stats['hits']} / 加载 {stats['misses']}")
+    stats = layer_cache_stats()
+    print(f"🧱 图层缓存: 命中 {stats['hits']} / 渲染 {stats['misses']}")
+    if palette:
+        stats = indexed_cache_stats()
+        print(f"🎨 调色板光栅化: 复用 {stats['hits']} / 绘制 {stats['misses']}"
+              f" (图层: 命中 {stats['layer_hits']} / 绘制 {stats['layer_misses']})")
+    if cache is not None:
+        print(f"💾 场景缓存: 命中 {cache.hits} / 渲染 {cache.misses}")
+    
+    if profiler is not None:
+        disable_profiler()
+        profiler.print_summary()
+        if report:
+            profiler.write_report(f"{base}.report.json", backend=backend, output=output_path,
+                                  resolution=list(raster_size), fps=fps, duration=duration,
+                                  profile=profile, codec=codec, threads=threads,
+                                  outputs=[{'path': path, 'size': list(size)} for path, size in outputs],
+                                  scenes=[scene['title'] for scene in scenes])
+            print(f"📊 性能报告: {base}.report.json")
+        if trace:
+            profiler.write_chrome_trace(f"{base}.trace.json")
+            print(f"📊 Chrome trace: {base}.trace.json")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Synapse AI 演示视频生成器")
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help="渲染后端：moviepy 逐帧合成，ffmpeg 直接管道编码（默认 moviepy，预览模式默认 ffmpeg）")
+    parser.add_argument('-o', '--output', default=None,
+                        help="输出文件路径（默认写入 OUTPUT_DIR）")
+    parser.add_argument('--spec', default=None,
+                        help="场景描述文件（JSON / YAML），缺省使用内置场景")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="场景渲染进程数（0 表示使用全部 CPU 核心）")
+    parser.add_argument('--window', type=int, default=None,
+                        help=f"预先渲染的场景数上限，决定内存占用（默认 {DEFAULT_WINDOW}，并行时不少于进程数）")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="不读写场景缓存，全部重新渲染")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="场景缓存目录")
+    parser.add_argument('--segments', action='store_true',
+                        help="ffmpeg 后端逐场景分段编码并缓存，流复制拼接（只重新编码改动的场景）")
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false',
+                        help="ffmpeg 后端逐帧写管道，不合并静止帧")
+    parser.add_argument('--no-report', dest='report', action='store_false',
+                        help="不输出性能报告（默认在视频旁写入 .report.json）")
+    parser.add_argument('--trace', action='store_true',
+                        help="额外输出 Chrome trace 文件（.trace.json）")
+    parser.add_argument('--frame-mode', choices=FRAME_MODES, default='vfr',
+                        help="去重编码的帧率模式：vfr 静止段只编码一帧，cfr 由 ffmpeg 重复帧")
+    parser.add_argument('--resolution', action='append', default=None,
+                        help=f"输出分辨率（可重复）：{' / '.join(RESOLUTION_PRESETS)} 或 宽x高，默认 1080p")
+    parser.add_argument('--preview', action='store_true',
+                        help=f"快速预览：{PREVIEW_RESOLUTION}、{PREVIEW_FPS}fps、draft 编码档位")
+    parser.add_argument('--profile', choices=PROFILES, default=None,
+                        help="编码档位：draft / web / archival（默认 web，预览模式 draft）")
+    parser.add_argument('--codec', choices=CODECS, default=None,
+                        help="视频编码器（默认由编码档位决定，需本机 ffmpeg 支持）")
+    parser.add_argument('--threads', type=int, default=0,
+                        help="编码线程数（0 表示按 CPU 核心数）")
+    parser.add_argument('--fps', type=int, default=None,
+                        help=f"输出帧率（默认 {FPS}，预览模式 {PREVIEW_FPS}）")
+    parser.add_argument('--no-fades', dest='fades', action='store_false',
+                        help="跳过淡入淡出（去重后每个场景只编码一帧）")
+    parser.add_argument('--theme', choices=THEMES, default=None,
+                        help="配色主题（默认 dark）")
+    parser.add_argument('--palette', action='store_true',
+                        help="静态场景按调色板索引光栅化（换主题只换调色板，不重新绘制）")
+    parser.add_argument('--contact-sheet', action='store_true',
+                        help="在视频旁输出所有场景的缩略图总览（.contact.png）")
+    args = parser.parse_args(argv)
+    if args.backend is None:
+        args.backend = 'ffmpeg' if args.preview else 'moviepy'
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        generate_video()
+        generate_video(backend=args.backend, output_path=args.output,
+                       dedup=args.dedup, frame_mode=args.frame_mode, jobs=args.jobs,
+                       use_cache=args.use_cache, cache_dir=args.cache_dir, segments=args.segments,
+                       spec=args.spec, report=args.report, trace=args.trace,
+                       resolutions=args.resolution, preview=args.preview, fps=args.fps,
+                       fades=args.fades, contact_sheet=args.contact_sheet, profile=args.profile,
+                       codec=args.codec, threads=args.threads, window=args.window,
+                       theme=args.theme, palette=args.palette)
     except Exception as e:
         print(f"❌ 错误: {e}")
         import traceback
@@ -0,0 +1,330 @@
+"""
+调色板索引光栅化
+场景可以光栅化为调色板索引帧（Pillow 的 'P' 模式）：像素里存的是调色板序号而不是 RGB。
+主题的每个颜色名占一个固定槽位（序号即 Theme.slot），计划中的字面颜色（终端文字、红绿灯等）各占一个槽位；
+抗锯齿文字边缘的过渡像素按 (底色, 文字色, 覆盖率) 各占一个混合槽位，混合色在生成调色板时
+用主题颜色按 Pillow 的混合公式重新计算。换主题只是换一张 256 项的查找表，不用重新绘制。
+
+只有配色不同的计划共享同一次光栅化：缓存键是去掉了主题 RGB、只保留颜色名的计划。
+过渡像素的种类超过剩余槽位时，按均匀的覆盖率等级量化（每对颜色至少保留一级）。
+"""
+
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw
+
+from fonts import get_font
+from frames import CHANNELS, as_frame
+from profiler import stage
+from render_plan import RenderPlan, Swatch, draw_ops, scale_plan, to_rgb
+from themes import current_theme
+
+PALETTE_SIZE = 256
+
+# 绘制时的中间缓冲（int32）：纯色像素为颜色序号，
+# 过渡像素为 BLEND | 底色序号 << 18 | 文字色序号 << 8 | 覆盖率
+BLEND = 1 << 28
+MAX_COLORS = 1 << 10
+
+# 颜色引用 ('key', 颜色名) / ('rgb', RGB) 与序号的对应（进程内，图层与场景共用）
+_ref_ids = {}
+_refs = []
+
+# 只用来测量文字范围
+_measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+
+def color_ref(value):
+    """绘制指令中的颜色 -> 颜色引用：主题颜色只看颜色名，其他颜色按 RGB"""
+    if isinstance(value, Swatch):
+        return ('key', value.key)
+    return ('rgb', tuple(to_rgb(value)[:3]))
+
+
+def color_id(value):
+    """颜色的进程内序号；None（不填充）原样返回"""
+    if value is None:
+        return None
+    ref = color_ref(value)
+    if ref not in _ref_ids:
+        if len(_refs) >= MAX_COLORS:
+            raise ValueError(f"颜色种类超过 {MAX_COLORS}，无法按调色板光栅化")
+        _ref_ids[ref] = len(_refs)
+        _refs.append(ref)
+    return _ref_ids[ref]
+
+
+def strip_theme(value):
+    """去掉计划中主题颜色的 RGB，只保留颜色名：只有配色不同的计划得到相同的值"""
+    if isinstance(value, Swatch):
+        return Swatch(value.key, None)
+    if isinstance(value, RenderPlan):
+        return RenderPlan(value.size, strip_theme(value.background), strip_theme(value.ops))
+    if isinstance(value, tuple):
+        return tuple(strip_theme(v) for v in value)
+    return value
+
+
+# ---- 光栅化到颜色序号 ----
+
+def _labeled(op):
+    """形状指令 -> (标记指令, 填充色序号, 轮廓色序号, 范围)
+
+    标记指令把填充画成 1、轮廓画成 2，范围为可能被画到的像素（含线宽余量）。
+    """
+    kind = op[0]
+    if kind in ('rect', 'ellipse'):
+        _, box, fill, outline, width = op
+        labeled = (kind, box, fill and 1, outline and 2, width)
+        points, colors = (box[:2], box[2:]), (fill, outline)
+    elif kind == 'rounded_rect':
+        _, box, radius, fill = op
+        labeled, width = (kind, box, radius, fill and 1), 1
+        points, colors = (box[:2], box[2:]), (fill, None)
+    elif kind == 'line':
+        _, points, fill, width = op
+        labeled, colors = (kind, points, fill and 1, width), (fill, None)
+    else:
+        raise ValueError(f"未知的绘制指令: {kind}")
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    margin = width + 2
+    bounds = (int(min(xs)) - margin, int(min(ys)) - margin,
+              int(max(xs)) + margin + 1, int(max(ys)) + margin + 1)
+    return labeled, color_id(colors[0]), color_id(colors[1]), bounds
+
+
+def _draw_shape(codes, labels, draw, op):
+    """在标记画布上画形状，再把标记范围内的像素写成颜色序号"""
+    labeled, fill, outline, (x0, y0, x1, y1) = _labeled(op)
+    height, width = codes.shape
+    x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    draw_ops(draw, (labeled,))
+    mark = labels[y0:y1, x0:x1]
+    region = codes[y0:y1, x0:x1]
+    if fill is not None:
+        region[mark == 1] = fill
+    if outline is not None:
+        region[mark == 2] = outline
+    mark[...] = 0
+
+
+def _dominant(codes):
+    """过渡像素取覆盖率较高的一侧作为纯色（文字叠在抗锯齿边缘上时的底色）"""
+    blended = codes >= BLEND
+    if not blended.any():
+        return codes
+    under = (codes >> 18) & (MAX_COLORS - 1)
+    over = (codes >> 8) & (MAX_COLORS - 1)
+    return np.where(blended, np.where((codes & 0xFF) >= 128, over, under), codes)
+
+
+def _draw_text(codes, op):
+    """按文字的灰度遮罩写入过渡像素：底色取画布上已有的颜色"""
+    _, (x, y), text, fill, role, size = op
+    font = get_font(role, size)
+    height, width = codes.shape
+    left, top, right, bottom = _measure.textbbox((x, y), text, font=font)
+    x0, y0, x1, y1 = max(left, 0), max(top, 0), min(right, width), min(bottom, height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    mask = Image.new('L', (x1 - x0, y1 - y0))
+    ImageDraw.Draw(mask).text((x - x0, y - y0), text, fill=255, font=font)
+    alpha = np.asarray(mask).astype(np.int32)
+    region = codes[y0:y1, x0:x1]
+    under = _dominant(region)
+    ink = color_id(fill)
+    mixed = np.where((alpha == 255) | (under == ink), ink, BLEND | under << 18 | ink << 8 | alpha)
+    region[...] = np.where(alpha == 0, region, mixed)
+
+
+def _draw_codes(plan):
+    """在 int32 颜色序号缓冲上执行计划，返回 (高, 宽) 缓冲
+
+    Pillow 不能直接映射 int32 缓冲，形状先画在映射的 'L' 标记画布上，再按标记写入颜色序号。
+    """
+    width, height = plan.size
+    codes = np.full((height, width), color_id(plan.background), dtype=np.int32)
+    labels = np.zeros((height, width), dtype=np.uint8)
+    img = Image.frombuffer('L', plan.size, labels, 'raw', 'L', 0, 1)
+    img.readonly = 0
+    draw = ImageDraw.Draw(img)
+    for op in plan.ops:
+        kind = op[0]
+        if kind == 'layer':
+            _, (x, y), layer = op
+            pixels = layer_codes(layer)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + pixels.shape[1], width), min(y + pixels.shape[0], height)
+            if x0 < x1 and y0 < y1:
+                codes[y0:y1, x0:x1] = pixels[y0 - y:y1 - y, x0 - x:x1 - x]
+        elif kind == 'text':
+            _draw_text(codes, op)
+        else:
+            _draw_shape(codes, labels, draw, op)
+    return codes
+
+
+@lru_cache(maxsize=64)
+def layer_codes(layer):
+    """图层的颜色序号缓冲（只读），同一个图层只绘制一次"""
+    codes = _draw_codes(layer)
+    codes.flags.writeable = False
+    return codes
+
+
+# ---- 分配槽位 ----
+
+def _quantize(pairs, alpha, weights, free):
+    """过渡像素超过 free 个槽位时量化覆盖率，返回新的覆盖率（0 / 255 表示归入纯色）
+
+    像素最多的 free 对颜色每对分到 free // 对数 个等级，其余的对直接归入较近的纯色。
+    """
+    keys, pair_index = np.unique(pairs, axis=0, return_inverse=True)
+    pair_index = pair_index.ravel()
+    totals = np.bincount(pair_index, weights=weights, minlength=len(keys))
+    kept = np.zeros(len(keys), dtype=bool)
+    kept[np.argsort(-totals, kind='stable')[:free]] = True
+    steps = free // int(kept.sum()) + 1
+    levels = np.rint(alpha * steps / 255)
+    quantized = np.rint(levels * 255 / steps).astype(np.int64)
+    return np.where(kept[pair_index], quantized, np.where(alpha >= 128, 255, 0))
+
+
+def index_codes(codes, keys):
+    """把颜色序号缓冲转换为 IndexedFrame；keys 为主题颜色名，依次占据前面的槽位"""
+    # 纯色像素按序号直接查表，只有（少量的）过渡像素需要去重
+    is_blend = codes >= BLEND
+    pure = np.where(is_blend, 0, codes)
+    blended, inverse, counts = np.unique(codes[is_blend], return_inverse=True, return_counts=True)
+    under_ids = (blended >> 18) & (MAX_COLORS - 1)
+    over_ids = (blended >> 8) & (MAX_COLORS - 1)
+    # 过渡像素在 pure 中记作 0，计数时扣掉
+    pixels = np.bincount(pure.ravel(), minlength=len(_refs))
+    pixels[0] -= len(inverse)
+    used = pixels > 0
+    used[under_ids] = used[over_ids] = True
+
+    refs = [('key', key) for key in keys]
+    slot_of = {ref: i for i, ref in enumerate(refs)}
+    for ref_id in np.flatnonzero(used):
+        ref = _refs[ref_id]
+        if ref[0] == 'key' and ref not in slot_of:
+            raise ValueError(f"计划使用了主题中没有的颜色: {ref[1]}")
+        if ref not in slot_of:
+            slot_of[ref] = len(refs)
+            refs.append(ref)
+    if len(refs) > PALETTE_SIZE:
+        raise ValueError(f"场景使用了 {len(refs)} 种颜色，超过调色板的 {PALETTE_SIZE} 个槽位")
+    slots = np.zeros(len(_refs), dtype=np.int64)
+    for ref, slot in slot_of.items():
+        if ref in _ref_ids:
+            slots[_ref_ids[ref]] = slot
+
+    under, over = slots[under_ids], slots[over_ids]
+    alpha = (blended & 0xFF).astype(np.int64)
+    free = PALETTE_SIZE - len(refs)
+    if len(blended) > free:
+        alpha = _quantize(np.stack([under, over], axis=1), alpha, counts, free)
+    # 覆盖率量化到 0 / 255 的过渡像素归入纯色，其余相同 (底色, 文字色, 覆盖率) 共用一个槽位
+    mixed = (alpha > 0) & (alpha < 255)
+    combos, combo_index = np.unique(np.stack([under[mixed], over[mixed], alpha[mixed]], axis=1),
+                                    axis=0, return_inverse=True)
+    target = np.where(alpha >= 255, over, under)
+    target[mixed] = len(refs) + combo_index.ravel()
+
+    indices = slots.astype(np.uint8)[pure]
+    indices[is_blend] = target.astype(np.uint8)[inverse.ravel()]
+    return IndexedFrame(indices, refs, combos)
+
+
+class IndexedFrame:
+    """调色板索引帧：像素存槽位序号，调色板按主题生成"""
+
+    def __init__(self, indices, refs, blends):
+        indices.flags.writeable = False
+        self.indices = indices
+        # 槽位：前 len(refs) 个为纯色引用，之后每行 (底色槽位, 文字色槽位, 覆盖率) 一个混合色
+        self.refs = tuple(refs)
+        self.blends = np.asarray(blends, dtype=np.int64).reshape(-1, 3)
+        self._palettes = {}
+
+    @property
+    def size(self):
+        return self.indices.shape[1], self.indices.shape[0]
+
+    @property
+    def slots(self):
+        """已使用的槽位数"""
+        return len(self.refs) + len(self.blends)
+
+    def palette(self, theme):
+        """主题对应的 256 项调色板 ((256, 3) uint8，只读)，每个主题只计算一次"""
+        if theme in self._palettes:
+            return self._palettes[theme]
+        base = np.zeros((len(self.refs), 3), dtype=np.int64)
+        for i, (kind, value) in enumerate(self.refs):
+            if kind == 'key':
+                if value not in theme:
+                    raise ValueError(f"主题 {theme.name} 没有颜色: {value}")
+                base[i] = theme.array[theme.slot(value)]
+            else:
+                base[i] = value
+        lut = np.zeros((PALETTE_SIZE, 3), dtype=np.int64)
+        lut[:len(base)] = base
+        under, over, alpha = self.blends.T
+        # 与 Pillow 按遮罩绘制文字的混合一致：DIV255(底色 * (255 - a) + 文字色 * a)
+        mixed = base[under] * (255 - alpha)[:, None] + base[over] * alpha[:, None] + 128
+        lut[len(base):self.slots] = ((mixed >> 8) + mixed) >> 8
+        lut = lut.astype(np.uint8)
+        lut.flags.writeable = False
+        self._palettes[theme] = lut
+        return lut
+
+    def frame(self, theme=None):
+        """用主题调色板查表得到只读 RGB 帧（RGBX 缓冲），theme 缺省为当前主题"""
+        lut = np.full((PALETTE_SIZE, CHANNELS), 255, dtype=np.uint8)
+        lut[:, :3] = self.palette(theme or current_theme())
+        # 每个像素按 4 字节整体查表
+        packed = lut.view(np.uint32).ravel()[self.indices]
+        return as_frame(packed.view(np.uint8).reshape(*self.indices.shape, CHANNELS))
+
+    def image(self, theme=None):
+        """'P' 模式的 Pillow 图像，调色板为主题对应的调色板"""
+        img = Image.frombytes('P', self.size, self.indices.tobytes())
+        img.putpalette(self.palette(theme or current_theme()).tobytes(), 'RGB')
+        return img
+
+
+@lru_cache(maxsize=16)
+def _rasterize_indexed(plan, keys):
+    return index_codes(_draw_codes(plan), keys)
+
+
+def rasterize_indexed(plan, size=None, keys=None):
+    """把计划光栅化为 IndexedFrame；keys 为占据固定槽位的主题颜色名，缺省取当前主题
+
+    结果按去掉主题 RGB 的计划缓存，只有配色不同的计划共享同一次光栅化。
+    """
+    plan = strip_theme(plan)
+    if size is not None:
+        plan = scale_plan(plan, tuple(size))
+    keys = tuple(keys or current_theme().keys)
+    with stage('draw'):
+        return _rasterize_indexed(plan, keys)
+
+
+def rasterize_themed(plan, size=None, theme=None):
+    """按调色板索引光栅化后用主题调色板查表得到 RGB 帧；换主题时复用索引帧，只重新查表"""
+    theme = theme or current_theme()
+    indexed = rasterize_indexed(plan, size, theme.keys)
+    with stage('palette'):
+        return indexed.frame(theme)
+
+
+def indexed_cache_stats():
+    """调色板光栅化缓存命中统计（场景与图层）"""
+    scenes, layers = _rasterize_indexed.cache_info(), layer_codes.cache_info()
+    return {'hits': scenes.hits, 'misses': scenes.misses, 'size': scenes.currsize,
+            'layer_hits': layers.hits, 'layer_misses': layers.misses}
@@ -0,0 +1,163 @@
+"""
+渲染流水线计时
+按阶段（字体加载、布局、绘制、转 numpy、淡入淡出、编码……）和场景记录
+墙钟时间、CPU 时间和峰值内存，输出 JSON 报告，可选输出 Chrome trace
+（chrome://tracing 或 https://ui.perfetto.dev 打开）。
+
+未启用时 stage() 是空操作，不影响正常渲染。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，内存与子进程 CPU 统计为空
+    resource = None
+
+
+def peak_rss_mb(children=False):
+    """进程（或已结束子进程，如 ffmpeg）的峰值常驻内存，单位 MB"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = resource.getrusage(who).ru_maxrss
+    # macOS 以字节计，Linux 以 KB 计
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def children_cpu_seconds():
+    """已结束子进程累计的 CPU 时间"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """收集阶段事件；每个线程维护自己的阶段栈，嵌套阶段自动继承外层的场景名"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, scene=None):
+        stack = self._stack()
+        if scene is None and stack:
+            scene = stack[-1][1]
+        stack.append((name, scene))
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        child_start = children_cpu_seconds()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.events.append({
+                'name': name,
+                'scene': scene,
+                'start': start - self.origin,
+                'wall': time.perf_counter() - start,
+                'cpu': time.process_time() - cpu_start,
+                'child_cpu': children_cpu_seconds() - child_start,
+                'peak_rss_mb': peak_rss_mb(),
+                'depth': len(stack),
+                'thread': threading.get_ident(),
+            })
+
+    def summary(self):
+        """按阶段与按场景汇总"""
+        stages = {}
+        scenes = {}
+        for event in self.events:
+            entry = stages.setdefault(event['name'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'child_cpu': 0.0})
+            entry['count'] += 1
+            entry['wall'] += event['wall']
+            entry['cpu'] += event['cpu']
+            entry['child_cpu'] += event['child_cpu']
+            if event['scene'] is not None:
+                per_scene = scenes.setdefault(event['scene'], {})
+                per_scene[event['name']] = per_scene.get(event['name'], 0.0) + event['wall']
+        return stages, scenes
+
+    def report(self, **meta):
+        """完整报告：元信息、整体峰值内存、阶段汇总、场景汇总和原始事件"""
+        stages, scenes = self.summary()
+        return {
+            'meta': meta,
+            'wall_seconds': time.perf_counter() - self.origin,
+            'peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb(children=True),
+            'stages': stages,
+            'scenes': scenes,
+            'events': self.events,
+        }
+
+    def write_report(self, path, **meta):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(**meta), f, ensure_ascii=False, indent=2)
+
+    def write_chrome_trace(self, path):
+        """Chrome trace 事件格式（完整事件 ph=X，时间单位微秒）"""
+        pid = os.getpid()
+        trace = [{
+            'name': event['name'],
+            'cat': event['scene'] or 'pipeline',
+            'ph': 'X',
+            'ts': event['start'] * 1e6,
+            'dur': event['wall'] * 1e6,
+            'pid': pid,
+            'tid': event['thread'],
+            'args': {'scene': event['scene'], 'cpu_ms': event['cpu'] * 1e3,
+                     'peak_rss_mb': event['peak_rss_mb']},
+        } for event in self.events]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+    def print_summary(self):
+        stages, _ = self.summary()
+        print(f"\n{'阶段':<16}{'次数':>6}{'墙钟(s)':>10}{'CPU(s)':>10}{'子进程CPU(s)':>14}")
+        for name, entry in sorted(stages.items(), key=lambda item: -item[1]['wall']):
+            print(f"{name:<16}{entry['count']:>6}{entry['wall']:>10.3f}"
+                  f"{entry['cpu']:>10.3f}{entry['child_cpu']:>14.3f}")
+        rss = peak_rss_mb()
+        if rss is not None:
+            print(f"📈 峰值内存: {rss:.0f} MB (ffmpeg 子进程: {peak_rss_mb(children=True):.0f} MB)")
+
+
+_current = None
+
+
+def enable():
+    """启用全局计时器并返回它"""
+    global _current
+    _current = Profiler()
+    return _current
+
+
+def disable():
+    global _current
+    _current = None
+
+
+def current():
+    return _current
+
+
+def stage(name, scene=None):
+    """记录一个阶段；未启用计时器时为空操作"""
+    if _current is None:
+        return nullcontext()
+    return _current.stage(name, scene)
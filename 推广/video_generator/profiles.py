@@ -0,0 +1,113 @@
+"""
+编码配置
+命名的编码档位（draft / web / archival）+ 编码器选择。
+演示视频以静态幻灯片为主：x264 的 stillimage 调优、10 秒的长 GOP 和 CRF 码率控制
+能同时缩短编码时间、减小文件体积。编码器按本机 ffmpeg 实际支持的列表检测，
+线程数按 CPU 核心数自动决定。
+"""
+
+import os
+import subprocess
+from functools import lru_cache
+
+from encoder import find_ffmpeg
+
+# 编码器 -> 默认扩展名
+CODECS = {
+    'libx264': '.mp4',
+    'libx265': '.mp4',
+    'libvpx-vp9': '.webm',
+    'libaom-av1': '.mp4',
+    'libsvtav1': '.mp4',
+}
+
+# speed: x264 / x265 的 preset 名称，其他编码器按 SPEED_LEVELS 换算
+# crf: 各编码器的 CRF 标度不同，按编码器分别给出主观质量相近的取值
+PROFILES = {
+    'draft': {
+        'codec': 'libx264',
+        'speed': 'ultrafast',
+        'crf': {'libx264': 30, 'libx265': 34, 'libvpx-vp9': 42, 'libaom-av1': 42, 'libsvtav1': 45},
+        'gop_seconds': 10,
+    },
+    'web': {
+        'codec': 'libx264',
+        'speed': 'medium',
+        'crf': {'libx264': 23, 'libx265': 28, 'libvpx-vp9': 33, 'libaom-av1': 32, 'libsvtav1': 35},
+        'gop_seconds': 10,
+    },
+    'archival': {
+        'codec': 'libx264',
+        'speed': 'slow',
+        'crf': {'libx264': 16, 'libx265': 20, 'libvpx-vp9': 24, 'libaom-av1': 22, 'libsvtav1': 25},
+        'gop_seconds': 2,
+    },
+}
+
+# preset 名称 -> (libvpx / libaom 的 cpu-used, SVT-AV1 的 preset)
+SPEED_LEVELS = {
+    'ultrafast': (8, 12),
+    'fast': (5, 10),
+    'medium': (3, 8),
+    'slow': (1, 5),
+    'veryslow': (0, 3),
+}
+
+
+@lru_cache(maxsize=1)
+def available_encoders():
+    """本机 ffmpeg 支持的视频编码器名称集合"""
+    output = subprocess.run([find_ffmpeg(), '-hide_banner', '-encoders'],
+                            capture_output=True, text=True, check=False).stdout
+    encoders = set()
+    for line in output.splitlines():
+        parts = line.split()
+        # 编码器行形如 " V....D libx264   libx264 H.264 / AVC ..."
+        if len(parts) >= 2 and parts[0].startswith('V') and len(parts[0]) == 6:
+            encoders.add(parts[1])
+    return encoders
+
+
+def check_codec(codec):
+    """确认编码器受支持且本机 ffmpeg 可用"""
+    if codec not in CODECS:
+        raise ValueError(f"不支持的编码器: {codec}，可选: {', '.join(CODECS)}")
+    encoders = available_encoders()
+    # 无法列出编码器（如精简的 ffmpeg）时交给 ffmpeg 自己报错
+    if encoders and codec not in encoders:
+        usable = [name for name in CODECS if name in encoders]
+        raise RuntimeError(f"本机 ffmpeg 不支持 {codec}，可用: {', '.join(usable) or '无'}")
+    return codec
+
+
+def default_threads(encoders=1):
+    """按 CPU 核心数分配编码线程；同时运行多个编码时平分"""
+    return max(1, (os.cpu_count() or 1) // max(1, encoders))
+
+
+def profile_args(profile='web', codec=None, fps=30):
+    """编码档位对应的 ffmpeg 输出参数（不含 -c:v / -threads，由编码器统一添加）"""
+    if profile not in PROFILES:
+        raise ValueError(f"未知的编码档位: {profile}，可选: {', '.join(PROFILES)}")
+    settings = PROFILES[profile]
+    codec = codec or settings['codec']
+    crf = str(settings['crf'][codec])
+    gop = str(int(fps * settings['gop_seconds']))
+    speed = settings['speed']
+    cpu_used, svt_preset = SPEED_LEVELS[speed]
+    if codec == 'libx264':
+        args = ['-preset', speed, '-tune', 'stillimage', '-crf', crf]
+    elif codec == 'libx265':
+        # hvc1 标签让 QuickTime / Safari 能直接播放；x265 自己的日志不受 -loglevel 控制，单独压低
+        args = ['-preset', speed, '-crf', crf, '-tag:v', 'hvc1', '-x265-params', 'log-level=error']
+    elif codec == 'libvpx-vp9':
+        args = ['-crf', crf, '-b:v', '0', '-deadline', 'realtime' if speed == 'ultrafast' else 'good',
+                '-cpu-used', str(cpu_used), '-row-mt', '1']
+    elif codec == 'libaom-av1':
+        args = ['-crf', crf, '-b:v', '0', '-cpu-used', str(cpu_used), '-row-mt', '1']
+    else:
+        args = ['-crf', crf, '-preset', str(svt_preset)]
+    args += ['-g', gop]
+    if CODECS[codec] == '.mp4':
+        args += ['-movflags', '+faststart']
+    return args
@@ -0,0 +1,274 @@
+"""
+渲染计划
+场景布局先编译为绘制指令列表：文字测量、居中等布局计算只在编译时做一次，
+光栅化时在一张画布上顺序批量执行。计划是由元组组成的不可变值，
+可以缓存、pickle 到子进程、作为场景缓存键，并在共享布局的视频变体间复用。
+
+多个场景共用的部分（Logo 圆圈、标题栏、终端窗口的红绿灯）写成图层：图层本身是一个不透明的小计划，
+在进程内只光栅化一次并缓存，之后在各场景中按位置整块复制，批量生成变体时也共享这份缓存。
+
+布局坐标以设计尺寸（计划的 size，默认 1920x1080）为单位，光栅化时可以按比例缩放到
+任意输出尺寸：同一个计划既能出 720p 预览也能出 4K 母版，宽高比不同时居中留边。
+"""
+
+import os
+from collections import namedtuple
+from functools import lru_cache
+from itertools import groupby
+from PIL import ImageDraw
+
+from fonts import get_font
+from frames import as_frame, background_pixels, new_canvas
+from profiler import stage
+
+# size: (宽, 高)；background: 背景色；ops: 绘制指令元组
+RenderPlan = namedtuple('RenderPlan', ['size', 'background', 'ops'])
+
+# 主题颜色：key 为主题中的颜色名，rgb 为解析好的 RGB 元组
+Swatch = namedtuple('Swatch', ['key', 'rgb'])
+
+
+@lru_cache(maxsize=256)
+def hex_to_rgb(hex_color):
+    """将 hex 颜色转换为 RGB"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def to_rgb(value):
+    """颜色值（hex / RGB 元组 / 主题颜色）转换为 RGB 元组"""
+    if isinstance(value, Swatch):
+        return value.rgb
+    return hex_to_rgb(value) if isinstance(value, str) else value
+
+
+# ---- 绘制指令 ----
+# 坐标与颜色都是普通值，字体用 (角色, 字号) 表示，光栅化时再取字体对象
+
+def text_op(xy, text, fill, role, size):
+    return ('text', tuple(xy), text, fill, role, size)
+
+
+def rect_op(box, fill=None, outline=None, width=1):
+    return ('rect', tuple(box), fill, outline, width)
+
+
+def rounded_rect_op(box, radius, fill=None):
+    return ('rounded_rect', tuple(box), radius, fill)
+
+
+def ellipse_op(box, fill=None, outline=None, width=1):
+    return ('ellipse', tuple(box), fill, outline, width)
+
+
+def line_op(points, fill, width=1):
+    return ('line', tuple(tuple(p) for p in points), fill, width)
+
+
+def layer_op(xy, layer):
+    """在 xy 处整块复制预渲染的图层（RenderPlan，不透明）"""
+    return ('layer', tuple(xy), layer)
+
+
+# ---- 布局辅助 ----
+
+@lru_cache(maxsize=4096)
+def text_bbox(text, role, size):
+    """文字包围盒（与 draw.textbbox((0, 0), ...) 一致），按 (文字, 字体) 缓存"""
+    return get_font(role, size).getbbox(text)
+
+
+def text_size(text, role, size):
+    """文字宽高"""
+    bbox = text_bbox(text, role, size)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+def centered_x(text, role, size, width):
+    """水平居中时文字的 x 坐标"""
+    return (width - text_size(text, role, size)[0]) // 2
+
+
+def freeze(value):
+    """把 list / dict 递归转换为可哈希的元组，用作计划缓存键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def file_stamps(layout, kwargs):
+    """布局读取的数据文件（layout.file_args 列出的参数）的 (路径, 修改时间, 大小)"""
+    stamps = []
+    for name in getattr(layout, 'file_args', ()):
+        path = kwargs.get(name)
+        if path is not None:
+            info = os.stat(path)
+            stamps.append((path, info.st_mtime_ns, info.st_size))
+    return tuple(stamps)
+
+
+@lru_cache(maxsize=256)
+def _compile_frozen(layout, frozen_kwargs, context, stamps):
+    return layout(**{k: v for k, v in frozen_kwargs})
+
+
+def compile_plan(layout, kwargs, context=None):
+    """调用布局函数生成计划；相同参数的计划只编译一次
+
+    context 为影响布局结果的全局状态（如当前主题），须可哈希，参与缓存键；
+    布局读取的数据文件按修改时间和大小参与缓存键，文件改动后重新编译。
+    """
+    return _compile_frozen(layout, freeze(kwargs), context, file_stamps(layout, kwargs))
+
+
+# ---- 缩放 ----
+
+def transform_ops(ops, scale=1.0, offset=(0, 0)):
+    """按 x' = x * scale + dx 变换绘制指令的坐标，线宽、圆角、字号按 scale 缩放"""
+    dx, dy = offset
+
+    def point(x, y):
+        return (round(x * scale + dx), round(y * scale + dy))
+
+    def box(b):
+        return (*point(b[0], b[1]), *point(b[2], b[3]))
+
+    def length(value):
+        return max(1, round(value * scale))
+
+    scaled = []
+    for op in ops:
+        kind = op[0]
+        if kind == 'text':
+            _, xy, text, fill, role, font_size = op
+            scaled.append(text_op(point(*xy), text, fill, role, length(font_size)))
+        elif kind == 'rect':
+            _, b, fill, outline, width = op
+            scaled.append(rect_op(box(b), fill, outline, length(width)))
+        elif kind == 'rounded_rect':
+            _, b, radius, fill = op
+            scaled.append(rounded_rect_op(box(b), length(radius), fill))
+        elif kind == 'ellipse':
+            _, b, fill, outline, width = op
+            scaled.append(ellipse_op(box(b), fill, outline, length(width)))
+        elif kind == 'line':
+            _, points, fill, width = op
+            scaled.append(line_op([point(*p) for p in points], fill, length(width)))
+        elif kind == 'layer':
+            # 图层内容与场景用同一比例变换，取整后的位置与直接画在场景里一致；
+            # 范围按最后一个像素（含端点，与 rect 指令相同）取整
+            _, xy, layer = op
+            x0, y0, x1, y1 = box((*xy, xy[0] + layer.size[0] - 1, xy[1] + layer.size[1] - 1))
+            inner = transform_ops(layer.ops, scale, (xy[0] * scale + dx - x0, xy[1] * scale + dy - y0))
+            scaled.append(layer_op((x0, y0), RenderPlan((max(1, x1 - x0 + 1), max(1, y1 - y0 + 1)),
+                                                         layer.background, inner)))
+        else:
+            raise ValueError(f"未知的绘制指令: {kind}")
+    return tuple(scaled)
+
+
+def fit_transform(source, size):
+    """把 source 尺寸等比缩放进 size 并居中的 (缩放比例, 偏移)"""
+    scale = min(size[0] / source[0], size[1] / source[1])
+    return scale, ((size[0] - source[0] * scale) / 2, (size[1] - source[1] * scale) / 2)
+
+
+def scale_ops(ops, source, size):
+    """把 source 尺寸下的绘制指令等比缩放到 size，宽高比不同时居中"""
+    return transform_ops(ops, *fit_transform(source, size))
+
+
+@lru_cache(maxsize=64)
+def scale_plan(plan, size):
+    """把设计尺寸下的计划等比缩放到目标尺寸，宽高比不同时居中，四周用背景色留边"""
+    size = tuple(size)
+    if size == plan.size:
+        return plan
+    return RenderPlan(size, plan.background, scale_ops(plan.ops, plan.size, size))
+
+
+# ---- 光栅化 ----
+
+def rasterize(plan, size=None):
+    """在一张画布上顺序执行计划中的全部绘制指令，返回只读 RGB 帧（与画布共享内存）
+
+    size 为输出尺寸，缺省按计划的设计尺寸光栅化。
+    """
+    if size is not None:
+        plan = scale_plan(plan, tuple(size))
+    with stage('draw'):
+        buf = _draw(plan)
+    return as_frame(buf)
+
+
+def draw_ops(draw, ops):
+    """在 ImageDraw 上顺序执行绘制指令"""
+    for op in ops:
+        kind = op[0]
+        if kind == 'text':
+            _, xy, text, fill, role, size = op
+            draw.text(xy, text, fill=to_rgb(fill), font=get_font(role, size))
+        elif kind == 'rect':
+            _, box, fill, outline, width = op
+            draw.rectangle(box, fill=to_rgb(fill), outline=to_rgb(outline), width=width)
+        elif kind == 'rounded_rect':
+            _, box, radius, fill = op
+            draw.rounded_rectangle(box, radius=radius, fill=to_rgb(fill))
+        elif kind == 'ellipse':
+            _, box, fill, outline, width = op
+            draw.ellipse(box, fill=to_rgb(fill), outline=to_rgb(outline), width=width)
+        elif kind == 'line':
+            _, points, fill, width = op
+            draw.line(points, fill=to_rgb(fill), width=width, joint='curve')
+        elif kind == 'layer':
+            raise ValueError("图层指令只能出现在渲染计划中（由 open_canvas 复制）")
+        else:
+            raise ValueError(f"未知的绘制指令: {kind}")
+
+
+@lru_cache(maxsize=64)
+def layer_pixels(layer):
+    """光栅化图层，返回只读 RGBX 缓冲；同一个图层在进程内只渲染一次"""
+    buf = _draw(layer)
+    buf.flags.writeable = False
+    return buf
+
+
+def paste_layer(buf, xy, layer):
+    """把图层整块复制到帧缓冲的 xy 处，超出画布的部分裁掉"""
+    pixels = layer_pixels(layer)
+    x, y = xy
+    height, width = buf.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + pixels.shape[1], width), min(y + pixels.shape[0], height)
+    if x0 < x1 and y0 < y1:
+        buf[y0:y1, x0:x1] = pixels[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def layer_cache_stats():
+    """图层缓存命中统计（含纯色背景）"""
+    layers, backgrounds = layer_pixels.cache_info(), background_pixels.cache_info()
+    return {'hits': layers.hits + backgrounds.hits, 'misses': layers.misses + backgrounds.misses,
+            'size': layers.currsize + backgrounds.currsize}
+
+
+def open_canvas(plan):
+    """分配画布并执行计划的全部指令，返回 (ImageDraw, RGBX 缓冲)，之后可以继续叠加绘制
+
+    图层指令直接复制缓存的像素，其余指令按顺序交给 Pillow 绘制。
+    """
+    img, buf = new_canvas(plan.size, to_rgb(plan.background))
+    draw = ImageDraw.Draw(img)
+    for is_layer, ops in groupby(plan.ops, key=lambda op: op[0] == 'layer'):
+        if is_layer:
+            for _, xy, layer in ops:
+                paste_layer(buf, xy, layer)
+        else:
+            draw_ops(draw, ops)
+    return draw, buf
+
+
+def _draw(plan):
+    return open_canvas(plan)[1]
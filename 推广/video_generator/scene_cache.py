@@ -0,0 +1,119 @@
+"""
+场景帧磁盘缓存
+以 (场景函数源码, 参数, 配色, 分辨率, 字体文件修改时间) 的哈希为键保存渲染结果，
+只修改一个场景时其余场景直接读缓存。缓存目录按总大小做 LRU 淘汰。
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import numpy as np
+
+from fonts import font_fingerprint
+from frames import CHANNELS, as_frame, pack, packed_buffer
+
+# 缓存格式变化时递增，使旧缓存全部失效
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'scenes')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def scene_key(scene, context):
+    """计算场景内容哈希；context 为影响渲染的全局配置（配色、分辨率等）"""
+    builder = scene['builder']
+    try:
+        source = inspect.getsource(builder)
+    except (OSError, TypeError):
+        source = None
+    payload = {
+        'version': CACHE_VERSION,
+        'builder': f"{builder.__module__}.{builder.__qualname__}",
+        'source': source,
+        'kwargs': scene['kwargs'],
+        'context': context,
+        'fonts': font_fingerprint()
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def evict_lru(directory, max_bytes, suffix):
+    """按修改时间从旧到新删除 directory 下以 suffix 结尾的文件，直到总大小不超过 max_bytes"""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    return total
+
+
+class SceneCache:
+    """按内容哈希存取场景帧的目录缓存"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """读取缓存帧，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                buf = data['frame']
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        # 刷新修改时间，作为 LRU 的访问时间
+        os.utime(path)
+        self.hits += 1
+        return as_frame(buf) if buf.shape[-1] == CHANNELS else pack(buf)
+
+    def put(self, key, frame):
+        """写入缓存帧（先写临时文件再原子替换），然后按大小淘汰"""
+        # 存整块 RGBX 缓冲，读取时直接得到可映射的帧，不再转换
+        buf = packed_buffer(frame)
+        if buf is None:
+            buf = frame
+        fd, tmp_path = tempfile.mkstemp(suffix='.npz.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, frame=buf)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限"""
+        return evict_lru(self.cache_dir, self.max_bytes, '.npz')
+
+    def clear(self):
+        """清空缓存目录"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir, name))
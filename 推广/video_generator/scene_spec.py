@@ -0,0 +1,86 @@
+"""
+场景描述文件
+用 JSON / YAML 描述场景序列（场景类型 + 文案数据 + 时长），加载后得到与 SCENES 相同结构的场景编排，
+再编译为渲染计划。不同数据文件共享同一套布局代码，生成多个变体无需重新导入执行脚本。
+
+格式示例:
+{
+  "defaults": {"duration": 5, "fade_in": 0.5, "fade_out": 0.5},
+  "scenes": [
+    {"type": "text", "title": "开场 Hook", "duration": 3, "text": "你的 AI 助手太烧钱？"},
+    {"type": "terminal", "commands": [["$ ", "#6CC644"], ["npm run build", "#F8FAFC"]]}
+  ]
+}
+除 type / title / duration / fade_in / fade_out 外的字段都作为布局函数的参数。
+"""
+
+import inspect
+import json
+import os
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+SCENE_DEFAULTS = {'duration': 5, 'fade_in': 0.5, 'fade_out': 0.5}
+
+# 场景自身的属性，其余字段交给布局函数
+META_KEYS = ('type', 'title', 'duration', 'fade_in', 'fade_out')
+
+
+def load_spec(path):
+    """读取场景描述文件（.json / .yaml / .yml）"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8') as f:
+        if ext in ('.yaml', '.yml'):
+            if yaml is None:
+                raise RuntimeError("读取 YAML 场景描述需要 PyYAML：pip install pyyaml")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get('scenes'), list):
+        raise ValueError(f"场景描述缺少 scenes 列表: {path}")
+    return spec
+
+
+def parse_spec(spec, layouts):
+    """把场景描述转换为场景编排，layouts 为 场景类型 -> 布局函数"""
+    defaults = {**SCENE_DEFAULTS, **spec.get('defaults', {})}
+    scenes = []
+    for i, item in enumerate(spec['scenes'], 1):
+        scene_type = item.get('type')
+        if scene_type not in layouts:
+            raise ValueError(f"场景 {i}: 未知的场景类型 {scene_type!r}，可选: {', '.join(layouts)}")
+        layout = layouts[scene_type]
+        kwargs = {k: v for k, v in item.items() if k not in META_KEYS}
+        params = inspect.signature(layout).parameters
+        unknown = sorted(set(kwargs) - set(params))
+        if unknown:
+            raise ValueError(f"场景 {i} ({scene_type}): 不支持的字段 {', '.join(unknown)}")
+        scenes.append({
+            'title': item.get('title', f"{scene_type} {i}"),
+            'layout': layout,
+            'kwargs': kwargs,
+            'duration': item.get('duration', defaults['duration']),
+            'fade_in': item.get('fade_in', defaults['fade_in']),
+            'fade_out': item.get('fade_out', defaults['fade_out']),
+        })
+    return scenes
+
+
+def apply_overrides(spec, overrides):
+    """按场景标题覆盖字段，返回新的场景描述（用于同一布局的语言 / 价格变体）"""
+    if not overrides:
+        return spec
+    titles = [item.get('title') for item in spec['scenes']]
+    unknown = sorted(set(overrides) - set(titles))
+    if unknown:
+        raise ValueError(f"覆盖了不存在的场景: {', '.join(unknown)}")
+    scenes = [{**item, **overrides.get(item.get('title'), {})} for item in spec['scenes']]
+    return {**spec, 'scenes': scenes}
+
+
+def load_scenes(path, layouts, overrides=None):
+    """读取场景描述文件并转换为场景编排"""
+    return parse_spec(apply_overrides(load_spec(path), overrides), layouts)
@@ -0,0 +1,180 @@
+"""
+场景并行渲染调度
+各场景函数彼此独立，分发到进程池并行光栅化。
+子进程把渲染好的帧写入共享内存，只回传共享内存名和形状，避免 pickle 整帧数据。
+流式渲染时最多 window 个场景在渲染中或等待消费，内存占用与场景总数无关。
+
+流式渲染时进程池可能在编码器（moviepy / ffmpeg 子进程）启动之后才创建：直接 fork 的子进程
+会继承编码器 stdin 管道的写端，编码器永远读不到 EOF。工作进程因此由 forkserver（没有时用 spawn）
+启动，不继承父进程打开的文件描述符。
+
+批量生成多个变体时用同一个 ScenePool：工作进程只启动一次，进程内的字体、图层、调色板缓存
+在各变体之间保留。场景按在编排中的位置固定分给某个工作进程，各变体的同一场景落在同一进程，
+能命中上一个变体留下的缓存；每个场景渲染完回传该工作进程的缓存统计，由父进程汇总。
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+from frames import CHANNELS, as_frame, pack, packed_buffer
+
+
+def resolve_jobs(jobs):
+    """jobs <= 0 表示使用全部 CPU 核心"""
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def pool_context():
+    """进程池的启动方式：forkserver / spawn 的工作进程不继承编码器管道"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _create_untracked_shm(size):
+    """创建共享内存，所有权交给父进程，子进程退出时不应被回收"""
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数，手动从子进程的 resource_tracker 注销
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _render_to_shm(builder, kwargs, stats=None):
+    """子进程：渲染场景并写入共享内存；stats 不为空时一并回传本进程的累计统计"""
+    frame = builder(**kwargs)
+    # 回传整块 RGBX 缓冲（单次连续拷贝），父进程直接得到可映射的帧
+    data = packed_buffer(frame)
+    if data is None:
+        data = frame
+    shm = _create_untracked_shm(data.nbytes)
+    try:
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[...] = data
+        return (shm.name, data.shape, data.dtype.str), os.getpid(), stats() if stats else None
+    finally:
+        shm.close()
+
+
+def _take_from_shm(name, shape, dtype):
+    """父进程：从共享内存取回帧并释放共享内存"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.array(np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+    finally:
+        shm.close()
+        shm.unlink()
+    return as_frame(data) if data.shape[-1] == CHANNELS else pack(data)
+
+
+class ScenePool:
+    """可在多次渲染之间复用的进程池：每个工作进程一个单进程执行器，按槽位分派
+
+    stats 为可 pickle 的无参函数，在工作进程中调用，返回 {名称: 计数}；
+    stats() 方法按工作进程取最新的累计值再求和。
+    """
+
+    def __init__(self, jobs=0, stats=None):
+        self.jobs = resolve_jobs(jobs)
+        context = pool_context()
+        self._executors = [ProcessPoolExecutor(max_workers=1, mp_context=context)
+                           for _ in range(self.jobs)]
+        self._stats = stats
+        self._worker_stats = {}
+
+    def submit(self, builder, kwargs, slot=0):
+        """在第 slot % jobs 个工作进程中渲染"""
+        executor = self._executors[slot % self.jobs]
+        return executor.submit(_render_to_shm, builder, kwargs, self._stats)
+
+    def take(self, future):
+        """取回渲染结果并释放共享内存，记下工作进程的统计"""
+        shm, pid, stats = future.result()
+        if stats is not None:
+            self._worker_stats[pid] = stats
+        return _take_from_shm(*shm)
+
+    def stats(self):
+        """各工作进程统计之和"""
+        total = {}
+        for stats in self._worker_stats.values():
+            for name, value in stats.items():
+                total[name] = total.get(name, 0) + value
+        return total
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _discard(pool, pending):
+    """取消未开始的场景，并回收已完成场景占用的共享内存"""
+    for _, future in pending:
+        if future is not None:
+            future.cancel()
+    for _, future in pending:
+        if future is None or future.cancelled() or future.exception() is not None:
+            continue
+        pool.take(future)
+
+
+def _collect(pool, scene, future):
+    """取回一个场景的帧：直接携带的帧或子进程渲染结果"""
+    if future is None:
+        return scene, scene['frame']
+    return scene, pool.take(future)
+
+
+def iter_scenes_parallel(scenes, jobs=0, window=None, pool=None):
+    """按场景顺序产出 (场景, 帧)，scenes 可以是惰性的迭代器
+
+    同时在渲染中或等待消费的场景不超过 window（默认等于进程数）；
+    已带 'frame' 的场景（如命中缓存）不提交渲染，按顺序原样产出。
+    第 i 个场景交给第 i % 进程数 个工作进程。
+    pool 为调用方持有的 ScenePool 时复用它（进程数取自 pool），用完不关闭。
+    """
+    owned = pool is None
+    if owned:
+        pool = ScenePool(jobs)
+    window = max(1, window or pool.jobs)
+    pending = deque()
+    try:
+        for i, scene in enumerate(scenes):
+            future = None
+            if scene.get('frame') is None:
+                future = pool.submit(scene['builder'], scene['kwargs'], i)
+            pending.append((scene, future))
+            if len(pending) >= window:
+                yield _collect(pool, *pending.popleft())
+        while pending:
+            yield _collect(pool, *pending.popleft())
+    finally:
+        _discard(pool, pending)
+        if owned:
+            pool.close()
+
+
+def render_scenes_parallel(scenes, jobs=0, on_done=None):
+    """并行渲染所有场景，按场景顺序返回帧列表
+
+    on_done(index, scene) 在每个场景取回后按场景顺序回调。
+    """
+    jobs = min(resolve_jobs(jobs), len(scenes)) or 1
+    frames = []
+    for i, (scene, frame) in enumerate(iter_scenes_parallel(scenes, jobs, window=len(scenes))):
+        frames.append(frame)
+        if on_done is not None:
+            on_done(i, scene)
+    return frames
@@ -0,0 +1,134 @@
+"""
+分段增量编码
+每个场景单独编码为闭合 GOP 的 H.264 片段，按场景内容哈希缓存；
+最终用 concat 分离器流复制拼接，改动一个场景只需重新编码这一段。
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from animation import is_animation
+from encoder import find_ffmpeg, frame_micros, write_video_ffmpeg
+from frames import iter_rows
+from scene_cache import evict_lru
+from profiler import stage
+
+DEFAULT_SEGMENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'segments')
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# 片段编码格式变化时递增，使旧片段全部失效
+SEGMENT_VERSION = 2
+
+
+def segment_args(fps):
+    """保证片段可以流复制拼接的编码参数：闭合 GOP、统一时间基、不跨片段引用"""
+    return [
+        '-flags', '+cgop',
+        '-g', str(fps * 10),
+        '-video_track_timescale', str(fps * 100),
+    ]
+
+
+def segment_key(frame, duration, fade_in, fade_out, fps, codec, frame_mode, dedup, extra_args=()):
+    """场景片段的内容哈希：帧像素（动画为动画计划）+ 时间参数 + 编码参数"""
+    digest = hashlib.sha256()
+    digest.update(str(frame.shape).encode('ascii'))
+    if is_animation(frame):
+        digest.update(repr(frame.plan).encode('utf-8'))
+    else:
+        for rows in iter_rows(frame):
+            digest.update(rows)
+    params = {
+        'version': SEGMENT_VERSION,
+        'duration': duration, 'fade_in': fade_in, 'fade_out': fade_out,
+        'fps': fps, 'codec': codec, 'frame_mode': frame_mode, 'dedup': dedup,
+        'extra_args': list(extra_args)
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def encode_segment(scene, path, fps, codec, threads, dedup, frame_mode, extra_args=()):
+    """把单个场景编码为片段（先写临时文件再原子替换）
+
+    片段截到恰好 round(时长 × fps) 帧，末尾不带多余的时长，拼接后后续场景不会漂移。
+    """
+    frames = round(scene[1] * fps)
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(suffix='.mp4', dir=directory)
+    os.close(fd)
+    try:
+        write_video_ffmpeg([scene], tmp_path, fps=fps, codec=codec, threads=threads,
+                           dedup=dedup, frame_mode=frame_mode,
+                           extra_args=[*extra_args, *segment_args(fps), '-frames:v', str(frames)])
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def concat_segments(paths, output_path, durations=None, fps=30):
+    """用 concat 分离器流复制拼接片段，不重新编码
+
+    durations 为各片段的场景时长：按帧数写入列表，下一片段从这里开始，
+    不依赖容器记录的时长（vfr 片段的容器时长按最后一个解码时间戳估算，并不准确）。
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.ffconcat', delete=False, encoding='utf-8') as f:
+        f.write('ffconcat version 1.0\n')
+        for i, path in enumerate(paths):
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+            if durations is not None:
+                micros = frame_micros(round(durations[i] * fps), fps)
+                f.write(f"duration {micros // 1000000}.{micros % 1000000:06d}\n")
+        list_path = f.name
+    try:
+        cmd = [
+            find_ffmpeg(), '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-c', 'copy', '-movflags', '+faststart',
+            output_path
+        ]
+        code = subprocess.call(cmd)
+    finally:
+        os.remove(list_path)
+    if code != 0:
+        raise RuntimeError(f"ffmpeg 退出码 {code}")
+
+
+def write_video_segments(scenes, output_path, fps=30, codec='libx264', threads=4,
+                         dedup=True, frame_mode='vfr', segment_dir=DEFAULT_SEGMENT_DIR,
+                         max_bytes=DEFAULT_MAX_BYTES, extra_args=()):
+    """逐场景编码（命中缓存的片段直接复用）后拼接，返回视频时长；scenes 可以是惰性迭代器
+
+    extra_args 为编码档位参数，参与片段哈希；片段自身的闭合 GOP 参数排在其后。
+    """
+    os.makedirs(segment_dir, exist_ok=True)
+    paths = []
+    durations = []
+    encoded = 0
+    total = 0.0
+    for frame, duration, fade_in, fade_out in scenes:
+        key = segment_key(frame, duration, fade_in, fade_out, fps, codec, frame_mode, dedup,
+                          extra_args)
+        path = os.path.join(segment_dir, f"{key}.mp4")
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            with stage('segment_encode'):
+                encode_segment((frame, duration, fade_in, fade_out), path, fps, codec, threads,
+                               dedup, frame_mode, extra_args)
+            encoded += 1
+        paths.append(path)
+        durations.append(duration)
+        total += duration
+    print(f"🧩 片段: 重新编码 {encoded} / 复用 {len(paths) - encoded}")
+    with stage('concat'):
+        concat_segments(paths, output_path, durations, fps)
+    # 本次用到的片段刚刚刷新过修改时间，淘汰只会删除更早的片段
+    evict_lru(segment_dir, max_bytes, '.mp4')
+    return total
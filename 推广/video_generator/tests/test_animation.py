@@ -0,0 +1,67 @@
+"""
+精灵动画回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from animation import SpritePlan, SpriteAnimation, make_sprite
+from render_plan import RenderPlan, draw_ops, open_canvas, rasterize, rounded_rect_op, text_op
+
+BACKGROUND = (15, 23, 42)
+
+
+def bubble_plan():
+    """深色背景上渐显的消息框和文字（抗锯齿边缘既有文字也有圆角）"""
+    ops = [rounded_rect_op((10, 10, 150, 50), radius=12, fill=(59, 130, 246)),
+           text_op((20, 18), 'Ag 你好', (241, 245, 249), 'sans', 20)]
+    base = RenderPlan((160, 60), BACKGROUND, ())
+    sprite = make_sprite(ops, (10, 10, 150, 50), start=0, duration=1)
+    return SpritePlan(base, (sprite,)), ops
+
+
+class SpriteFadeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plan, self.ops = bubble_plan()
+        _, buf = open_canvas(self.plan.base)
+        self.background = buf[..., :3].astype(float)
+        final = Image.new('RGB', self.plan.base.size, BACKGROUND)
+        draw_ops(ImageDraw.Draw(final), self.ops)
+        self.final = np.asarray(final).astype(float)
+
+    def test_mid_fade_is_cross_fade(self):
+        """渐显中的每一帧 = 背景与完成画面按不透明度交叉淡化，抗锯齿边缘没有暗边"""
+        animation = SpriteAnimation(self.plan)
+        for t in (0.2, 0.5, 0.8):
+            level = SpriteAnimation.state(self.plan.sprites[0], t)[2]
+            expected = self.background + (self.final - self.background) * level / 255
+            frame = animation.poster(t)[..., :3].astype(float)
+            self.assertLessEqual(np.abs(frame - expected).max(), 1.5, f"t={t}")
+
+    def test_final_frame_matches_static(self):
+        frame = SpriteAnimation(self.plan).poster()[..., :3].astype(float)
+        self.assertLessEqual(np.abs(frame - self.final).max(), 1)
+
+
+class ScaledChatTest(unittest.TestCase):
+
+    def test_final_frame_matches_static_at_other_sizes(self):
+        """缩放后字号取整，文字会超出按比例缩放的精灵框；完成后的画面仍与静态聊天场景一致"""
+        for size in [(3840, 2160), (1080, 1920), (640, 360)]:
+            final = SpriteAnimation(gv.layout_animated_chat_scene(), size).poster()
+            static = rasterize(gv.layout_chat_demo_scene(), size)
+            diff = np.abs(final[..., :3].astype(int) - static[..., :3].astype(int))
+            self.assertLessEqual(diff.max(), 1, f"size={size}")
+
+
+if __name__ == '__main__':
+    unittest.main()
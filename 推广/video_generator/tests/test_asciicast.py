@@ -0,0 +1,84 @@
+"""
+asciinema 录屏回放回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from asciicast import TerminalGrid, read_cast
+from render_plan import compile_plan
+
+FG, BG = '#E5E5E5', '#000000'
+
+
+def write_cast(path, outputs, cols=10, rows=3):
+    """按 asciicast v2 格式写一个小录屏，outputs 为输出数据列表（每 0.1 秒一条）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'version': 2, 'width': cols, 'height': rows}) + '\n')
+        for i, data in enumerate(outputs):
+            f.write(json.dumps([round(0.1 * (i + 1), 3), 'o', data]) + '\n')
+    return path
+
+
+def replay(path):
+    """逐个事件回放录屏，返回网格和每行的文字"""
+    header, events = read_cast(path)
+    grid = TerminalGrid(header['width'], header['height'], FG, BG)
+    for _, data in events:
+        grid.feed(data)
+    return grid, [''.join(cell[0] for cell in row) for row in grid.cells]
+
+
+class TerminalReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def cast(self, *outputs, cols=10, rows=3):
+        return write_cast(os.path.join(self.tmp.name, 'demo.cast'), outputs, cols, rows)
+
+    def test_cursor_movement(self):
+        """绝对定位、相对移动、保存 / 恢复光标；转义序列可以被拆在两个事件里"""
+        grid, lines = replay(self.cast('abc', '\x1b[2;5HX', '\x1b[1A\x1b[2DY', '\x1b', '[3;1HZ',
+                                       '\x1b7\x1b[1;1H#\x1b8!'))
+        self.assertEqual(lines, ['#bcY      ', '    X     ', 'Z!        '])
+        self.assertEqual(grid.cursor(), (2, 2))
+
+    def test_erase(self):
+        """清到行尾 / 清到行首 / 清到屏尾 / 删除字符"""
+        _, lines = replay(self.cast('0123456789', '\r\nabcdefghij', '\r\nABCDEFGHIJ',
+                                    '\x1b[1;4H\x1b[K', '\x1b[2;3H\x1b[2P', '\x1b[3;6H\x1b[1K'))
+        self.assertEqual(lines, ['012       ', 'abefghij  ', '      GHIJ'])
+        _, lines = replay(self.cast('0123456789', '\r\nabcdefghij', '\x1b[1;8H\x1b[J'))
+        self.assertEqual(lines, ['0123456   ', ' ' * 10, ' ' * 10])
+
+    def test_wrap_and_scroll(self):
+        """写满一行后下一个字符才换行；宽字符放不下时整体换到下一行；末行换行时滚屏"""
+        _, lines = replay(self.cast('0123456789', 'ab', cols=10, rows=3))
+        self.assertEqual(lines[:2], ['0123456789', 'ab        '])
+        _, lines = replay(self.cast('abcd你', cols=5, rows=3))
+        self.assertEqual(lines[:2], ['abcd ', '你   '])
+        _, lines = replay(self.cast('1\r\n2\r\n3\r\n4', cols=5, rows=3))
+        self.assertEqual(lines, ['2    ', '3    ', '4    '])
+
+    def test_plan_recompiled_when_cast_changes(self):
+        """录屏文件改动后计划缓存失效（修改时间和大小参与缓存键）"""
+        path = self.cast('hello')
+        kwargs = {'cast': path}
+        first = compile_plan(gv.layout_cast_terminal_scene, kwargs, gv.current_theme())
+        self.assertIs(compile_plan(gv.layout_cast_terminal_scene, kwargs, gv.current_theme()), first)
+        self.cast('hello', '\r\nworld')
+        self.assertNotEqual(compile_plan(gv.layout_cast_terminal_scene, kwargs, gv.current_theme()),
+                            first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+用量数据图表回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from charts import aggregate_usage
+from render_plan import compile_plan
+
+
+USAGE_CSV = """day,model,tokens
+2024-05-01,gpt,120
+2024-05-01,claude,80
+2024-05-02,gpt,35.5
+2024-05-01,gpt,4
+2024-05-03,local,0
+2024-05-02,claude,210
+2024-05-03,gpt,17
+2024-05-02,gpt,1.5
+"""
+
+
+def reference_sums(path, group, series, value):
+    """逐行用 Python 累加的 {(分组, 系列): 总和}"""
+    sums = {}
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            key = (row[group], row[series])
+            sums[key] = sums.get(key, 0.0) + float(row[value])
+    return sums
+
+
+def write_file(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+class UsageInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_bucket_sums_match_reference(self):
+        """分块读取的每个 (分组, 系列) 总和与逐行累加一致，没有数据的格子为 0"""
+        path = write_file(self.tmp.name, 'usage.csv', USAGE_CSV)
+        expected = reference_sums(path, 'day', 'model', 'tokens')
+        for chunk_rows in (3, 100):
+            table = aggregate_usage(path, 'day', 'tokens', 'model', chunk_rows=chunk_rows)
+            self.assertEqual(table.groups, ('2024-05-01', '2024-05-02', '2024-05-03'))
+            self.assertEqual(table.series, ('gpt', 'claude', 'local'))
+            for i, group in enumerate(table.groups):
+                for j, series in enumerate(table.series):
+                    self.assertAlmostEqual(table.values[i, j], expected.get((group, series), 0.0),
+                                           msg=f"{group} / {series} (chunk_rows={chunk_rows})")
+
+    def test_jsonl_null_value_names_column(self):
+        """JSONL 中的 null 报告列名，而不是 numpy 的 TypeError"""
+        path = write_file(self.tmp.name, 'usage.jsonl',
+                          '{"model": "a", "tokens": 10}\n{"model": "b", "tokens": null}\n')
+        with self.assertRaisesRegex(ValueError, 'tokens'):
+            aggregate_usage(path, 'model', 'tokens')
+
+    def test_plan_recompiled_when_file_changes(self):
+        """数据文件改动后计划缓存失效（修改时间和大小参与缓存键）"""
+        path = write_file(self.tmp.name, 'usage.csv', 'model,tokens\na,10\n')
+        kwargs = {'source': path, 'group': 'model', 'value': 'tokens'}
+        first = compile_plan(gv.layout_data_chart, kwargs, gv.current_theme())
+        self.assertIs(compile_plan(gv.layout_data_chart, kwargs, gv.current_theme()), first)
+        write_file(self.tmp.name, 'usage.csv', 'model,tokens\na,10\nb,25\n')
+        second = compile_plan(gv.layout_data_chart, kwargs, gv.current_theme())
+        self.assertNotEqual(second, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
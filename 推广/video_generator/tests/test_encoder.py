@@ -0,0 +1,133 @@
+"""
+编码后端回归测试（需要本机 ffmpeg）
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoder import find_ffmpeg, write_video_ffmpeg
+
+try:
+    FFMPEG = find_ffmpeg()
+except RuntimeError:
+    FFMPEG = None
+
+FPS = 30
+SIZE = (64, 36)
+
+
+def solid(color):
+    frame = np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    frame[:, :SIZE[0] // 2] = color
+    frame[:, SIZE[0] // 2:] = [255 - c for c in color]
+    return frame
+
+
+def scene_items():
+    """淡入淡出与静止段交替；时长不是 1/25 秒的整数倍"""
+    return [
+        (solid((200, 40, 40)), 1.1, 0.2, 0.3),
+        (solid((40, 180, 60)), 0.7, 0, 0.2),
+        (solid((30, 60, 220)), 1.3, 0.4, 0.1),
+    ]
+
+
+def probe_pts(path):
+    """输出视频每一帧的显示时间（秒）"""
+    output = subprocess.run([FFMPEG, '-i', path, '-vf', 'showinfo', '-f', 'null', '-'],
+                            capture_output=True, text=True).stderr
+    return [float(value) for value in re.findall(r'pts_time:([\d.]+)', output)]
+
+
+def container_duration(path):
+    """容器记录的时长（秒）"""
+    output = subprocess.run([FFMPEG, '-i', path], capture_output=True, text=True).stderr
+    hours, minutes, seconds = re.search(r'Duration: (\d+):(\d+):([\d.]+)', output).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def decode(path, size=SIZE):
+    """按恒定帧率解码为 RGB 帧序列（vfr 的静止段展开为重复帧）"""
+    raw = subprocess.run([FFMPEG, '-loglevel', 'error', '-i', path, '-vf', f'fps={FPS}',
+                          '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'], capture_output=True).stdout
+    return np.frombuffer(raw, np.uint8).reshape(-1, size[1], size[0], 3)
+
+
+@unittest.skipUnless(FFMPEG, "需要 ffmpeg")
+class ConcatTimingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.total_frames = sum(round(duration * FPS) for _, duration, _, _ in scene_items())
+        self.pipe_path = self.encode(dedup=False)
+        self.reference = decode(self.pipe_path)
+
+    def encode(self, dedup, frame_mode='vfr'):
+        path = os.path.join(self.tmp.name, f"{'concat' if dedup else 'pipe'}-{frame_mode}.mp4")
+        # 无损编码，两种后端的输出可以逐像素比较
+        write_video_ffmpeg(scene_items(), path, fps=FPS, threads=1, dedup=dedup,
+                           frame_mode=frame_mode, extra_args=['-qp', '0'])
+        return path
+
+    def assert_matches_pipe(self, path):
+        pts = probe_pts(path)
+        for t in pts:
+            self.assertAlmostEqual(t * FPS, round(t * FPS), places=3, msg=f"时间戳 {t} 不在 1/{FPS} 网格上")
+        self.assertLess(pts[-1], self.total_frames / FPS)
+        frames = decode(path)
+        self.assertEqual(len(frames), self.total_frames)
+        bad = [i for i in range(self.total_frames) if not np.array_equal(frames[i], self.reference[i])]
+        self.assertEqual(bad, [])
+        return pts
+
+    def test_pipe_frame_count(self):
+        self.assertEqual(len(probe_pts(self.pipe_path)), self.total_frames)
+        self.assertEqual(len(self.reference), self.total_frames)
+
+    def test_vfr_matches_pipe(self):
+        self.assert_matches_pipe(self.encode(dedup=True, frame_mode='vfr'))
+
+    def test_vfr_container_duration(self):
+        """默认参数带 B 帧，mp4 时长按解码时间戳计算；以静止段结尾时不能被截短"""
+        path = os.path.join(self.tmp.name, 'default-vfr.mp4')
+        items = scene_items()[:1] + [(scene_items()[1][0], 0.7, 0.2, 0)]
+        total = write_video_ffmpeg(items, path, fps=FPS, threads=1, frame_mode='vfr')
+        self.assertAlmostEqual(total, 1.8)
+        self.assertAlmostEqual(container_duration(path), total, places=2)
+
+    def test_cfr_matches_pipe(self):
+        pts = self.assert_matches_pipe(self.encode(dedup=True, frame_mode='cfr'))
+        self.assertEqual(len(pts), self.total_frames)
+
+
+
+@unittest.skipUnless(FFMPEG, "需要 ffmpeg")
+class LetterboxTest(unittest.TestCase):
+
+    def test_multi_output_pads_with_background(self):
+        """多分辨率输出中宽高比不同的竖屏输出，留边是给定的背景色而不是黑色"""
+        background = (15, 23, 42)
+        tall = (36, 64)
+        with tempfile.TemporaryDirectory() as tmp:
+            outputs = [(os.path.join(tmp, 'wide.mp4'), SIZE), (os.path.join(tmp, 'tall.mp4'), tall)]
+            for dedup in (True, False):
+                write_video_ffmpeg(scene_items()[:1], outputs, fps=FPS, threads=1, dedup=dedup,
+                                   extra_args=['-qp', '0'], pad_color=background)
+                frame = decode(outputs[1][0], tall)[-1].astype(int)
+                # 源帧等比缩到 36x20 居中，上下各 22 行留边（yuv420p 色度有取整误差）
+                for band in (frame[:20], frame[-20:]):
+                    self.assertLessEqual(np.abs(band - background).max(), 4, f"dedup={dedup}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+调色板索引光栅化回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from animation import ANIMATION_PLANS
+from palette import rasterize_themed
+from render_plan import compile_plan, rasterize
+from themes import THEMES, current_theme, use_theme
+
+# 过渡像素按主题颜色重新混合，与直接绘制的抗锯齿边缘差几个色阶
+TOLERANCE = 3
+
+
+class PaletteMatchTest(unittest.TestCase):
+
+    def test_indexed_matches_direct_for_every_theme(self):
+        """每个主题下每个静态场景：调色板查表得到的帧与直接光栅化的帧最大通道差不超过 TOLERANCE"""
+        self.addCleanup(use_theme, current_theme().name)
+        for name in THEMES:
+            use_theme(name)
+            for scene in gv.SCENES:
+                plan = compile_plan(scene['layout'], scene['kwargs'], current_theme())
+                if isinstance(plan, ANIMATION_PLANS):
+                    continue
+                direct = rasterize(plan)[..., :3].astype(int)
+                indexed = rasterize_themed(plan)[..., :3].astype(int)
+                self.assertLessEqual(np.abs(direct - indexed).max(), TOLERANCE,
+                                     f"{name} / {scene['title']}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+分段增量编码回归测试（需要本机 ffmpeg）
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoder import write_video_ffmpeg
+from segments import write_video_segments
+from test_encoder import FFMPEG, FPS, container_duration, decode, probe_pts, scene_items
+
+
+@unittest.skipUnless(FFMPEG, "需要 ffmpeg")
+class SegmentJoinTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # 场景时长之和；最后一个场景的淡出只有几帧，紧跟在长静止段之后
+        self.expected = sum(duration for _, duration, _, _ in scene_items())
+        self.total_frames = round(self.expected * FPS)
+        pipe_path = os.path.join(self.tmp.name, 'pipe.mp4')
+        write_video_ffmpeg(scene_items(), pipe_path, fps=FPS, threads=1, dedup=False,
+                           extra_args=['-qp', '0'])
+        self.reference = decode(pipe_path)
+
+    def join(self, frame_mode, extra_args=()):
+        name = f"{frame_mode}-{'lossless' if extra_args else 'default'}"
+        path = os.path.join(self.tmp.name, f'{name}.mp4')
+        total = write_video_segments(scene_items(), path, fps=FPS, threads=1, frame_mode=frame_mode,
+                                     segment_dir=os.path.join(self.tmp.name, name),
+                                     extra_args=extra_args)
+        self.assertAlmostEqual(total, self.expected)
+        return path
+
+    def assert_joined(self, frame_mode):
+        # 默认参数带 B 帧：容器时长按解码时间戳计算，末尾静止段最容易被截短
+        path = self.join(frame_mode)
+        self.assertAlmostEqual(container_duration(path), self.expected, places=2)
+        self.assertLess(probe_pts(path)[-1], self.expected)
+        # 无损编码：后面的场景没有漂移，逐帧与一次性编码的结果相同
+        frames = decode(self.join(frame_mode, ['-qp', '0']))
+        self.assertEqual(len(frames), self.total_frames)
+        bad = [i for i in range(self.total_frames) if not np.array_equal(frames[i], self.reference[i])]
+        self.assertEqual(bad, [])
+
+    def test_vfr_joined_duration(self):
+        self.assert_joined('vfr')
+
+    def test_cfr_joined_duration(self):
+        self.assert_joined('cfr')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+流式渲染回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from scene_cache import SceneCache
+from scheduler import ScenePool
+from themes import current_theme, use_theme
+
+
+def text_scene(text):
+    return {'title': text, 'layout': gv.layout_text_image,
+            'kwargs': {'text': text, 'size': (64, 36), 'font_size': 10},
+            'duration': 1, 'fade_in': 0, 'fade_out': 0}
+
+
+class ParallelStreamTest(unittest.TestCase):
+
+    def test_cache_hit_then_miss_releases_encoder_pipe(self):
+        """前面的场景命中缓存、最后一个场景重新渲染时，进程池在编码器启动之后才创建；
+        工作进程不能持有编码器 stdin 的写端，否则编码器读不到 EOF 而永远等待"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SceneCache(tmp)
+            scenes = [text_scene(text) for text in ('a', 'b', 'c')]
+            list(gv.stream_scene_frames(scenes, cache=cache))
+            scenes[-1] = text_scene('changed')
+
+            # 模拟 moviepy 的 ffmpeg 写入进程：读到 EOF 才退出
+            encoder = subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdin.buffer.read()'],
+                                       stdin=subprocess.PIPE)
+            frames = gv.stream_scene_frames(scenes, jobs=2, cache=cache)
+            try:
+                # 与 SceneTimeline 一样只取够场景数，不把帧流取到耗尽
+                got = [next(frames) for _ in scenes]
+                encoder.stdin.close()
+                self.assertEqual(encoder.wait(timeout=30), 0)
+            finally:
+                frames.close()
+                if encoder.poll() is None:
+                    encoder.kill()
+                    encoder.wait()
+
+            self.assertEqual([frame.shape for frame in got], [(36, 64, 3)] * 3)
+            self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_shared_pool_reuses_palette_across_variants(self):
+        """多个变体共用一个进程池：只换主题的变体命中工作进程里的调色板索引帧"""
+        scenes = [text_scene(text) for text in ('a', 'b', 'c')]
+        previous = current_theme().name
+        self.addCleanup(use_theme, previous)
+        with ScenePool(2, stats=gv.render_cache_stats) as pool:
+            for theme in ('dark', 'light'):
+                use_theme(theme)
+                frames = gv.build_scene_frames(scenes, palette=True, pool=pool)
+                self.assertEqual(len(frames), 3)
+            stats = pool.stats()
+        self.assertEqual((stats['indexed_hits'], stats['indexed_misses']), (3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
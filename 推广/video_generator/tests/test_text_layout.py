@@ -0,0 +1,71 @@
+"""
+按像素宽度换行的回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from text_layout import advance_width, layout_text
+
+SIZE = 24
+
+
+def widths(block):
+    return [advance_width(line, 'sans', SIZE) for line in block.lines]
+
+
+class WrapTest(unittest.TestCase):
+
+    def test_mixed_cjk_and_latin(self):
+        """中日韩文字逐字断行，拉丁单词整体换行；内容不丢不重"""
+        text = "昨天说的 authentication 方案用 JWT Token 和 Redis 存储会话，支持 multi-device 登录"
+        words = re.findall(r'[A-Za-z-]+', text)
+        # 行宽能放下最长的单词，与字体中中文字形的宽度无关
+        max_width = (max(advance_width(word, 'sans', SIZE) for word in words)
+                     + advance_width('中中', 'sans', SIZE))
+        block = layout_text(text, 'sans', SIZE, max_width)
+        self.assertGreater(len(block.lines), 3)
+        for line, width in zip(block.lines, widths(block)):
+            self.assertLessEqual(width, max_width, line)
+            self.assertEqual(line, line.strip())
+        self.assertEqual(''.join(block.lines).replace(' ', ''), text.replace(' ', ''))
+        self.assertEqual([w for line in block.lines for w in re.findall(r'[A-Za-z-]+', line)], words)
+        # 至少有一处断在两个中文字之间
+        cjk = re.compile(r'[\u4e00-\u9fff，]')
+        self.assertTrue(any(cjk.match(a[-1]) and cjk.match(b[0])
+                            for a, b in zip(block.lines, block.lines[1:])), block.lines)
+
+    def test_word_longer_than_line(self):
+        """比行宽还长的单词单独起行并按字拆开，每行尽量填满"""
+        word = 'supercalifragilisticexpialidocious' * 2
+        max_width = advance_width('mmmmmmmmmm', 'sans', SIZE)
+        block = layout_text(f"a {word}", 'sans', SIZE, max_width)
+        self.assertEqual(block.lines[0], 'a')
+        self.assertEqual(''.join(block.lines[1:]), word)
+        rest = word
+        for line, width in zip(block.lines[1:], widths(block)[1:]):
+            self.assertLessEqual(width, max_width, line)
+            rest = rest[len(line):]
+            if rest:
+                # 再放一个字就超宽
+                self.assertGreater(width + advance_width(rest[0], 'sans', SIZE), max_width, line)
+
+    def test_bubble_width_matches_widest_line(self):
+        """消息框宽度贴合换行后最宽的一行，而不是固定的最大宽度"""
+        bubbles, _ = gv.chat_bubbles(gv.CHAT_MESSAGES)
+        self.assertEqual(len(bubbles), len(gv.CHAT_MESSAGES))
+        for (_, content), (_, box, ops) in zip(gv.CHAT_MESSAGES, bubbles):
+            lines = [op[2] for op in ops if op[0] == 'text']
+            widest = max(advance_width(line, 'sans', SIZE) for line in lines)
+            self.assertEqual(box[2] - box[0], round(widest) + 30, content)
+            self.assertLessEqual(box[2] - box[0], 700)
+
+
+if __name__ == '__main__':
+    unittest.main()
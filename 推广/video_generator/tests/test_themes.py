@@ -0,0 +1,56 @@
+"""
+主题作为缓存键的回归测试
+运行: python -m unittest discover -s tests
+"""
+
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_video as gv
+from render_plan import compile_plan
+from scene_cache import scene_key
+from themes import DARK, THEMES, Theme, current_theme, use_theme
+
+
+class ThemeKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(use_theme, current_theme().name)
+        self.scene = gv.SCENES[0]
+
+    def keys(self, theme):
+        """主题下场景的 (编译出的计划, 场景缓存键)"""
+        use_theme(theme)
+        plan = compile_plan(self.scene['layout'], self.scene['kwargs'], current_theme())
+        return plan, scene_key(gv.render_task(self.scene), gv.scene_context())
+
+    def test_equal_themes_hash_equal(self):
+        """颜色相同（hex 大小写不同、或经过 pickle）的主题相等且哈希相同，命中同一份缓存"""
+        copy = Theme('dark', {key: value.lower() for key, value in DARK.items()})
+        for other in (copy, pickle.loads(pickle.dumps(THEMES['dark']))):
+            self.assertIsNot(other, THEMES['dark'])
+            self.assertEqual(other, THEMES['dark'])
+            self.assertEqual(hash(other), hash(THEMES['dark']))
+        plan, key = self.keys(THEMES['dark'])
+        copy_plan, copy_key = self.keys(copy)
+        self.assertIs(copy_plan, plan)
+        self.assertEqual(copy_key, key)
+
+    def test_different_themes_get_different_keys(self):
+        """配色或名称不同的主题得到不同的计划和场景缓存键"""
+        variants = [THEMES['dark'], THEMES['light'], THEMES['brand'],
+                    THEMES['dark'].derive('dark-accent', accent='#FF0000'),
+                    Theme('dark-copy', DARK)]
+        self.assertEqual(len(set(variants)), len(variants))
+        plans, keys = zip(*(self.keys(theme) for theme in variants))
+        self.assertEqual(len(set(keys)), len(variants))
+        # 只改了开场场景没有用到的颜色、或只改了名称时计划内容可以相同，但不会复用其他主题的缓存项
+        self.assertEqual(len({id(plan) for plan in plans}), len(variants))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+文字排版
+按像素宽度自动换行：每个 (字体角色, 字号) 的字形前进宽度只测量一次并缓存，
+一行文字的宽度是各字形前进宽度之和，换行只需线性扫描一遍，不必反复调用 textbbox。
+排版结果按 (文字, 字体, 宽度) 缓存，重复出现的消息（如长对话记录）只排一次。
+
+中日韩文字可以在任意字之间断行；连续的拉丁字母 / 数字视为一个单词，
+单词本身超过行宽时才按字拆开。文字中的换行符总是换行，空行保留行高。
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from fonts import get_font
+
+# 行高与字号之比
+LINE_SPACING = 1.25
+
+LAYOUT_CACHE_SIZE = 4096
+
+# lines: 各行文字；width: 最宽一行的宽度；height: 总高度；line_height: 行高
+TextBlock = namedtuple('TextBlock', ['lines', 'width', 'height', 'line_height'])
+
+# 空白串 / 连续的非中日韩字符（单词）/ 其他单个字符
+_TOKEN = re.compile(r'[ \t]+|[^\s\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]+|.')
+
+# (角色, 字号) -> {字符: 前进宽度}
+_advances = {}
+
+
+def glyph_advances(role, size):
+    """字体的字形前进宽度表，按需填充"""
+    key = (role, size)
+    table = _advances.get(key)
+    if table is None:
+        table = _advances[key] = {}
+    return table
+
+
+def advance_width(text, role, size):
+    """文字的前进宽度（各字形前进宽度之和，不含字距调整）"""
+    table = glyph_advances(role, size)
+    width = 0.0
+    for char in text:
+        advance = table.get(char)
+        if advance is None:
+            advance = table[char] = get_font(role, size).getlength(char)
+        width += advance
+    return width
+
+
+def line_height(size, spacing=LINE_SPACING):
+    """字号对应的行高"""
+    return round(size * spacing)
+
+
+def _wrap_paragraph(paragraph, role, size, max_width):
+    """贪心换行一个段落，返回 [(行, 宽度)]"""
+    lines = []
+    line, width = '', 0.0
+
+    def flush():
+        # 行尾空白不计入宽度
+        text = line.rstrip(' \t')
+        lines.append((text, width - advance_width(line[len(text):], role, size)))
+
+    for token in _TOKEN.findall(paragraph):
+        token_width = advance_width(token, role, size)
+        if width + token_width <= max_width:
+            line, width = line + token, width + token_width
+            continue
+        if token[0] in ' \t':
+            # 放不下的空白处断行，新行不以空白开头
+            flush()
+            line, width = '', 0.0
+            continue
+        if line:
+            flush()
+            line, width = '', 0.0
+        if token_width <= max_width:
+            line, width = token, token_width
+            continue
+        # 单词比行宽还长，按字拆开
+        for char in token:
+            char_width = advance_width(char, role, size)
+            if line and width + char_width > max_width:
+                flush()
+                line, width = '', 0.0
+            line, width = line + char, width + char_width
+    flush()
+    return lines
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def layout_text(text, role, size, max_width=None, spacing=LINE_SPACING):
+    """把文字按像素宽度换行，返回 TextBlock；max_width 为 None 时只按换行符分行"""
+    lines = []
+    for paragraph in text.split('\n'):
+        if max_width is None:
+            lines.append((paragraph, advance_width(paragraph, role, size)))
+        else:
+            lines.extend(_wrap_paragraph(paragraph, role, size, max_width))
+    height = line_height(size, spacing)
+    return TextBlock(tuple(line for line, _ in lines),
+                     int(round(max((width for _, width in lines), default=0))),
+                     height * len(lines), height)
+
+
+def layout_cache_stats():
+    """排版缓存命中统计"""
+    info = layout_text.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+            'glyphs': sum(len(table) for table in _advances.values())}
+
+
+def clear_layout_cache():
+    """清空排版与字形宽度缓存（字体变化后调用）"""
+    layout_text.cache_clear()
+    _advances.clear()
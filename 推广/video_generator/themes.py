@@ -0,0 +1,150 @@
+"""
+配色主题
+主题是一组命名颜色（bg_dark / primary / text ...），创建时把 hex 一次性解析为 RGB 元组和
+numpy uint8 数组；布局从当前主题取颜色，绘制指令里直接带上解析好的 RGB，光栅化时不再解析 hex。
+
+主题是不可变、可哈希的值：计划编译缓存和场景缓存的键都包含当前主题，
+切换主题后相同场景会重新编译、重新渲染，切回来时命中缓存。
+"""
+
+import numpy as np
+
+from render_plan import Swatch, hex_to_rgb
+
+# 暗色（默认）配色，颜色名即主题的槽位
+DARK = {
+    'bg_dark': '#0F172A',
+    'primary': '#3B82F6',
+    'secondary': '#10B981',
+    'accent': '#F59E0B',
+    'text': '#F8FAFC',
+    'text_muted': '#94A3B8',
+    # 面板 / 边框（聊天标题栏、AI 气泡、图表底色）
+    'surface': '#1E293B',
+    'border': '#334155',
+    # 终端窗口
+    'terminal_bg': '#1E1E1E',
+    'terminal_bar': '#323232',
+    'terminal_text': '#F8FAFC',
+}
+
+LIGHT = {
+    **DARK,
+    'bg_dark': '#F8FAFC',
+    'primary': '#2563EB',
+    'secondary': '#059669',
+    'accent': '#D97706',
+    'text': '#0F172A',
+    'text_muted': '#64748B',
+    'surface': '#E2E8F0',
+    'border': '#CBD5E1',
+}
+
+BRAND = {
+    **DARK,
+    'bg_dark': '#1E1B4B',
+    'primary': '#8B5CF6',
+    'secondary': '#22D3EE',
+    'accent': '#F472B6',
+    'text': '#F5F3FF',
+    'text_muted': '#A5B4FC',
+    'surface': '#312E81',
+    'border': '#4338CA',
+}
+
+
+class Theme:
+    """命名配色：颜色只解析一次，不可变、可哈希"""
+
+    def __init__(self, name, colors):
+        self.name = name
+        self._items = tuple((key, value.upper()) for key, value in colors.items())
+        self._hex = dict(self._items)
+        self.keys = tuple(key for key, _ in self._items)
+        self.rgb = {key: hex_to_rgb(value) for key, value in self._items}
+        self.swatches = {key: Swatch(key, rgb) for key, rgb in self.rgb.items()}
+        # 各槽位的 RGB，行号即 slot(key)
+        array = np.array([self.rgb[key] for key in self.keys], dtype=np.uint8).reshape(-1, 3)
+        array.flags.writeable = False
+        self.array = array
+
+    def __getitem__(self, key):
+        return self.swatches[key]
+
+    def __contains__(self, key):
+        return key in self.swatches
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __eq__(self, other):
+        return isinstance(other, Theme) and (self.name, self._items) == (other.name, other._items)
+
+    def __hash__(self):
+        return hash((self.name, self._items))
+
+    def __repr__(self):
+        return f"Theme({self.name!r}, {dict(self._items)!r})"
+
+    def __reduce__(self):
+        return (Theme, (self.name, dict(self._items)))
+
+    def hex(self, key):
+        """颜色的 hex 字符串"""
+        return self._hex[key]
+
+    def slot(self, key):
+        """颜色在主题中的序号（array 的行号）"""
+        return self.keys.index(key)
+
+    def color(self, value):
+        """颜色名解析为主题颜色，hex / RGB 颜色值原样返回"""
+        if isinstance(value, str) and value in self.swatches:
+            return self.swatches[value]
+        return value
+
+    def derive(self, name, **colors):
+        """在这个主题的基础上覆盖部分颜色，得到新主题"""
+        unknown = sorted(set(colors) - set(self.keys))
+        if unknown:
+            raise ValueError(f"主题没有这些颜色: {', '.join(unknown)}")
+        return Theme(name, {**dict(self._items), **colors})
+
+
+THEMES = {
+    'dark': Theme('dark', DARK),
+    'light': Theme('light', LIGHT),
+    'brand': Theme('brand', BRAND),
+}
+
+_current = THEMES['dark']
+
+
+def get_theme(theme):
+    """按名称取主题；已经是 Theme 时原样返回"""
+    if isinstance(theme, Theme):
+        return theme
+    if theme not in THEMES:
+        raise ValueError(f"未知的主题: {theme}，可选: {', '.join(THEMES)}")
+    return THEMES[theme]
+
+
+def register_theme(theme):
+    """注册自定义主题，之后可以按名称使用"""
+    THEMES[theme.name] = theme
+    return theme
+
+
+def use_theme(theme):
+    """切换当前主题（名称或 Theme），返回切换后的主题"""
+    global _current
+    _current = get_theme(theme)
+    return _current
+
+
+def current_theme():
+    """当前主题"""
+    return _current